@@ -0,0 +1,113 @@
+"""
+Func_AnalyseJournal.py - Journal over færdigt analyserede frames pr. session
+Hver frame's resultat tilføjes analyse_journal.jsonl (én JSON linje) så snart den er færdig.
+Bliver analysen stoppet eller går ned, springer næste kørsel journalførte frames over (ingen ny
+plate solving eller detektion) og fletter deres rækker ind i resultat CSV'en. Rækker gælder kun
+for samme analyseindstillinger og uændrede FITS filer; frames der fejlede (også kun i plate
+solving) prøves igen.
+Journalen slettes når en kørsel er gennemført og resultatet gemt.
+"""
+
+import os
+import json
+import threading
+
+import numpy as np
+
+JOURNAL_FILNAVN = 'analyse_journal.jsonl'
+
+_lock = threading.Lock()
+
+
+def journal_path(directory):
+    return os.path.join(directory, JOURNAL_FILNAVN)
+
+
+def skal_proeves_igen(row):
+    """Frames med fejl eller uden WCS (plate solving fejlede) analyseres igen når kørslen genoptages"""
+    return bool(row.get('error') or row.get('platesolve_fejl'))
+
+
+def _json_værdi(værdi):
+    """numpy skalarer som Python tal, alt andet ukendt (astropy Undefined, tider) som tekst"""
+    if isinstance(værdi, np.generic):
+        return værdi.item()
+    return str(værdi)
+
+
+class AnalyseJournal:
+    """Append-only journal for én sessionsmappe og ét sæt analyseindstillinger (konfig)"""
+
+    def __init__(self, directory, konfig):
+        self.directory = directory
+        self.path = journal_path(directory)
+        # Rund gennem JSON så sammenligningen med indlæste linjer er eksakt
+        self.konfig = json.loads(json.dumps(konfig, default=_json_værdi))
+        self.rows = {}
+        self.forældede = 0
+        self._afbrudt_linje = False  # Filen slutter midt i en linje - næste post starter på en ny
+        self._load()
+
+    def _mtime(self, filename):
+        try:
+            return os.path.getmtime(os.path.join(self.directory, filename))
+        except OSError:
+            return None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with _lock:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                linjer = f.readlines()
+        self._afbrudt_linje = bool(linjer) and not linjer[-1].endswith('\n')
+        for linje in linjer:
+            try:
+                post = json.loads(linje)
+            except ValueError:
+                continue  # Halvt skrevet sidste linje fra et nedbrud
+            filename = post.get('filename')
+            row = post.get('row') or {}
+            if post.get('konfig') != self.konfig or post.get('mtime') != self._mtime(filename):
+                self.forældede += 1
+                continue
+            if skal_proeves_igen(row):
+                self.rows.pop(filename, None)
+                continue
+            self.rows[filename] = row
+
+    def __contains__(self, filename):
+        return filename in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, row):
+        """Journalfør en færdig frame (skrives og fsync'es med det samme)"""
+        filename = row.get('filename')
+        post = {'filename': filename, 'mtime': self._mtime(filename), 'konfig': self.konfig, 'row': row}
+        linje = json.dumps(post, default=_json_værdi) + '\n'
+        if self._afbrudt_linje:
+            linje = '\n' + linje
+            self._afbrudt_linje = False
+        with _lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(linje)
+                f.flush()
+                os.fsync(f.fileno())
+        if not skal_proeves_igen(row):
+            self.rows[filename] = row
+
+    def slet(self):
+        """Fjern journalen efter en gennemført kørsel"""
+        with _lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.rows = {}
+        self._afbrudt_linje = False
+
+    def summary(self):
+        tekst = f"Journal: {len(self.rows)} frames genoptages"
+        if self.forældede:
+            tekst += f", {self.forældede} forældede poster ignoreret (ændrede indstillinger eller filer)"
+        return tekst
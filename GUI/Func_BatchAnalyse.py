@@ -0,0 +1,205 @@
+"""
+Func_BatchAnalyse.py - Headless batch analyse af mange sessionsmapper (flere nætter)
+Finder alle LeapFrog_* og Tracking_* sessioner under en rodmappe, kører samme analyse som
+Billede Analyse fanen (analyse_session) i en process pool uden Tk og skriver en samlet rapport.
+Sessioner hvis resultat CSV er nyere end alle deres FITS filer springes over (brug --force).
+
+Eksempel:
+    python Func_BatchAnalyse.py D:/Observationer --astap "C:/Program Files/astap/astap.exe" --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import concurrent.futures
+from datetime import datetime
+
+# Ingen skærm på en beregningsnode - plots gemmes kun som filer
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import pandas as pd
+
+SESSION_PRAEFIKSER = ('LeapFrog_', 'Tracking_')
+RAPPORT_FILNAVN = 'batch_rapport.json'
+LOG_FILNAVN = 'batch_analyse.log'
+DEFAULT_PIXELSCALE = 6.2399e-05
+
+
+def find_sessions(root):
+    """Alle sessionsmapper (LeapFrog_*/Tracking_*) med FITS filer under root, sorteret"""
+    sessions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        if os.path.basename(dirpath).startswith(SESSION_PRAEFIKSER):
+            if any(f.lower().endswith('.fits') for f in filenames):
+                sessions.append(dirpath)
+            dirnames[:] = []  # Undermapper i en session (plots) er ikke sessioner
+    return sessions
+
+
+def result_files(directory):
+    return sorted(f for f in os.listdir(directory) if f.startswith('data') and f.endswith('.csv'))
+
+
+def er_opdateret(directory):
+    """Er sessionens resultat CSV nyere end alle dens FITS filer?"""
+    resultater = result_files(directory)
+    if not resultater:
+        return False
+    nyeste_frame = max(os.path.getmtime(os.path.join(directory, f))
+                       for f in os.listdir(directory) if f.lower().endswith('.fits'))
+    return max(os.path.getmtime(os.path.join(directory, f)) for f in resultater) >= nyeste_frame
+
+
+def batch_kontekst(astap_workers=4, astap_timeout=60.0, frame_workers=1, incremental_wcs=False,
+                   roi_radius=400, pixelsum_radius=50, prescreen=False, min_stars=10, max_saturation=1.0):
+    """HeadlessAnalyseKontekst med de indstillinger analysen ellers læser fra GUI felterne"""
+    from Func_BilledeAnalyse import HeadlessAnalyseKontekst, _Værdi
+
+    kontekst = HeadlessAnalyseKontekst(pixelsum_radius=pixelsum_radius)
+    kontekst.astap_workers_var = _Værdi(astap_workers)
+    kontekst.astap_timeout_var = _Værdi(astap_timeout)
+    kontekst.analysis_workers_var = _Værdi(frame_workers)
+    kontekst.incremental_wcs_var = _Værdi(incremental_wcs)
+    kontekst.tracking_roi_var = _Værdi(roi_radius)
+    kontekst.prescreen_var = _Værdi(prescreen)
+    kontekst.prescreen_min_stars_var = _Værdi(min_stars)
+    kontekst.prescreen_max_saturation_var = _Værdi(max_saturation)
+    return kontekst
+
+
+def _session_summary(output_path):
+    """Antal frames, satellit positioner og fejl fra sessionens resultat CSV"""
+    df = pd.read_csv(output_path)
+    frames = df[df['OBSTYPE'] != 'stjernehimmel'] if 'OBSTYPE' in df.columns else df
+    return {
+        'frames': len(frames),
+        'positions': int(frames['Sat_RA_Behandlet'].notna().sum()) if 'Sat_RA_Behandlet' in frames.columns else 0,
+        'frame_errors': int(frames['error'].notna().sum()) if 'error' in frames.columns else 0,
+    }
+
+
+def analyse_session_worker(opgave):
+    """Analyser én session (kører i en worker-proces) og returner dens rapport række.
+    Analyse loggen gemmes som batch_analyse.log i sessionsmappen"""
+    from Func_BilledeAnalyse import analyse_session
+
+    directory, astap_path, pixelscale, save_plots, indstillinger = opgave
+    kontekst = batch_kontekst(**indstillinger)
+    række = {'session': directory, 'status': 'ok', 'output': None, 'error': None}
+
+    t0 = time.perf_counter()
+    try:
+        output_path = analyse_session(kontekst, directory, astap_path, pixelscale, save_plots)
+        række['output'] = os.path.basename(output_path)
+        række.update(_session_summary(output_path))
+    except Exception as e:
+        række['status'] = 'fejl'
+        række['error'] = str(e)
+        kontekst.log(f"Fejl under analyse: {str(e)}")
+    række['duration_s'] = round(time.perf_counter() - t0, 2)
+
+    try:
+        with open(os.path.join(directory, LOG_FILNAVN), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(kontekst.log_lines) + '\n')
+    except OSError:
+        pass
+    return række
+
+
+def run_batch(root, astap_path, pixelscale=DEFAULT_PIXELSCALE, workers=1, force=False, save_plots=False,
+              output=None, **indstillinger):
+    """Analyser alle sessioner under root med op til workers sessioner samtidig.
+    Returnerer rapporten (dict) og gemmer den som JSON (standard: <root>/batch_rapport.json)"""
+    from Func_PlateSolve import solver_tilgaengelig
+
+    if not solver_tilgaengelig(astap_path):
+        raise FileNotFoundError(f"Plate solver ikke fundet: {astap_path}")
+
+    sessions = find_sessions(root)
+    oversprunget = [] if force else [s for s in sessions if er_opdateret(s)]
+    mangler = [s for s in sessions if s not in oversprunget]
+    print(f"{len(sessions)} sessioner fundet under {root} - {len(mangler)} analyseres, "
+          f"{len(oversprunget)} er opdaterede", flush=True)
+
+    opgaver = [(s, astap_path, pixelscale, save_plots, indstillinger) for s in mangler]
+    rækker = []
+    t0 = time.perf_counter()
+
+    def modtag(række):
+        rækker.append(række)
+        navn = os.path.relpath(række['session'], root)
+        if række['status'] == 'ok':
+            print(f"[{len(rækker)}/{len(opgaver)}] {navn}: {række['positions']}/{række['frames']} positioner "
+                  f"({række['duration_s']:.0f} s)", flush=True)
+        else:
+            print(f"[{len(rækker)}/{len(opgaver)}] {navn}: FEJL {række['error']}", flush=True)
+
+    if workers <= 1:
+        for opgave in opgaver:
+            modtag(analyse_session_worker(opgave))
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(analyse_session_worker, opgave) for opgave in opgaver]
+            for future in concurrent.futures.as_completed(futures):
+                modtag(future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    rækker.sort(key=lambda r: r['session'])
+    rapport = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'root': os.path.abspath(root),
+        'config': {'astap': astap_path, 'pixelscale': pixelscale, 'workers': workers, 'force': force,
+                   'save_plots': save_plots, **indstillinger},
+        'sessions_found': len(sessions),
+        'analysed': len(rækker),
+        'failed': sum(r['status'] != 'ok' for r in rækker),
+        'skipped_up_to_date': [os.path.relpath(s, root) for s in oversprunget],
+        'total_s': round(time.perf_counter() - t0, 2),
+        'sessions': [{**r, 'session': os.path.relpath(r['session'], root)} for r in rækker],
+    }
+
+    output = output or os.path.join(root, RAPPORT_FILNAVN)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"Færdig: {rapport['analysed']} analyseret, {rapport['failed']} fejlede, "
+          f"{len(oversprunget)} sprunget over ({rapport['total_s']:.0f} s) - rapport: {output}", flush=True)
+    return rapport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless LeapFrog/Tracking analyse af alle sessioner under en mappe")
+    parser.add_argument('root', help="rodmappe med sessionsmapper (søges rekursivt, f.eks. flere nætter)")
+    parser.add_argument('--astap', default=os.environ.get('DENASSI_PLATESOLVER', r"C:\Program Files\astap\astap.exe"),
+                        help="ASTAP sti eller lokal:<katalog.npz>")
+    parser.add_argument('--pixelscale', type=float, default=DEFAULT_PIXELSCALE, help="grader pr. pixel")
+    parser.add_argument('--workers', type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)),
+                        help="sessioner der analyseres samtidig")
+    parser.add_argument('--frame-workers', type=int, default=1, help="worker-processer pr. session")
+    parser.add_argument('--astap-workers', type=int, default=4, help="samtidige ASTAP processer pr. session")
+    parser.add_argument('--astap-timeout', type=float, default=60.0, help="ASTAP timeout pr. frame (s)")
+    parser.add_argument('--incremental-wcs', action='store_true', help="inkrementel astrometri for LeapFrog")
+    parser.add_argument('--roi', type=int, default=400, help="Tracking ROI halv bredde (0 = hele billedet)")
+    parser.add_argument('--pixelsum-radius', type=int, default=50)
+    parser.add_argument('--prescreen', action='store_true', help="spring ubrugelige frames over før plate solving")
+    parser.add_argument('--min-stars', type=int, default=10, help="forhåndsscreening: min. stjerner (LeapFrog)")
+    parser.add_argument('--max-saturation', type=float, default=1.0, help="forhåndsscreening: maks. %% mættede pixels")
+    parser.add_argument('--plots', action='store_true', help="gem detektionsplots i sessionsmapperne")
+    parser.add_argument('--force', action='store_true', help="analyser også sessioner der er opdaterede")
+    parser.add_argument('--output', default=None, help=f"rapport sti (standard: <root>/{RAPPORT_FILNAVN})")
+    args = parser.parse_args()
+
+    try:
+        rapport = run_batch(args.root, args.astap, args.pixelscale, args.workers, args.force, args.plots, args.output,
+                            astap_workers=args.astap_workers, astap_timeout=args.astap_timeout,
+                            frame_workers=args.frame_workers, incremental_wcs=args.incremental_wcs,
+                            roi_radius=args.roi, pixelsum_radius=args.pixelsum_radius, prescreen=args.prescreen,
+                            min_stars=args.min_stars, max_saturation=args.max_saturation)
+    except FileNotFoundError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(2)
+    sys.exit(1 if rapport['failed'] else 0)
@@ -0,0 +1,279 @@
+"""
+Func_Benchmark.py - Syntetisk benchmark af LeapFrog og Tracking detektorerne
+Genererer FITS sessioner med samme header-felter som kameraet skriver (OBSTYPE, TLE1/TLE2,
+DATE-STA/DATE-OBS/DATE-END, LAT/LONG/ELEV-OBS, CROTA2 ...), stjernefelt, støj, hot pixels,
+satellit-streaks med kendte endepunkter og trackede punktkilder med kendt position.
+Måler latency pr. frame, throughput og positionsfejl for find_satellite_line_leapfrog,
+find_satellite_position_tracking og hele sessionsanalysen, og skriver resultatet som JSON:
+
+    python Func_Benchmark.py --frames 10 --output benchmark.json
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import platform
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from astropy.io import fits
+from scipy.special import erf
+
+from Func_FitsLoader import read_frame
+
+# ISS TLE omkring benchmark tidspunktet (bruges kun til header og øst/vest bestemmelse)
+BENCHMARK_TLE1 = "1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005"
+BENCHMARK_TLE2 = "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.49815228 12345"
+BENCHMARK_START = datetime(2024, 1, 1, 18, 0, 0, 250000)
+BENCHMARK_SITE = {'LAT-OBS': 55.6867, 'LONG-OBS': 12.5701, 'ELEV-OBS': 30.0}
+
+
+def syntetisk_header(obstype, exposure_start, exptime, shape, rotation=0.0, binning=1):
+    """Header med samme nøgler som create_standard_fits_header/take_picture_with_header"""
+    header = fits.Header()
+    header['OBJECT'] = 'ISS (ZARYA)'
+    header['SATNAME'] = 'ISS (ZARYA)'
+    header['OBSTYPE'] = obstype
+    header['EXPTIME'] = exptime
+    header['DATE-STA'] = exposure_start.strftime('%Y-%m-%dT%H:%M:%S.%f')
+    header['DATE-OBS'] = (exposure_start + timedelta(seconds=exptime / 2)).strftime('%Y-%m-%dT%H:%M:%S.%f')
+    header['DATE-END'] = (exposure_start + timedelta(seconds=exptime)).strftime('%Y-%m-%dT%H:%M:%S.%f')
+    header['OBSERVER'] = 'Satellite Tracking GUI'
+    header['XBINNING'] = binning
+    header['YBINNING'] = binning
+    header['RA'] = 150.0
+    header['DEC'] = 40.0
+    header['CROTA2'] = rotation
+    for key, value in BENCHMARK_SITE.items():
+        header[key] = value
+    header['TLE1'] = BENCHMARK_TLE1
+    header['TLE2'] = BENCHMARK_TLE2
+    header['NORAD_ID'] = '25544'
+    return header
+
+
+def _baggrund(rng, shape, n_stjerner=60, n_hot=30, trail=None):
+    """Baggrund med læsestøj, stjerner (evt. som korte spor) og hot pixels"""
+    height, width = shape
+    data = rng.normal(1000, 30, size=shape)
+    for _ in range(n_stjerner):
+        y, x = rng.integers(20, height - 20), rng.integers(20, width - 20)
+        flux = rng.uniform(500, 20000)
+        if trail is None:
+            data[y - 2:y + 3, x - 2:x + 3] += flux
+        else:
+            dx, dy = trail
+            for k in np.linspace(0, 1, 8):
+                yy, xx = int(y + k * dy), int(x + k * dx)
+                if 2 <= yy < height - 3 and 2 <= xx < width - 3:
+                    data[yy - 2:yy + 3, xx - 2:xx + 3] += flux / 8
+    data[rng.integers(0, height, n_hot), rng.integers(0, width, n_hot)] = 65535
+    return data
+
+
+def syntetisk_leapfrog_frame(rng, shape, bredde_sigma=1.5, amplitude=400.0, margin=300):
+    """LeapFrog frame: stjerner som punkter, satellit som streak med kendte sub-pixel endepunkter"""
+    height, width = shape
+    data = _baggrund(rng, shape)
+
+    laengde = rng.uniform(0.25, 0.6) * min(shape)
+    vinkel = rng.uniform(0, np.pi)
+    cx = rng.uniform(margin + laengde / 2, width - margin - laengde / 2) if width - 2 * margin > laengde else width / 2
+    cy = rng.uniform(margin + laengde / 2, height - margin - laengde / 2) if height - 2 * margin > laengde else height / 2
+    ux, uy = np.cos(vinkel), np.sin(vinkel)
+    x1, y1 = cx - 0.5 * laengde * ux, cy - 0.5 * laengde * uy
+    x2, y2 = cx + 0.5 * laengde * ux, cy + 0.5 * laengde * uy
+
+    # Gaussisk tværprofil og erf-formede ender (streak foldet med PSF)
+    y0, y1b = int(max(0, min(y1, y2) - 20)), int(min(height, max(y1, y2) + 21))
+    x0, x1b = int(max(0, min(x1, x2) - 20)), int(min(width, max(x1, x2) + 21))
+    Y, X = np.mgrid[y0:y1b, x0:x1b]
+    s = (X - x1) * ux + (Y - y1) * uy
+    d = -(X - x1) * uy + (Y - y1) * ux
+    skala = bredde_sigma * np.sqrt(2)
+    data[y0:y1b, x0:x1b] += amplitude * np.exp(-0.5 * (d / bredde_sigma)**2) * \
+        0.5 * (erf(s / skala) - erf((s - laengde) / skala))
+
+    sand = {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'x_sat': cx, 'y_sat': cy}
+    return data.clip(0, 65535).astype(np.uint16), sand
+
+
+def syntetisk_tracking_frame(rng, shape, sigma=6.0, amplitude=30000.0, margin=200):
+    """Tracking frame: satellit som punktkilde med kendt position, stjerner som korte spor"""
+    height, width = shape
+    vinkel = rng.uniform(0, 2 * np.pi)
+    data = _baggrund(rng, shape, trail=(40 * np.cos(vinkel), 40 * np.sin(vinkel)))
+
+    x, y = rng.uniform(margin, width - margin), rng.uniform(margin, height - margin)
+    r = int(6 * sigma)
+    y0, y1 = int(y) - r, int(y) + r + 1
+    x0, x1 = int(x) - r, int(x) + r + 1
+    Y, X = np.mgrid[y0:y1, x0:x1]
+    data[y0:y1, x0:x1] += amplitude * np.exp(-((X - x)**2 + (Y - y)**2) / (2 * sigma**2))
+    return data.clip(0, 65535).astype(np.uint16), {'x_sat': x, 'y_sat': y}
+
+
+def skriv_session(directory, obstype, n_frames, shape=(2048, 2048), seed=0, exptime=2.0):
+    """Skriv en syntetisk session og returner {filnavn: sande positioner}"""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    generator = syntetisk_leapfrog_frame if obstype == 'LeapFrog' else syntetisk_tracking_frame
+    sandhed = {}
+    for i in range(n_frames):
+        data, sand = generator(rng, shape)
+        start = BENCHMARK_START + timedelta(seconds=i * (exptime + 3))
+        header = syntetisk_header(obstype, start, exptime, shape, rotation=float(rng.uniform(-180, 180)))
+        filename = f"{obstype}_{i:04d}.fits"
+        fits.PrimaryHDU(data=data, header=header).writeto(os.path.join(directory, filename), overwrite=True)
+        sandhed[filename] = sand
+    return sandhed
+
+
+def _statistik(latencies, fejl):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    fejl = np.asarray([f for f in fejl if np.isfinite(f)], dtype=np.float64)
+    resultat = {
+        'frames': int(latencies.size),
+        'latency_ms': {
+            'mean': float(latencies.mean() * 1000),
+            'median': float(np.median(latencies) * 1000),
+            'p95': float(np.percentile(latencies, 95) * 1000),
+            'max': float(latencies.max() * 1000),
+        },
+        'throughput_fps': float(latencies.size / latencies.sum()) if latencies.sum() > 0 else None,
+        'detected': int(fejl.size),
+    }
+    if fejl.size:
+        resultat['position_error_px'] = {'median': float(np.median(fejl)), 'p95': float(np.percentile(fejl, 95)),
+                                         'max': float(fejl.max())}
+    return resultat
+
+
+def _afstand(resultat, sand, noegler=('x_sat', 'y_sat')):
+    x, y = resultat.get(noegler[0], np.nan), resultat.get(noegler[1], np.nan)
+    if x is None or y is None or not np.isfinite(x) or not np.isfinite(y):
+        return np.inf
+    return float(np.hypot(x - sand[noegler[0]], y - sand[noegler[1]]))
+
+
+def _endepunkt_fejl(resultat, sand):
+    """Største endepunktsfejl - endepunkternes rækkefølge er ligegyldig"""
+    if 'x1' not in resultat:
+        return np.inf
+    a = np.array([[resultat['x1'], resultat['y1']], [resultat['x2'], resultat['y2']]], dtype=np.float64)
+    b = np.array([[sand['x1'], sand['y1']], [sand['x2'], sand['y2']]])
+    return float(min(np.max(np.hypot(*(a - b).T)), np.max(np.hypot(*(a - b[::-1]).T))))
+
+
+def benchmark_leapfrog_detector(directory, sandhed):
+    """Tid find_satellite_line_leapfrog pr. frame (ekskl. FITS læsning)"""
+    from Func_BilledeAnalyse import HeadlessAnalyseKontekst, find_satellite_line_leapfrog
+
+    kontekst = HeadlessAnalyseKontekst()
+    latencies, fejl, endepunkt_fejl = [], [], []
+    for filename, sand in sandhed.items():
+        filepath = os.path.join(directory, filename)
+        image_data, header = read_frame(filepath)
+        t0 = time.perf_counter()
+        resultat = find_satellite_line_leapfrog(kontekst, image_data, header, False, filepath)
+        latencies.append(time.perf_counter() - t0)
+        fejl.append(_afstand(resultat, sand))
+        endepunkt_fejl.append(_endepunkt_fejl(resultat, sand))
+
+    resultat = _statistik(latencies, fejl)
+    endepunkt = np.array([f for f in endepunkt_fejl if np.isfinite(f)])
+    if endepunkt.size:
+        resultat['endpoint_error_px'] = {'median': float(np.median(endepunkt)), 'max': float(endepunkt.max())}
+    return resultat
+
+
+def benchmark_tracking_detector(directory, sandhed, pixelscale=6.2399e-05, pixelsum_radius=50):
+    """Tid find_satellite_position_tracking pr. frame (ekskl. FITS læsning)"""
+    from Func_BilledeAnalyse import HeadlessAnalyseKontekst, find_satellite_position_tracking
+
+    kontekst = HeadlessAnalyseKontekst(pixelsum_radius=pixelsum_radius)
+    latencies, fejl = [], []
+    for filename, sand in sandhed.items():
+        filepath = os.path.join(directory, filename)
+        image_data, header = read_frame(filepath)
+        t0 = time.perf_counter()
+        resultat = find_satellite_position_tracking(kontekst, image_data, header, pixelscale, False, filepath)
+        latencies.append(time.perf_counter() - t0)
+        fejl.append(_afstand(resultat, sand))
+    return _statistik(latencies, fejl)
+
+
+def benchmark_session_analyse(directory, sandhed, astap_path, pixelscale=6.2399e-05, workers=1):
+    """Tid hele analysen (plate solving, detektion, CSV) for en session via den headless
+    analyse_session - samme vej som batch analysen, så benchmarken aldrig rører Tk"""
+    from Func_BilledeAnalyse import analyse_session
+    from Func_BatchAnalyse import batch_kontekst
+
+    kontekst = batch_kontekst(frame_workers=workers)
+    fejl, errors = [], []
+    t0 = time.perf_counter()
+    try:
+        output_path = analyse_session(kontekst, directory, astap_path, pixelscale, False)
+    except Exception as e:
+        output_path = None
+        errors.append(f"Fejl under analyse: {str(e)}")
+    varighed = time.perf_counter() - t0
+
+    if output_path is not None:
+        df = pd.read_csv(output_path)
+        for _, row in df.iterrows():
+            if row['filename'] in sandhed:
+                fejl.append(_afstand(row.to_dict(), sandhed[row['filename']]))
+
+    resultat = _statistik([varighed / max(1, len(sandhed))] * len(sandhed), fejl)
+    resultat['total_s'] = varighed
+    resultat['workers'] = workers
+    resultat['errors'] = errors + [line for line in kontekst.log_lines if line.startswith('Fejl')]
+    return resultat
+
+
+def run_benchmark(n_frames=10, shape=(2048, 2048), astap_path=None, workers=1, seed=0, output=None):
+    """Kør hele benchmark suiten og returner (og evt. gem) rapporten som dict"""
+    astap_path = astap_path or os.path.join(tempfile.gettempdir(), 'astap_ikke_installeret')
+    rapport = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {'frames': n_frames, 'shape': list(shape), 'workers': workers, 'seed': seed,
+                   'astap': os.path.exists(astap_path)},
+        'platform': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'numpy': np.__version__},
+    }
+
+    with tempfile.TemporaryDirectory() as root:
+        leapfrog_dir = os.path.join(root, 'leapfrog')
+        tracking_dir = os.path.join(root, 'tracking')
+        leapfrog_sandhed = skriv_session(leapfrog_dir, 'LeapFrog', n_frames, shape, seed)
+        tracking_sandhed = skriv_session(tracking_dir, 'Tracking', n_frames, shape, seed + 1)
+
+        rapport['find_satellite_line_leapfrog'] = benchmark_leapfrog_detector(leapfrog_dir, leapfrog_sandhed)
+        rapport['find_satellite_position_tracking'] = benchmark_tracking_detector(tracking_dir, tracking_sandhed)
+        rapport['session_analyse'] = {
+            'LeapFrog': benchmark_session_analyse(leapfrog_dir, leapfrog_sandhed, astap_path, workers=workers),
+            'Tracking': benchmark_session_analyse(tracking_dir, tracking_sandhed, astap_path, workers=workers),
+        }
+
+    tekst = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(tekst)
+    print(tekst)
+    return rapport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Syntetisk benchmark af LeapFrog/Tracking detektorerne")
+    parser.add_argument('--frames', type=int, default=10, help="frames pr. session")
+    parser.add_argument('--size', type=int, nargs=2, default=(2048, 2048), metavar=('HØJDE', 'BREDDE'))
+    parser.add_argument('--astap', default=None, help="sti til ASTAP (uden ASTAP måles analysen uden WCS)")
+    parser.add_argument('--workers', type=int, default=1, help="worker-processer i sessionsanalysen")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="gem JSON rapporten her")
+    args = parser.parse_args()
+    run_benchmark(args.frames, tuple(args.size), args.astap, args.workers, args.seed, args.output)
@@ -5,6 +5,8 @@ import os
 from PIL import Image, ImageTk
 from datetime import datetime
 
+from Func_SessionIndex import read_index, remove_frame
+
 
 def select_review_directory(self):
     """Vælg mappe til billedgennemgang"""
@@ -16,12 +18,32 @@ def select_review_directory(self):
         self.load_review_images()
 
 
+def fits_filename_for(png_filename):
+    """FITS fil der hører til et plot - prøv først med _plot.png erstatning, derefter direkte .png erstatning"""
+    fits_filename = png_filename.replace('_plot.png', '.fits')
+    if fits_filename == png_filename:
+        fits_filename = png_filename.replace('.png', '.fits')
+    return fits_filename
+
+
+def review_frame_info(self, fits_filename):
+    """Indexrække for FITS filen (sessionens index læses én gang pr. mappe) eller None"""
+    try:
+        if getattr(self, 'review_session_index', None) is None:
+            df = read_index(self.review_directory)
+            self.review_session_index = {} if df is None else df.set_index('filename').to_dict('index')
+        return self.review_session_index.get(fits_filename)
+    except Exception:
+        return None
+
+
 def load_review_images(self):
     """Indlæs PNG-billeder fra mappen"""
     if not self.review_directory:
         return
     
     try:
+        self.review_session_index = None
         self.review_files = [f for f in os.listdir(self.review_directory) 
                             if f.lower().endswith('.png')]
         self.review_index = 0
@@ -52,10 +74,12 @@ def show_review_image(self):
     filename = self.review_files[self.review_index]
     filepath = os.path.join(self.review_directory, filename)
     
-    # Opdater info
-    self.review_info_label.config(
-        text=f"{self.review_index + 1}/{len(self.review_files)} — {filename}"
-    )
+    # Opdater info (tid, eksponering og filter fra sessionens frame index hvis det findes)
+    info = f"{self.review_index + 1}/{len(self.review_files)} — {filename}"
+    frame = review_frame_info(self, fits_filename_for(filename))
+    if frame is not None:
+        info += f"\n{frame.get('DATE-OBS', '')}  {frame.get('EXPTIME', '')} s  {frame.get('FILTER', '')}"
+    self.review_info_label.config(text=info)
     
     try:
         # Indlæs PNG-billede
@@ -96,11 +120,7 @@ def review_delete_file(self):
     filename = self.review_files[self.review_index]
     png_filepath = os.path.join(self.review_directory, filename)
     
-    # Find tilsvarende FITS-fil - prøv først med _plot.png erstatning, derefter direkte .png erstatning
-    fits_filename = filename.replace('_plot.png', '.fits')
-    if fits_filename == filename:  # Hvis erstatning ikke fungerede, prøv direkte .png -> .fits
-        fits_filename = filename.replace('.png', '.fits')
-    
+    fits_filename = fits_filename_for(filename)
     fits_filepath = os.path.join(self.review_directory, fits_filename)
     
     files_deleted = []
@@ -120,6 +140,8 @@ def review_delete_file(self):
         try:
             os.remove(fits_filepath)
             files_deleted.append(fits_filename)
+            remove_frame(self.review_directory, fits_filename)
+            self.review_session_index = None
             self.review_log_message(f"Slettede FITS: {fits_filename}")
         except Exception as e:
             errors.append(f"FITS sletning fejlede: {e}")
@@ -6,15 +6,23 @@ Contains UI initialization for image analysis features and analysis methods
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-import subprocess
 import threading
+import time
+import concurrent.futures
 from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
-from astropy.io import fits
-import cv2
-from scipy.ndimage import label, find_objects
-from scipy.ndimage import zoom
+
+from Func_FitsLoader import read_frame, peak_rss_mb
+from Func_Ephemeris import overhead_seconds as ephemeris_overhead_seconds, summary as ephemeris_summary
+from Func_SessionIndex import load_index, frame_header
+from Func_ResultatFormat import write_result, size_summary
+from Func_AnalyseJournal import AnalyseJournal
+from Func_PlotKoe import PlotKoe, nedskaler, render_plot
+from Func_Forscreening import (FORSCREENING_GRAENSER, screen_frames, frasorterede, flet_resultater,
+                               screening_summary)
+from Func_Detektion import (frame_median, find_brightest_object, slice_center, aperture_sum, find_streak, roi_vindue,
+                            streak_parametre)
 
 # Check for optional dependencies
 try:
@@ -31,6 +39,35 @@ except ImportError:
     plt = None
 
 
+class _Værdi:
+    """Simpel holder med samme get/set interface som tk variabler (kan pickles)"""
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class HeadlessAnalyseKontekst:
+    """Erstatning for GUI-instansen når analysen kører uden Tk (worker-processer).
+    Log beskeder samles i log_lines i stedet for at blive skrevet til analyse loggen."""
+    def __init__(self, pixelsum_radius=50, echo=False):
+        self.tracking_pixelsum_radius = _Værdi(pixelsum_radius)
+        self.analysis_progress_var = _Værdi(0)
+        self.stop_image_analysis = False
+        self.log_lines = []
+        self.echo = echo
+        self.plot_opgaver = None  # Liste i worker-processer: bestilte plots sendes tilbage til hovedprocessen
+
+    def log(self, message):
+        self.log_lines.append(message)
+        if self.echo:
+            print(message, flush=True)
+
+
 def create_image_analysis_tab(self, notebook):
     """Tab til Billede Analyse af LeapFrog og Tracking observationer"""
     analysis_frame = ttk.Frame(notebook)
@@ -85,7 +122,8 @@ def create_image_analysis_tab(self, notebook):
     ttk.Label(input_frame, text="ASTAP sti:").grid(row=1, column=0, sticky='w', padx=5, pady=5)
     self.astap_path_entry = ttk.Entry(input_frame, width=50)
     self.astap_path_entry.grid(row=1, column=1, padx=5, pady=5, sticky='ew')
-    self.astap_path_entry.insert(0, r"C:\Program Files\astap\astap.exe")
+    # DENASSI_PLATESOLVER kan pege på en anden ASTAP eller 'lokal:<katalog.npz>' (fx på Linux)
+    self.astap_path_entry.insert(0, os.environ.get('DENASSI_PLATESOLVER', r"C:\Program Files\astap\astap.exe"))
     ttk.Button(input_frame, text="Vælg Fil", 
               command=self.select_astap_path).grid(row=1, column=2, padx=5, pady=5)
     
@@ -101,15 +139,64 @@ def create_image_analysis_tab(self, notebook):
                                                      textvariable=self.tracking_pixelsum_radius, width=10)
     self.tracking_pixelsum_radius_entry.grid(row=3, column=1, padx=5, pady=5, sticky='w')
     ttk.Label(input_frame, text="pixels").grid(row=3, column=2, sticky='w', padx=5, pady=5)
-    
+
+    # Antal worker-processer (1 = seriel analyse)
+    cpu_count = os.cpu_count() or 1
+    ttk.Label(input_frame, text="Parallelle processer:").grid(row=4, column=0, sticky='w', padx=5, pady=5)
+    self.analysis_workers_var = tk.IntVar(value=max(1, min(4, cpu_count - 1)))
+    ttk.Spinbox(input_frame, from_=1, to=cpu_count, increment=1,
+                textvariable=self.analysis_workers_var, width=10).grid(row=4, column=1, padx=5, pady=5, sticky='w')
+    ttk.Label(input_frame, text=f"(1 = seriel, maks {cpu_count})").grid(row=4, column=2, sticky='w', padx=5, pady=5)
+
+    # ASTAP samtidighed og timeout pr. frame
+    ttk.Label(input_frame, text="ASTAP processer / timeout:").grid(row=5, column=0, sticky='w', padx=5, pady=5)
+    astap_settings_frame = ttk.Frame(input_frame)
+    astap_settings_frame.grid(row=5, column=1, padx=5, pady=5, sticky='w')
+    self.astap_workers_var = tk.IntVar(value=max(1, min(4, cpu_count)))
+    ttk.Spinbox(astap_settings_frame, from_=1, to=max(1, cpu_count), increment=1,
+                textvariable=self.astap_workers_var, width=5).pack(side='left')
+    self.astap_timeout_var = tk.IntVar(value=60)
+    ttk.Spinbox(astap_settings_frame, from_=5, to=600, increment=5,
+                textvariable=self.astap_timeout_var, width=6).pack(side='left', padx=(10, 0))
+    ttk.Label(input_frame, text="samtidige / sekunder pr. frame").grid(row=5, column=2, sticky='w', padx=5, pady=5)
+
+    # Tracking søgevindue omkring TLE-forudsagt position
+    ttk.Label(input_frame, text="Tracking ROI (halv bredde):").grid(row=6, column=0, sticky='w', padx=5, pady=5)
+    self.tracking_roi_var = tk.IntVar(value=400)
+    ttk.Spinbox(input_frame, from_=0, to=4000, increment=50,
+                textvariable=self.tracking_roi_var, width=10).grid(row=6, column=1, padx=5, pady=5, sticky='w')
+    ttk.Label(input_frame, text="pixels (0 = hele billedet)").grid(row=6, column=2, sticky='w', padx=5, pady=5)
+
+    # Forhåndsscreening af ubrugelige frames før plate solving og detektion
+    ttk.Label(input_frame, text="Forhåndsscreening:").grid(row=7, column=0, sticky='w', padx=5, pady=5)
+    prescreen_frame = ttk.Frame(input_frame)
+    prescreen_frame.grid(row=7, column=1, padx=5, pady=5, sticky='w')
+    self.prescreen_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(prescreen_frame, variable=self.prescreen_var).pack(side='left')
+    self.prescreen_min_stars_var = tk.IntVar(value=FORSCREENING_GRAENSER['min_stjerner'])
+    ttk.Spinbox(prescreen_frame, from_=0, to=500, increment=5,
+                textvariable=self.prescreen_min_stars_var, width=5).pack(side='left', padx=(10, 0))
+    self.prescreen_max_saturation_var = tk.DoubleVar(value=FORSCREENING_GRAENSER['max_maettet'] * 100)
+    ttk.Spinbox(prescreen_frame, from_=0, to=100, increment=0.5,
+                textvariable=self.prescreen_max_saturation_var, width=6).pack(side='left', padx=(10, 0))
+    ttk.Label(input_frame, text="min. stjerner / maks. % mættede pixels").grid(row=7, column=2, sticky='w', padx=5, pady=5)
+
     # Output indstillinger
     output_frame = ttk.LabelFrame(input_frame, text="Output Indstillinger")
-    output_frame.grid(row=4, column=0, columnspan=3, sticky='ew', padx=5, pady=5)
+    output_frame.grid(row=8, column=0, columnspan=3, sticky='ew', padx=5, pady=5)
     
     self.save_plots_var = tk.BooleanVar(value=True)  # Standard til True da vi altid vil vise plots i GUI
     ttk.Checkbutton(output_frame, text="Gem plots som billeder og vis i GUI", 
                    variable=self.save_plots_var).grid(row=0, column=0, sticky='w', padx=5, pady=2)
     
+    self.live_analysis_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(output_frame, text="Live analyse af sessionsmappen under LeapFrog/Tracking observation",
+                   variable=self.live_analysis_var).grid(row=1, column=0, sticky='w', padx=5, pady=2)
+    
+    self.incremental_wcs_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(output_frame, text="Inkrementel astrometri (LeapFrog frames løses ud fra forrige frame + mount delta)",
+                   variable=self.incremental_wcs_var).grid(row=2, column=0, sticky='w', padx=5, pady=2)
+    
     # Gør kolonne 1 stretchable
     input_frame.grid_columnconfigure(1, weight=1)
     
@@ -188,6 +275,9 @@ def create_image_analysis_tab(self, notebook):
 
 def analysis_log_message(self, message):
     """Tilføj besked til analyse log"""
+    if isinstance(self, HeadlessAnalyseKontekst):
+        self.log(message)
+        return
     timestamp = datetime.now().strftime('%H:%M:%S')
     self.analysis_log_text.insert(tk.END, f"[{timestamp}] {message}\n")
     self.analysis_log_text.see(tk.END)
@@ -235,8 +325,8 @@ def select_analysis_directory(self):
 def select_astap_path(self):
     """Vælg ASTAP executable"""
     filepath = filedialog.askopenfilename(
-        title="Vælg ASTAP executable",
-        filetypes=[("Executable files", "*.exe"), ("All files", "*.*")],
+        title="Vælg ASTAP executable eller lokalt katalog",
+        filetypes=[("Executable files", "*.exe"), ("Lokalt katalog (indbygget solver)", "*.npz"), ("All files", "*.*")],
         initialdir=r"C:\Program Files\astap"
     )
     if filepath:
@@ -257,8 +347,9 @@ def start_image_analysis(self):
         messagebox.showerror("Fejl", "Vælg en gyldig mappe med billeder")
         return
     
-    if not astap_path or not os.path.exists(astap_path):
-        messagebox.showerror("Fejl", "Vælg en gyldig ASTAP executable")
+    from Func_PlateSolve import solver_tilgaengelig
+    if not solver_tilgaengelig(astap_path):
+        messagebox.showerror("Fejl", "Vælg en gyldig ASTAP executable eller et lokalt katalog (lokal:<katalog.npz>)")
         return
     
     try:
@@ -307,36 +398,7 @@ def run_image_analysis(self):
         pixelscale = float(self.pixelscale_entry.get())
         save_plots = self.save_plots_var.get()
         
-        # Find FITS filer
-        fits_files = sorted([f for f in os.listdir(directory) if f.lower().endswith('.fits')])
-        analysis_log_message(self, f"Fundet {len(fits_files)} FITS filer")
-        
-        # Analyser første fil for at bestemme observation type
-        first_file = os.path.join(directory, fits_files[0])
-        with fits.open(first_file) as hdul:
-            header = hdul[0].header
-        
-        obstype = header.get('OBSTYPE', 'Unknown')
-        sat_name = header.get('OBJECT', 'Unknown')
-        norad_id = header.get('NORAD_ID', 'Unknown')
-        
-        analysis_log_message(self, f"Observation type: {obstype}")
-        analysis_log_message(self, f"Satellit: {sat_name} (NORAD: {norad_id})")
-        
-        # Opret output CSV navn
-        output_filename = f"data_{sat_name}_{norad_id}.csv"
-        output_path = os.path.join(directory, output_filename)
-        
-        if obstype == 'LeapFrog':
-            result_df = analyze_leapfrog_images(self, directory, fits_files, astap_path, pixelscale, save_plots)
-        elif obstype == 'Tracking' or obstype == 'stjernehimmel':
-            result_df = analyze_tracking_images(self, directory, fits_files, astap_path, pixelscale, save_plots)
-        else:
-            raise ValueError(f"Ukendt observation type: {obstype}")
-        
-        # Gem resultater
-        result_df.to_csv(output_path, index=False)
-        analysis_log_message(self, f"Resultater gemt i: {output_filename}")
+        analyse_session(self, directory, astap_path, pixelscale, save_plots)
         
         if not self.stop_image_analysis:
             analysis_log_message(self, "Billede analyse fuldført!")
@@ -354,210 +416,612 @@ def run_image_analysis(self):
         self.stop_analysis_btn.config(state='disabled')
         self.analysis_progress_var.set(0)
 
+def analyse_session(self, directory, astap_path, pixelscale, save_plots):
+    """Analyser én sessionsmappe og gem data_<sat>_<norad>.csv (+ Parquet).
+    Bruges af GUI'en og af den headless batch analyse - returnerer stien til CSV'en"""
+    # Find FITS filer via sessionens frame index (headers læses kun for filer der mangler i indexet)
+    session_index = load_index(directory)
+    fits_files = session_index['filename'].tolist()
+    analysis_log_message(self, f"Fundet {len(fits_files)} FITS filer")
+    if not fits_files:
+        raise ValueError(f"Ingen FITS filer i {directory}")
+    
+    # Første frame bestemmer observation type
+    header = session_index.iloc[0]
+    
+    obstype = header.get('OBSTYPE') or 'Unknown'
+    sat_name = header.get('OBJECT') or 'Unknown'
+    norad_id = header.get('NORAD_ID') or 'Unknown'
+    
+    analysis_log_message(self, f"Observation type: {obstype}")
+    analysis_log_message(self, f"Satellit: {sat_name} (NORAD: {norad_id})")
+    
+    # Opret output CSV navn
+    output_filename = f"data_{sat_name}_{norad_id}.csv"
+    output_path = os.path.join(directory, output_filename)
+    
+    if obstype not in ('LeapFrog', 'Tracking', 'stjernehimmel'):
+        raise ValueError(f"Ukendt observation type: {obstype}")
+    
+    # Journal over færdige frames - en stoppet eller nedbrudt kørsel genoptages herfra
+    journal = AnalyseJournal(directory, {
+        'obstype': 'LeapFrog' if obstype == 'LeapFrog' else 'Tracking', 'astap': astap_path,
+        'pixelscale': pixelscale, 'incremental_wcs': get_incremental_wcs(self),
+        'roi_radius': get_tracking_roi_radius(self), 'pixelsum_radius': self.tracking_pixelsum_radius.get()})
+    if len(journal) or journal.forældede:
+        analysis_log_message(self, journal.summary())
+    
+    # Diagnostiske plots renderes i baggrunden mens detektionen fortsætter
+    self.plot_koe = PlotKoe() if save_plots else None
+    if self.plot_koe is not None and not isinstance(self, HeadlessAnalyseKontekst):
+        self.root.after(0, lambda koe=self.plot_koe: vis_plots_loebende(self, koe))
+    try:
+        if obstype == 'LeapFrog':
+            result_df = analyze_leapfrog_images(self, directory, fits_files, astap_path, pixelscale, save_plots, journal)
+        else:
+            result_df = analyze_tracking_images(self, directory, fits_files, astap_path, pixelscale, save_plots, journal)
+    finally:
+        if self.plot_koe is not None:
+            self.plot_koe.luk(wait=not self.stop_image_analysis)
+            analysis_log_message(self, self.plot_koe.summary())
+            self.plot_koe = None
+    
+    # Gem resultater
+    result_df.to_csv(output_path, index=False)
+    analysis_log_message(self, f"Resultater gemt i: {output_filename}")
+    try:
+        if write_result(result_df, output_path) is not None:
+            analysis_log_message(self, f"Kolonneformat gemt ({size_summary(output_path)})")
+    except Exception as e:
+        analysis_log_message(self, f"Kunne ikke skrive Parquet resultat: {str(e)}")
+    
+    if not self.stop_image_analysis:
+        journal.slet()
+    
+    rss = peak_rss_mb()
+    if rss is not None:
+        analysis_log_message(self, f"Peak RSS (analyse proces): {rss:.0f} MB")
+    return output_path
+
+def get_astap_settings(self):
+    """Hent antal samtidige ASTAP processer og timeout pr. frame fra GUI"""
+    try:
+        workers = max(1, int(self.astap_workers_var.get()))
+    except (AttributeError, ValueError, tk.TclError):
+        workers = 4
+    try:
+        timeout = max(1.0, float(self.astap_timeout_var.get()))
+    except (AttributeError, ValueError, tk.TclError):
+        timeout = 60.0
+    return workers, timeout
+
 def run_astap_on_directory(self, directory, astap_exe=r"C:\Program Files\astap\astap.exe"):
     """Kør ASTAP på alle FITS filer i en mappe og returner resultater som DataFrame"""
+    from Func_PlateSolve import solve_directory_stream, PlateSolveCache
+    
+    workers, timeout = get_astap_settings(self)
+    cache = PlateSolveCache(directory)
     results = []
-
-    # find alle fits filer
-    for filename in os.listdir(directory):
-        if filename.lower().endswith(".fits"):
-            filepath = os.path.join(directory, filename)
-            wcsfile = os.path.join(directory, filename.replace(".fits", ".wcs"))
-
-            # kør astap
-            result = subprocess.run(
-                [astap_exe, "-f", filepath, "-wcs", wcsfile],
-                capture_output=True, text=True
-            )
-
-            if result.returncode != 0:
-                analysis_log_message(self, f"ASTAP fejlede for {filename}: {result.stderr}")
-                continue
-            else:
-                analysis_log_message(self, f"ASTAP gennemført for {filename}")
-
-            # læs header fra wcs-filen
-            if os.path.exists(wcsfile):
-                with fits.open(wcsfile) as hdul:
-                    header = hdul[0].header
-                    
-
-                # konverter header til dict
-                header_dict = {k: header[k] for k in header.keys() if k != ''}
-
-                # tilføj filnavn
-                header_dict["filename"] = filename
-
-                results.append(header_dict)
-                os.remove(wcsfile)
-
+    
+    for filename, header_dict, besked in solve_directory_stream(
+            astap_exe, directory, max_workers=workers, timeout=timeout,
+            stop_check=lambda: self.stop_image_analysis, cache=cache):
+        if header_dict is None:
+            analysis_log_message(self, f"ASTAP fejlede for {filename}: {besked}")
+            continue
+        analysis_log_message(self, f"ASTAP gennemført for {filename} ({besked})")
+        
+        # tilføj filnavn
+        header_dict["filename"] = filename
+        results.append(header_dict)
+    
+    analysis_log_message(self, cache.summary())
+    
     # lav dataframe af alle headere
-    df = pd.DataFrame(results)
+    return pd.DataFrame(results)
 
-    # Slet alle .ini-filer i output-mappen (ASTAP kan have lavet dem)
-    for f in os.listdir(directory):
-        if f.lower().endswith('.ini'):
-            try:
-                os.remove(os.path.join(directory, f))
-            except Exception:
-                pass
+def is_starfield_reference(filename, header=None):
+    """Er filen et stjernehimmel referencebillede (Tracking fanen eller observationsplanen)?"""
+    navn = filename.lower()
+    if 'starfield_ref' in navn or navn.startswith('stjernehimmel'):
+        return True
+    return header is not None and header.get('OBSTYPE', '') == 'stjernehimmel'
 
-    return df
+def beregn_observatoer_eci(file_data):
+    """Beregn observatørens ECI position (km) fra LAT/LONG/ELEV-OBS og DATE-OBS"""
+    from skyfield.api import wgs84
+    from Func_Ephemeris import get_timescale
+    
+    ts = get_timescale()
+    obs_time_str = file_data.get('DATE-OBS', '')
+    
+    # Parse tidspunkt
+    if 'T' in obs_time_str:
+        obs_dt = datetime.strptime(obs_time_str, '%Y-%m-%dT%H:%M:%S.%f')
+    else:
+        obs_dt = datetime.strptime(obs_time_str, '%Y-%m-%d %H:%M:%S.%f')
+    
+    t = ts.utc(obs_dt.year, obs_dt.month, obs_dt.day, 
+              obs_dt.hour, obs_dt.minute, obs_dt.second + obs_dt.microsecond/1e6)
+    
+    # Beregn ECI position
+    lat = file_data.get('LAT-OBS', 0)
+    lon = file_data.get('LONG-OBS', 0)
+    ele = file_data.get('ELEV-OBS', 0)
+    
+    earth_location = wgs84.latlon(lat, lon, ele)
+    return earth_location.at(t).position.km
 
-def analyze_leapfrog_images(self, directory, fits_files, astap_path, pixelscale, save_plots):
-    """Analyser LeapFrog billeder"""
-    analysis_log_message(self, "Starter LeapFrog analyse...")
+def forudsig_satellit_pixel(file_data, header_row):
+    """Forudsig satellittens pixelposition (x, y) ud fra TLE1/TLE2, DATE-OBS og observatøren i
+    headeren og frame WCS (header_row). Topocentrisk astrometrisk RA/DEC (J2000 som mountens RA/DEC)"""
+    from Func_Propagering import topocentrisk
+    from Func_WCS import radec_to_pixel_batch
     
-    if not SKIMAGE_AVAILABLE:
-        raise ImportError("Manglende biblioteker: skimage, cv2, scipy")
+    tle1, tle2 = file_data.get('TLE1'), file_data.get('TLE2')
+    if not tle1 or not tle2:
+        raise ValueError("TLE1/TLE2 mangler i headeren")
     
+    ud = topocentrisk([(tle1, tle2)], [file_data['DATE-OBS']], file_data.get('LAT-OBS', 0),
+                      file_data.get('LONG-OBS', 0), file_data.get('ELEV-OBS', 0))
+    
+    x, y = radec_to_pixel_batch(ud['ra_deg'][0], ud['dec_deg'][0], header_row)
+    return float(x[0]), float(y[0])
+
+def process_leapfrog_frame(self, directory, filename, index, astap_row, save_plots, platesolve_fejl=None):
+    """Behandl én LeapFrog frame: ECI, linjefinding og RA/DEC. Returnerer række som dict.
+    Fejlede plate solving (platesolve_fejl = solverens besked) analyseres uden WCS og markeres i
+    rækken, så en genoptaget analyse prøver framen igen"""
     from Func_fagprojekt import pixel_to_radec, compute_cd
     
-    results = []
-    total_files = len(fits_files)
+    filepath = os.path.join(directory, filename)
     
-    # Kør ASTAP på alle billeder først
-    analysis_log_message(self, "Kører ASTAP plate solving på alle billeder...")
     try:
-        df_astap = run_astap_on_directory(self, directory, astap_path)
-        analysis_log_message(self, f"ASTAP gennemført på {len(df_astap)} billeder")
+        # Læs FITS fil og header (memmap, read-only view i native dtype - ingen float32 kopi)
+        image_data, header = read_frame(filepath)
+        
+        # Udtræk alle headers fra FITS-filen med deres originale navne
+        file_data = dict(header)
+        # Tilføj filnavn (fra FITS er det ikke med)
+        file_data['filename'] = filename
+        if platesolve_fejl is not None:
+            file_data['platesolve_fejl'] = platesolve_fejl
+        
+        # Beregn observatørens ECI position fra lat/lon/ele og tidspunkt
+        try:
+            eci_pos = beregn_observatoer_eci(file_data)
+            file_data['X_obs'] = eci_pos[0]
+            file_data['Y_obs'] = eci_pos[1]
+            file_data['Z_obs'] = eci_pos[2]
+        except Exception as e:
+            analysis_log_message(self, f"  Advarsel: Kunne ikke beregne ECI position: {str(e)}")
+            file_data['X_obs'] = np.nan
+            file_data['Y_obs'] = np.nan
+            file_data['Z_obs'] = np.nan
+        
+        # Find satellitlinje med billedbehandling
+        sat_coords = find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath, index)
+        file_data.update(sat_coords)
+        
+        # Opdater observationstid hvis vi har en korrigeret tid
+        if sat_coords.get('corrected_obs_time'):
+            diff = (pd.to_datetime(sat_coords['corrected_obs_time']) - pd.to_datetime(file_data['DATE-OBS'])).total_seconds()
+            analysis_log_message(self, f"ændrede DATE-OBS med {diff} s")
+            file_data['DATE-OBS'] = sat_coords['corrected_obs_time']
+        
+        # Tilføj ASTAP WCS data hvis tilgængeligt
+        if astap_row is not None:
+            file_data['CRPIX1'] = astap_row.get('CRPIX1', np.nan)
+            file_data['CRPIX2'] = astap_row.get('CRPIX2', np.nan)
+            file_data['CRVAL1'] = astap_row.get('CRVAL1', np.nan)
+            file_data['CRVAL2'] = astap_row.get('CRVAL2', np.nan)
+            file_data['CD1_1'] = astap_row.get('CD1_1', np.nan)
+            file_data['CD1_2'] = astap_row.get('CD1_2', np.nan)
+            file_data['CD2_1'] = astap_row.get('CD2_1', np.nan)
+            file_data['CD2_2'] = astap_row.get('CD2_2', np.nan)
+            file_data['CROTA2_ASTAP'] = astap_row.get('CROTA2', np.nan)
+            
+            # Konverter pixel koordinater til RA/DEC hvis vi har både WCS og satellit position
+            if not np.isnan(file_data.get('x_sat', np.nan)) and not np.isnan(file_data['CRVAL1']):
+                try:
+                    x_sat = file_data['x_sat']
+                    y_sat = file_data['y_sat']
+                    ra_sat, dec_sat = pixel_to_radec(x_sat, y_sat, astap_row)
+                    file_data['Sat_RA_Behandlet'] = ra_sat
+                    file_data['Sat_DEC_Behandlet'] = dec_sat
+                    analysis_log_message(self, f"Satellit RA/DEC: {ra_sat:.6f}°, {dec_sat:.6f}°\n =============================")
+
+                    
+                    # Beregn selvberegnet CD matrix til sammenligning
+                    cdelt1 = astap_row.get('CDELT1', np.nan)
+                    cdelt2 = astap_row.get('CDELT2', np.nan)
+                    crota2 = astap_row.get('CROTA2', 0)
+                    dec_tel = file_data.get('DEC', 0)
+                    
+                    if not np.isnan(cdelt1) and not np.isnan(cdelt2):
+                        cd11_python, cd12_python, cd21_python, cd22_python = compute_cd(
+                            cdelt1, cdelt2, crota2, dec_tel
+                        )
+                        file_data['CD1_1_python'] = cd11_python
+                        file_data['CD1_2_python'] = cd12_python
+                        file_data['CD2_1_python'] = cd21_python
+                        file_data['CD2_2_python'] = cd22_python
+                except Exception as e:
+                    analysis_log_message(self, f"  Fejl ved RA/DEC konvertering: {str(e)}")
+        
+        return file_data
+        
     except Exception as e:
-        analysis_log_message(self, f"ADVARSEL: ASTAP fejlede: {str(e)}")
-        df_astap = None
+        analysis_log_message(self, f"Fejl i fil {filename}: {str(e)}")
+        # Tom række for at bevare rækkefølge
+        return {'filename': filename, 'error': str(e)}
+
+def process_tracking_frame(self, directory, filename, index, ref_offset, pixelscale, save_plots, roi_radius=0):
+    """Behandl én Tracking frame: ECI, CD matrix, positionsfinding og RA/DEC. Returnerer række som dict.
+    Med roi_radius > 0 søges satellitten kun omkring den TLE-forudsagte pixelposition"""
+    from Func_fagprojekt import pixel_to_radec, compute_cd
     
-    for i, filename in enumerate(fits_files):
-        if self.stop_image_analysis:
-            break
+    filepath = os.path.join(directory, filename)
+    
+    try:
+        # Læs FITS fil og header (memmap, read-only view i native dtype - ingen float32 kopi)
+        image_data, header = read_frame(filepath)
         
-        analysis_log_message(self, f"Behandler LeapFrog fil {i+1}/{total_files}: {filename}")
-        self.analysis_progress_var.set((i / total_files) * 100)
+        # Udtræk alle headers fra FITS-filen med deres originale navne
+        file_data = dict(header)
+        # Tilføj filnavn (fra FITS er det ikke med)
+        file_data['filename'] = filename
         
-        filepath = os.path.join(directory, filename)
+        # Beregn observatørens ECI position fra lat/lon/ele og tidspunkt
+        try:
+            eci_pos = beregn_observatoer_eci(file_data)
+            file_data['X_obs'] = eci_pos[0]
+            file_data['Y_obs'] = eci_pos[1]
+            file_data['Z_obs'] = eci_pos[2]
+        except Exception as e:
+            analysis_log_message(self, f"  Advarsel: Kunne ikke beregne ECI position: {str(e)}")
+            file_data['X_obs'] = np.nan
+            file_data['Y_obs'] = np.nan
+            file_data['Z_obs'] = np.nan
+        
+        # Tilføj offset fra stjernehimmel reference
+        file_data.update(ref_offset)
         
+        # Beregn CD matrix for tracking billeder
+        # Tracking billeder har andre kolonnenavne end leapfrog
         try:
-            # Læs FITS fil og header
-            with fits.open(filepath) as hdul:
-                image_data = hdul[0].data.astype(np.float32)
-                header = hdul[0].header
+            # Hent pixel scale - skal justeres for binning
+            xbinning = file_data.get('XBINNING', 1)
+            ybinning = file_data.get('YBINNING', 1)
+            cdelt1 = pixelscale * xbinning  # grader per pixel
+            cdelt2 = pixelscale * ybinning
             
-            # Udtræk alle headers fra FITS-filen med deres originale navne
-            file_data = dict(header)
-            # Tilføj filnavn (fra FITS er det ikke med)
-            file_data['filename'] = filename
+            # CROTA2 er gemt som field_angle_degs i tracking billeder
+            # Hent CROTA2 fra header og tilføj rotation offset fra ASTAP
+            crota2_header = header.get('CROTA2', 0)
+            crota2 = crota2_header + ref_offset.get('rotation_offset', 0)
             
-            # Beregn observatørens ECI position fra lat/lon/ele og tidspunkt
-            try:
-                from skyfield.api import load, wgs84
-                from astropy.time import Time
-                
-                ts = load.timescale()
-                obs_time_str = file_data.get('DATE-OBS', '')
-                
-                # Parse tidspunkt
-                if 'T' in obs_time_str:
-                    obs_dt = datetime.strptime(obs_time_str, '%Y-%m-%dT%H:%M:%S.%f')
-                else:
-                    obs_dt = datetime.strptime(obs_time_str, '%Y-%m-%d %H:%M:%S.%f')
-                
-                t = ts.utc(obs_dt.year, obs_dt.month, obs_dt.day, 
-                          obs_dt.hour, obs_dt.minute, obs_dt.second + obs_dt.microsecond/1e6)
-                
-                # Beregn ECI position
-                lat = file_data.get('LAT-OBS', 0)
-                lon = file_data.get('LONG-OBS', 0)
-                ele = file_data.get('ELEV-OBS', 0)
-                
-                earth_location = wgs84.latlon(lat, lon, ele)
-                eci_pos = earth_location.at(t).position.km
-                
-                file_data['X_obs'] = eci_pos[0]
-                file_data['Y_obs'] = eci_pos[1]
-                file_data['Z_obs'] = eci_pos[2]
-                
-            except Exception as e:
-                analysis_log_message(self, f"  Advarsel: Kunne ikke beregne ECI position: {str(e)}")
-                file_data['X_obs'] = np.nan
-                file_data['Y_obs'] = np.nan
-                file_data['Z_obs'] = np.nan
+            analysis_log_message(self, f"CROTA2 fra header: {crota2_header:.3f}°, offset: {ref_offset.get('rotation_offset', 0):.3f}°, bruger: {crota2:.3f}°")
             
-            # Find satellitlinje med billedbehandling
-            sat_coords = find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath, i)
-            file_data.update(sat_coords)
+            # Beregn reference pixels (center af billede)
+            crpix1 = file_data.get('NAXIS1', 0) / 2.0
+            crpix2 = file_data.get('NAXIS2', 0) / 2.0
             
-            # Opdater observationstid hvis vi har en korrigeret tid
-            if sat_coords.get('corrected_obs_time'):
-                diff = (pd.to_datetime(sat_coords['corrected_obs_time']) - pd.to_datetime(file_data['DATE-OBS'])).total_seconds()
-                analysis_log_message(self, f"ændrede DATE-OBS med {diff} s")
-                file_data['DATE-OBS'] = sat_coords['corrected_obs_time']
+            # Beregn reference værdi (teleskopets pointing med offset)
+            crval1 = file_data.get('RA', 0) + ref_offset.get('ra_offset', 0)
+            crval2 = file_data.get('DEC', 0) + ref_offset.get('dec_offset', 0)
             
-            # Tilføj ASTAP WCS data hvis tilgængeligt
-            if df_astap is not None and filename in df_astap['filename'].values:
-                astap_row = df_astap[df_astap['filename'] == filename].iloc[0]
-                file_data['CRPIX1'] = astap_row.get('CRPIX1', np.nan)
-                file_data['CRPIX2'] = astap_row.get('CRPIX2', np.nan)
-                file_data['CRVAL1'] = astap_row.get('CRVAL1', np.nan)
-                file_data['CRVAL2'] = astap_row.get('CRVAL2', np.nan)
-                file_data['CD1_1'] = astap_row.get('CD1_1', np.nan)
-                file_data['CD1_2'] = astap_row.get('CD1_2', np.nan)
-                file_data['CD2_1'] = astap_row.get('CD2_1', np.nan)
-                file_data['CD2_2'] = astap_row.get('CD2_2', np.nan)
-                file_data['CROTA2_ASTAP'] = astap_row.get('CROTA2', np.nan)
-                
-                # Konverter pixel koordinater til RA/DEC hvis vi har både WCS og satellit position
-                if not np.isnan(file_data.get('x_sat', np.nan)) and not np.isnan(file_data['CRVAL1']):
-                    try:
-                        x_sat = file_data['x_sat']
-                        y_sat = file_data['y_sat']
-                        ra_sat, dec_sat = pixel_to_radec(x_sat, y_sat, astap_row)
-                        file_data['Sat_RA_Behandlet'] = ra_sat
-                        file_data['Sat_DEC_Behandlet'] = dec_sat
-                        analysis_log_message(self, f"Satellit RA/DEC: {ra_sat:.6f}°, {dec_sat:.6f}°\n =============================")
+            # Beregn CD matrix
+            cd11, cd12, cd21, cd22 = compute_cd(
+                cdelt1, cdelt2, crota2, crval2
+            )
+            
+            file_data['CDELT1'] = cdelt1
+            file_data['CDELT2'] = cdelt2
+            file_data['CROTA2'] = crota2
+            file_data['CRPIX1'] = crpix1
+            file_data['CRPIX2'] = crpix2
+            file_data['CRVAL1'] = crval1
+            file_data['CRVAL2'] = crval2
+            file_data['CD1_1'] = cd11
+            file_data['CD1_2'] = cd12
+            file_data['CD2_1'] = cd21
+            file_data['CD2_2'] = cd22
+            
+        except Exception as e:
+            analysis_log_message(self, f"  Fejl ved CD matrix beregning: {str(e)}")
+        
+        # WCS for frame (mount pointing + reference offset) som en række der ligner astap_row
+        header_row = None
+        if 'CD1_1' in file_data:
+            header_row = pd.Series({key: file_data[key] for key in
+                                    ('CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2', 'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2')})
+        
+        # Find satellitposition
+        if not is_starfield_reference(filename, header):  # Skip reference billede
+            roi_center = None
+            if roi_radius > 0:
+                try:
+                    if header_row is None:
+                        raise ValueError("ingen WCS for frame")
+                    roi_center = forudsig_satellit_pixel(file_data, header_row)
+                    file_data['x_pred'], file_data['y_pred'] = roi_center
+                except Exception as e:
+                    analysis_log_message(self, f"  ROI fallback: kunne ikke forudsige position fra TLE ({str(e)}) - søger hele billedet")
+            
+            sat_coords = find_satellite_position_tracking(
+                self, image_data, header, pixelscale, save_plots, filepath, index,
+                roi_center=roi_center, roi_radius=roi_radius)
+            file_data.update(sat_coords)
+            
+            # Konverter pixel koordinater til RA/DEC hvis vi har position
+            if not np.isnan(file_data.get('x_sat', np.nan)) and header_row is not None:
+                try:
+                    x_sat = file_data['x_sat']
+                    y_sat = file_data['y_sat']
+                    
+                    ra_sat, dec_sat = pixel_to_radec(x_sat, y_sat, header_row)
+                    file_data['Sat_RA_Behandlet'] = ra_sat
+                    file_data['Sat_DEC_Behandlet'] = dec_sat
+                    analysis_log_message(self, f"Satellit RA/DEC: {ra_sat:.6f}°, {dec_sat:.6f}°\n =============================")
+                except Exception as e:
+                    analysis_log_message(self, f"Fejl ved RA/DEC konvertering: {str(e)}")
+        
+        return file_data
+        
+    except Exception as e:
+        analysis_log_message(self, f"Fejl i fil {filename}: {str(e)}")
+        return {'filename': filename, 'error': str(e)}
 
-                        
-                        # Beregn selvberegnet CD matrix til sammenligning
-                        cdelt1 = astap_row.get('CDELT1', np.nan)
-                        cdelt2 = astap_row.get('CDELT2', np.nan)
-                        crota2 = astap_row.get('CROTA2', 0)
-                        dec_tel = file_data.get('DEC', 0)
-                        
-                        if not np.isnan(cdelt1) and not np.isnan(cdelt2):
-                            cd11_python, cd12_python, cd21_python, cd22_python = compute_cd(
-                                cdelt1, cdelt2, crota2, dec_tel
-                            )
-                            file_data['CD1_1_python'] = cd11_python
-                            file_data['CD1_2_python'] = cd12_python
-                            file_data['CD2_1_python'] = cd21_python
-                            file_data['CD2_2_python'] = cd22_python
-                    except Exception as e:
-                        analysis_log_message(self, f"  Fejl ved RA/DEC konvertering: {str(e)}")
+# Frame-funktioner der kan køres i worker-processer (slås op ved navn så opgaven kan pickles)
+FRAME_FUNKTIONER = {
+    'leapfrog': process_leapfrog_frame,
+    'tracking': process_tracking_frame,
+}
+
+def _frame_worker(opgave):
+    """Kør én frame i en worker-proces og returner
+    (index, række, log linjer, peak RSS i MB, Skyfield overhead i s, bestilte plots)"""
+    funktion_navn, index, kwargs, pixelsum_radius = opgave
+    kontekst = HeadlessAnalyseKontekst(pixelsum_radius=pixelsum_radius)
+    kontekst.plot_opgaver = []
+    overhead_start = ephemeris_overhead_seconds()
+    try:
+        række = FRAME_FUNKTIONER[funktion_navn](kontekst, index=index, **kwargs)
+    except Exception as e:
+        række = {'filename': kwargs.get('filename'), 'error': str(e)}
+    return (index, række, kontekst.log_lines, peak_rss_mb(), ephemeris_overhead_seconds() - overhead_start,
+            kontekst.plot_opgaver)
+
+def get_analysis_workers(self):
+    """Hent antal worker-processer fra GUI (1 = seriel analyse i tråden)"""
+    try:
+        workers = int(self.analysis_workers_var.get())
+    except (AttributeError, ValueError, tk.TclError):
+        return 1
+    return max(1, workers)
+
+def get_incremental_wcs(self):
+    """Skal LeapFrog sessioner løses som sekvens (inkrementel astrometri)?"""
+    try:
+        return bool(self.incremental_wcs_var.get())
+    except (AttributeError, tk.TclError):
+        return False
+
+def get_tracking_roi_radius(self):
+    """Halv bredde af Tracking søgevinduet omkring TLE-forudsigelsen (0 = hele billedet)"""
+    try:
+        return max(0, int(self.tracking_roi_var.get()))
+    except (AttributeError, ValueError, tk.TclError):
+        return 0
+
+def get_prescreen_settings(self):
+    """Grænser for forhåndsscreeningen fra GUI (None = slået fra)"""
+    try:
+        if not bool(self.prescreen_var.get()):
+            return None
+        graenser = dict(FORSCREENING_GRAENSER)
+        graenser['min_stjerner'] = max(0, int(self.prescreen_min_stars_var.get()))
+        graenser['max_maettet'] = max(0.0, float(self.prescreen_max_saturation_var.get())) / 100
+        return graenser
+    except (AttributeError, ValueError, tk.TclError):
+        return None
+
+def forscreen_frames(self, directory, filenames, obstype):
+    """Forhåndsscreen frames før plate solving/detektion.
+    Returnerer (screening mål pr. fil, filnavne der springes over) - tomme hvis slået fra"""
+    graenser = get_prescreen_settings(self)
+    if graenser is None or not filenames:
+        return {}, set()
+    t0 = time.perf_counter()
+    screening = screen_frames(directory, filenames, obstype, graenser, workers=os.cpu_count() or 1)
+    analysis_log_message(self, screening_summary(screening, graenser, time.perf_counter() - t0))
+    return screening, frasorterede(screening, graenser)
+
+def log_forscreening_besparelse(self, sprunget_over, analyseret, sekunder):
+    """Anslået sparet tid: frasorterede frames x gennemsnitlig tid pr. analyseret frame"""
+    if sprunget_over and analyseret:
+        pr_frame = sekunder / analyseret
+        analysis_log_message(self, f"Forhåndsscreening sparede ca. {len(sprunget_over) * pr_frame:.0f} s "
+                                   f"({len(sprunget_over)} frames a {pr_frame:.1f} s)")
+
+def run_frames(self, funktion_navn, fits_files, opgaver, label_tekst, journal=None):
+    """Kør frame-funktionen for alle opgaver - serielt eller i en process pool.
+    opgaver er en iterable af (index, kwargs) og må gerne levere frames løbende
+    (fx efterhånden som ASTAP bliver færdig). Resultater returneres altid i
+    fil-rækkefølge; stoppede frames udelades. Med en journal springes journalførte
+    frames over (deres rækker flettes ind) og hver ny frame journalføres med det samme."""
+    total_files = len(fits_files)
+    results = [None] * total_files
+    if journal is not None:
+        for i, filename in enumerate(fits_files):
+            results[i] = journal.rows.get(filename)
+    færdige = sum(r is not None for r in results)
+    workers = min(get_analysis_workers(self), max(1, total_files - færdige))
+    skyfield_overhead = []  # Sekunder pr. frame brugt på timescale/efemerider/satellitobjekter
+    
+    if workers <= 1:
+        for i, kwargs in opgaver:
+            if self.stop_image_analysis:
+                break
+            if results[i] is not None:
+                continue
+            
+            analysis_log_message(self, f"Behandler {label_tekst} fil {færdige+1}/{total_files}: {fits_files[i]}")
+            self.analysis_progress_var.set((færdige / total_files) * 100)
+            
+            overhead_start = ephemeris_overhead_seconds()
+            results[i] = FRAME_FUNKTIONER[funktion_navn](self, index=i, **kwargs)
+            skyfield_overhead.append(ephemeris_overhead_seconds() - overhead_start)
+            if journal is not None:
+                journal.append(results[i])
+            færdige += 1
+    else:
+        analysis_log_message(self, f"Kører {label_tekst} analyse parallelt med {workers} processer")
+        pixelsum_radius = self.tracking_pixelsum_radius.get()
+        
+        worker_peak_rss = []
+        
+        def modtag(future, index):
+            nonlocal færdige
+            try:
+                index, række, log_lines, rss, overhead, plot_opgaver = future.result()
+            except Exception as e:
+                # Framen beholdes som fejlrække (og prøves igen ved genoptagelse)
+                analysis_log_message(self, f"Fejl i worker-proces: {str(e)}")
+                række, log_lines, rss, overhead, plot_opgaver = {'filename': fits_files[index], 'error': str(e)}, [], None, None, []
             
-            results.append(file_data)
+            for plot_opgave in plot_opgaver:
+                bestil_plot(self, plot_opgave)
             
+            if rss is not None:
+                worker_peak_rss.append(rss)
+            if overhead is not None:
+                skyfield_overhead.append(overhead)
+            results[index] = række
+            if journal is not None:
+                journal.append(række)
+            færdige += 1
+            analysis_log_message(self, f"Færdig {label_tekst} fil {færdige}/{total_files}: {fits_files[index]}")
+            for line in log_lines:
+                analysis_log_message(self, f"  {line}")
+            self.analysis_progress_var.set((færdige / total_files) * 100)
+        
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        try:
+            ventende = {}  # future -> frame index
+            for i, kwargs in opgaver:
+                if self.stop_image_analysis:
+                    break
+                if results[i] is not None:
+                    continue
+                ventende[executor.submit(_frame_worker, (funktion_navn, i, kwargs, pixelsum_radius))] = i
+                
+                # Modtag færdige frames mens nye opgaver stadig bliver leveret
+                for future in [f for f in ventende if f.done()]:
+                    modtag(future, ventende.pop(future))
+            
+            for future in concurrent.futures.as_completed(ventende):
+                if self.stop_image_analysis:
+                    break
+                modtag(future, ventende[future])
+        finally:
+            if self.stop_image_analysis:
+                analysis_log_message(self, "Stopper worker-processer - afventende frames annulleres")
+            executor.shutdown(wait=not self.stop_image_analysis, cancel_futures=True)
+        
+        if worker_peak_rss:
+            analysis_log_message(self, f"Peak RSS pr. worker-proces: maks {max(worker_peak_rss):.0f} MB")
+    
+    if skyfield_overhead:
+        analysis_log_message(self, f"Skyfield overhead pr. frame: gennemsnit {np.mean(skyfield_overhead)*1000:.1f} ms, "
+                                   f"maks {max(skyfield_overhead)*1000:.1f} ms")
+    if workers <= 1:
+        analysis_log_message(self, ephemeris_summary())
+    
+    return [r for r in results if r is not None]
+
+def analyze_leapfrog_images(self, directory, fits_files, astap_path, pixelscale, save_plots, journal=None):
+    """Analyser LeapFrog billeder"""
+    analysis_log_message(self, "Starter LeapFrog analyse...")
+    
+    if not SKIMAGE_AVAILABLE:
+        raise ImportError("Manglende biblioteker: skimage, cv2, scipy")
+    
+    from Func_PlateSolve import solve_directory_stream, solve_directory_incremental, sekvens_summary, PlateSolveCache
+    
+    workers, timeout = get_astap_settings(self)
+    cache = PlateSolveCache(directory)
+    index_for_fil = {filename: i for i, filename in enumerate(fits_files)}
+    løste = 0
+    inkrementel = get_incremental_wcs(self)
+    sekvens_statistik = {}
+    # Journalførte frames skal hverken plate solves eller analyseres igen
+    mangler = [f for f in fits_files if journal is None or f not in journal]
+    screening, sprunget_over = forscreen_frames(self, directory, mangler, 'LeapFrog')
+    mangler = [f for f in mangler if f not in sprunget_over]
+    
+    def opgaver():
+        """Lever frames til detektion så snart ASTAP er færdig med dem"""
+        nonlocal løste
+        leveret = set()
+        try:
+            if inkrementel:
+                stream = solve_directory_incremental(astap_path, directory, mangler, timeout=timeout,
+                                                     stop_check=lambda: self.stop_image_analysis,
+                                                     cache=cache, statistik=sekvens_statistik)
+            else:
+                stream = solve_directory_stream(astap_path, directory, mangler, max_workers=workers,
+                                                timeout=timeout, stop_check=lambda: self.stop_image_analysis,
+                                                cache=cache)
+            for filename, header_dict, besked in stream:
+                if header_dict is None:
+                    analysis_log_message(self, f"ASTAP fejlede for {filename}: {besked}")
+                else:
+                    løste += 1
+                    analysis_log_message(self, f"ASTAP gennemført for {filename} ({besked})")
+                leveret.add(filename)
+                yield index_for_fil[filename], {'directory': directory, 'filename': filename,
+                                                'astap_row': header_dict, 'save_plots': save_plots,
+                                                'platesolve_fejl': besked if header_dict is None else None}
         except Exception as e:
-            analysis_log_message(self, f"Fejl i fil {filename}: {str(e)}")
-            # Tilføj tom række for at bevare rækkefølge
-            error_data = {'filename': filename, 'error': str(e)}
-            results.append(error_data)
+            # Fortsæt uden WCS for de frames ASTAP ikke nåede
+            analysis_log_message(self, f"ADVARSEL: ASTAP fejlede: {str(e)}")
+            for filename in mangler:
+                if filename not in leveret:
+                    yield index_for_fil[filename], {'directory': directory, 'filename': filename,
+                                                    'astap_row': None, 'save_plots': save_plots,
+                                                    'platesolve_fejl': str(e)}
+    
+    # ASTAP kører med op til `workers` samtidige processer og detektion starter på løste frames
+    if inkrementel:
+        analysis_log_message(self, f"Kører inkrementel astrometri (fuld løsning ved fallback, timeout {timeout:.0f} s)...")
+    else:
+        analysis_log_message(self, f"Kører ASTAP plate solving ({workers} samtidige, timeout {timeout:.0f} s)...")
+    t0 = time.perf_counter()
+    results = run_frames(self, 'leapfrog', fits_files, opgaver(), "LeapFrog", journal)
+    if screening:
+        log_forscreening_besparelse(self, sprunget_over, len(mangler), time.perf_counter() - t0)
+        results = flet_resultater(results, screening, sprunget_over, fits_files)
+    analysis_log_message(self, f"ASTAP gennemført på {løste} billeder")
+    if inkrementel:
+        analysis_log_message(self, sekvens_summary(sekvens_statistik))
+    analysis_log_message(self, cache.summary())
     
     self.analysis_progress_var.set(100)
     return pd.DataFrame(results)
 
-def analyze_tracking_images(self, directory, fits_files, astap_path, pixelscale, save_plots):
+def analyze_tracking_images(self, directory, fits_files, astap_path, pixelscale, save_plots, journal=None):
     """Analyser Tracking billeder"""
     analysis_log_message(self, "Starter Tracking analyse...")
     
     if not SKIMAGE_AVAILABLE:
         raise ImportError("Manglende biblioteker: skimage, cv2, scipy")
     
-    from Func_fagprojekt import pixel_to_radec, compute_cd
-    
-    results = []
-    total_files = len(fits_files)
-    
     # Find stjernehimmel reference billede
     starfield_ref = None
     for filename in fits_files:
-        if 'starfield_ref' in filename.lower():
+        if is_starfield_reference(filename):
             starfield_ref = filename
             break
     
@@ -569,147 +1033,24 @@ def analyze_tracking_images(self, directory, fits_files, astap_path, pixelscale,
         analysis_log_message(self, "Ingen stjernehimmel reference fundet - bruger standard offset")
         ref_offset = {'ra_offset': 0, 'dec_offset': 0, 'rotation_offset': 0}
     
-    for i, filename in enumerate(fits_files):
-        if self.stop_image_analysis:
-            break
-        
-        analysis_log_message(self, f"Behandler Tracking fil {i+1}/{total_files}: {filename}")
-        self.analysis_progress_var.set((i / total_files) * 100)
-        
-        filepath = os.path.join(directory, filename)
-        
-        try:
-            # Læs FITS fil og header
-            with fits.open(filepath) as hdul:
-                image_data = hdul[0].data.astype(np.float32)
-                header = hdul[0].header
-            
-            # Udtræk alle headers fra FITS-filen med deres originale navne
-            file_data = dict(header)
-            # Tilføj filnavn (fra FITS er det ikke med)
-            file_data['filename'] = filename
-            
-            # Beregn observatørens ECI position fra lat/lon/ele og tidspunkt
-            try:
-                from skyfield.api import load, wgs84
-                from astropy.time import Time
-                
-                ts = load.timescale()
-                obs_time_str = file_data.get('DATE-OBS', '')
-                
-                # Parse tidspunkt
-                if 'T' in obs_time_str:
-                    obs_dt = datetime.strptime(obs_time_str, '%Y-%m-%dT%H:%M:%S.%f')
-                else:
-                    obs_dt = datetime.strptime(obs_time_str, '%Y-%m-%d %H:%M:%S.%f')
-                
-                t = ts.utc(obs_dt.year, obs_dt.month, obs_dt.day, 
-                          obs_dt.hour, obs_dt.minute, obs_dt.second + obs_dt.microsecond/1e6)
-                
-                # Beregn ECI position
-                lat = file_data.get('LAT-OBS', 0)
-                lon = file_data.get('LONG-OBS', 0)
-                ele = file_data.get('ELEV-OBS', 0)
-                
-                earth_location = wgs84.latlon(lat, lon, ele)
-                eci_pos = earth_location.at(t).position.km
-                
-                file_data['X_obs'] = eci_pos[0]
-                file_data['Y_obs'] = eci_pos[1]
-                file_data['Z_obs'] = eci_pos[2]
-                
-            except Exception as e:
-                analysis_log_message(self, f"  Advarsel: Kunne ikke beregne ECI position: {str(e)}")
-                file_data['X_obs'] = np.nan
-                file_data['Y_obs'] = np.nan
-                file_data['Z_obs'] = np.nan
-            
-            # Tilføj offset fra stjernehimmel reference
-            file_data.update(ref_offset)
-            
-            # Beregn CD matrix for tracking billeder
-            # Tracking billeder har andre kolonnenavne end leapfrog
-            try:
-                # Hent pixel scale - skal justeres for binning
-                xbinning = file_data.get('XBINNING', 1)
-                ybinning = file_data.get('YBINNING', 1)
-                cdelt1 = pixelscale * xbinning  # grader per pixel
-                cdelt2 = pixelscale * ybinning
-                
-                # CROTA2 er gemt som field_angle_degs i tracking billeder
-                # Hent CROTA2 fra header og tilføj rotation offset fra ASTAP
-                crota2_header = header.get('CROTA2', 0)
-                crota2 = crota2_header + ref_offset.get('rotation_offset', 0)
-                
-                analysis_log_message(self, f"CROTA2 fra header: {crota2_header:.3f}°, offset: {ref_offset.get('rotation_offset', 0):.3f}°, bruger: {crota2:.3f}°")
-                
-                # Beregn reference pixels (center af billede)
-                crpix1 = file_data.get('NAXIS1', 0) / 2.0
-                crpix2 = file_data.get('NAXIS2', 0) / 2.0
-                
-                # Beregn reference værdi (teleskopets pointing med offset)
-                crval1 = file_data.get('RA', 0) + ref_offset.get('ra_offset', 0)
-                crval2 = file_data.get('DEC', 0) + ref_offset.get('dec_offset', 0)
-                
-                # Beregn CD matrix
-                cd11, cd12, cd21, cd22 = compute_cd(
-                    cdelt1, cdelt2, crota2, crval2
-                )
-                
-                file_data['CDELT1'] = cdelt1
-                file_data['CDELT2'] = cdelt2
-                file_data['CROTA2'] = crota2
-                file_data['CRPIX1'] = crpix1
-                file_data['CRPIX2'] = crpix2
-                file_data['CRVAL1'] = crval1
-                file_data['CRVAL2'] = crval2
-                file_data['CD1_1'] = cd11
-                file_data['CD1_2'] = cd12
-                file_data['CD2_1'] = cd21
-                file_data['CD2_2'] = cd22
-                
-            except Exception as e:
-                analysis_log_message(self, f"  Fejl ved CD matrix beregning: {str(e)}")
-            
-            # Find satellitposition
-            if 'starfield_ref' not in filename.lower():  # Skip reference billede
-                sat_coords = find_satellite_position_tracking(
-                    self, image_data, header, pixelscale, save_plots, filepath, i)
-                file_data.update(sat_coords)
-                
-                # Konverter pixel koordinater til RA/DEC hvis vi har position
-                if not np.isnan(file_data.get('x_sat', np.nan)) and 'CD1_1' in file_data:
-                    try:
-                        x_sat = file_data['x_sat']
-                        y_sat = file_data['y_sat']
-                        
-                        # Brug pixel_to_radec funktionen
-                        # Opret en Series der ligner astap_row
-                        import pandas as pd
-                        header_row = pd.Series({
-                            'CRPIX1': file_data['CRPIX1'],
-                            'CRPIX2': file_data['CRPIX2'],
-                            'CRVAL1': file_data['CRVAL1'],
-                            'CRVAL2': file_data['CRVAL2'],
-                            'CD1_1': file_data['CD1_1'],
-                            'CD1_2': file_data['CD1_2'],
-                            'CD2_1': file_data['CD2_1'],
-                            'CD2_2': file_data['CD2_2']
-                        })
-                        
-                        ra_sat, dec_sat = pixel_to_radec(x_sat, y_sat, header_row)
-                        file_data['Sat_RA_Behandlet'] = ra_sat
-                        file_data['Sat_DEC_Behandlet'] = dec_sat
-                        analysis_log_message(self, f"Satellit RA/DEC: {ra_sat:.6f}°, {dec_sat:.6f}°\n =============================")
-                    except Exception as e:
-                        analysis_log_message(self, f"Fejl ved RA/DEC konvertering: {str(e)}")
-            
-            results.append(file_data)
-            
-        except Exception as e:
-            analysis_log_message(self, f"Fejl i fil {filename}: {str(e)}")
-            error_data = {'filename': filename, 'error': str(e)}
-            results.append(error_data)
+    roi_radius = get_tracking_roi_radius(self)
+    if roi_radius > 0:
+        analysis_log_message(self, f"Søger satellitten i ROI på ±{roi_radius} px omkring TLE-forudsagt position")
+    
+    frame_kwargs = [{'directory': directory, 'filename': filename, 'ref_offset': ref_offset,
+                     'pixelscale': pixelscale, 'save_plots': save_plots, 'roi_radius': roi_radius}
+                    for filename in fits_files]
+    
+    # Stjernehimmel referencen screenes aldrig - den bruges til offset
+    mangler = [f for f in fits_files if f != starfield_ref and (journal is None or f not in journal)]
+    screening, sprunget_over = forscreen_frames(self, directory, mangler, 'Tracking')
+    opgaver = [(i, kwargs) for i, kwargs in enumerate(frame_kwargs) if fits_files[i] not in sprunget_over]
+    
+    t0 = time.perf_counter()
+    results = run_frames(self, 'tracking', fits_files, opgaver, "Tracking", journal)
+    if screening:
+        log_forscreening_besparelse(self, sprunget_over, len(mangler) - len(sprunget_over), time.perf_counter() - t0)
+        results = flet_resultater(results, screening, sprunget_over, fits_files)
     
     self.analysis_progress_var.set(100)
     return pd.DataFrame(results)
@@ -718,60 +1059,31 @@ def find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath,
     """Find satellitlinje i LeapFrog billeder med intelligent tidskorrektion"""
     try:
         
-        skalering = 4
         height, width = image_data.shape
-        height, width = height/skalering, width/skalering
         
-        # Nedskalerer billedet med cv2
-        data_small = cv2.resize(image_data, (0, 0), fx=1/skalering, fy=1/skalering)
-
-        # Gemmer til plot (kopier før ændringer)
-        data_plot = data_small.copy()
-        data_plot[data_plot > 1000] = 1000  # Clip høje værdier for bedre visning
-
-        # Fjern pixels under medianen+5
-        data_small[data_small < np.median(data_small)+5] = 0
-
-        # Fjern objekter bestående af mindre end 100 pixels
-        num_labels, labels_im = cv2.connectedComponents(data_small.astype(np.uint8))
-        # Beregn størrelsen af hver komponent vectoriseret
-        label_counts = np.bincount(labels_im.flat)
-        # Find labels der skal fjernes (mindre end 100 pixels)
-        small_labels = np.where(label_counts < 100)[0]
-        # Opret mask for alle små objekter på én gang
-        small_objects_mask = np.isin(labels_im, small_labels)
-        # Fjern alle små objekter i én operation
-        data_small[small_objects_mask] = 0
-
-        #gør billedet binært
-        _, binary_image = cv2.threshold(data_small, 1, 1, cv2.THRESH_BINARY)
-                
-        # Find linjer med Hough transform
-        binary_uint8 = (binary_image * 255).astype(np.uint8)
-        lines = cv2.HoughLinesP(binary_uint8, 1, np.pi / 180, threshold=100, 
-                               minLineLength=25*skalering, maxLineGap=10)
+        # Grov detektion på binnet billede, kollineære fragmenter lægges sammen og
+        # endepunkterne forfines med sub-pixel præcision på fuld opløsning (Func_Detektion)
+        streak = find_streak(image_data)
         
-        if lines is not None:
-            analysis_log_message(self, f"Antal linjer fundet: {len(lines)}")
+        if streak is not None:
+            analysis_log_message(self, f"Antal linjer fundet: {streak['antal_linjer']}")
         else:
             analysis_log_message(self, "❌ Ingen linjer fundet af Hough transform")
         
         result = {'antal_linjer': 0, 'x_sat': np.nan, 'y_sat': np.nan, 'corrected_obs_time': None}
         
-        if lines is not None:
-            antal_linjer = len(lines)
-            
-            best_line = max(lines, key=lambda l: np.hypot(l[0][2] - l[0][0], l[0][3] - l[0][1]))
-            x1, y1, x2, y2 = best_line[0]
+        if streak is not None:
+            antal_linjer = streak['antal_linjer']
+            x1, y1, x2, y2 = streak['x1'], streak['y1'], streak['x2'], streak['y2']
             
-            # Tjek om linje rammer billedkanten
-            edge_margin = 50
+            # Tjek om linje rammer billedkanten (200 px på en 4096 px frame, skaleret med framens størrelse)
+            edge_margin = streak_parametre(image_data.shape)[2]
             is_edge1 = (x1 < edge_margin or x1 > width - edge_margin or
                        y1 < edge_margin or y1 > height - edge_margin)
             is_edge2 = (x2 < edge_margin or x2 > width - edge_margin or
                        y2 < edge_margin or y2 > height - edge_margin)
             
-            analysis_log_message(self, f"Linje punkter:({x1:.0f},{y1:.0f})({x2:.0f},{y2:.0f})")
+            analysis_log_message(self, f"Linje punkter:({x1:.2f},{y1:.2f})({x2:.2f},{y2:.2f})")
             analysis_log_message(self, f"Kant: Punkt1={is_edge1}, Punkt2={is_edge2}")
             
             # === INTELLIGENT TIDSKORREKTION ===
@@ -798,17 +1110,15 @@ def find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath,
                     delta_obs_time = obs_time_slut - obs_time_start
                     obs_time_mid = obs_time_start + timedelta(seconds=delta_obs_time.total_seconds()/2)
                     
-                    # Beregn satellitretning med Skyfield ved midtertidspunkt
-                    from skyfield.api import load, EarthSatellite, wgs84
-                    ts = load.timescale()
+                    # Beregn satellitretning ved midtertidspunkt
+                    from Func_Ephemeris import get_timescale
+                    from Func_Propagering import topocentrisk
+                    ts = get_timescale()
                     t_mid = ts.utc(obs_time_mid.year, obs_time_mid.month, obs_time_mid.day, 
                                   obs_time_mid.hour, obs_time_mid.minute, obs_time_mid.second)
                     
-                    satellite = EarthSatellite(tle1, tle2, name='sat', ts=ts)
-                    observer = wgs84.latlon(latitude, longitude, elevation)
-                    difference = satellite - observer
-                    topocentric = difference.at(t_mid)
-                    enu_velocity = topocentric.velocity.km_per_s
+                    topocentric = topocentrisk([(tle1, tle2)], t_mid, latitude, longitude, elevation, med_hastighed=True)
+                    enu_velocity = topocentric['hastighed_km_s'][0, 0]
                     east_velocity = enu_velocity[0]
                     
                     analysis_log_message(self, f"Satellit bevæger sig mod {'øst' if east_velocity > 0 else 'vest'}")
@@ -856,8 +1166,8 @@ def find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath,
                                 corrected_obs_time = obs_time_slut
                     else:
                         # Ingen kant - brug midtpunkt og halv exposure tid
-                        mid_x = (x1 + x2) // 2
-                        mid_y = (y1 + y2) // 2
+                        mid_x = (x1 + x2) / 2
+                        mid_y = (y1 + y2) / 2
                         corrected_obs_time = obs_time_start + pd.Timedelta(seconds=delta_obs_time.total_seconds()/2)
                         analysis_log_message(self, f"Ingen kant - midtpunkt, +{delta_obs_time.total_seconds()/2:.2f} sek")
                         
@@ -870,8 +1180,8 @@ def find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath,
                         else:
                             mid_x, mid_y = x1, y1
                     else:
-                        mid_x = (x1 + x2) // 2
-                        mid_y = (y1 + y2) // 2
+                        mid_x = (x1 + x2) / 2
+                        mid_y = (y1 + y2) / 2
             else:
                 # Manglende header data - brug standard metode
                 if is_edge1 or is_edge2:
@@ -880,14 +1190,14 @@ def find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath,
                     else:
                         mid_x, mid_y = x1, y1
                 else:
-                    mid_x = (x1 + x2) // 2
-                    mid_y = (y1 + y2) // 2
+                    mid_x = (x1 + x2) / 2
+                    mid_y = (y1 + y2) / 2
             
             result = {
                 'antal_linjer': antal_linjer,
-                'x_sat': mid_x*skalering,
-                'y_sat': mid_y*skalering,
-                'x1': x1*skalering, 'y1': y1*skalering, 'x2': x2*skalering, 'y2': y2*skalering,
+                'x_sat': mid_x,
+                'y_sat': mid_y,
+                'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
                 'corrected_obs_time': corrected_obs_time.strftime('%Y-%m-%dT%H:%M:%S.%f') if corrected_obs_time else None,
                 'rotation_angle': rotation_angle  # Tilføj rotation vinkel til plotting
             }
@@ -905,66 +1215,58 @@ def find_satellite_line_leapfrog(self, image_data, header, save_plots, filepath,
         analysis_log_message(self, f"Fejl ved linjefinding: {str(e)}")
         return {'antal_linjer': 0, 'x_sat': np.nan, 'y_sat': np.nan, 'corrected_obs_time': None, 'error': str(e)}
 
-def find_satellite_position_tracking(self, image_data, header, pixelscale, save_plots, filepath, csv_index=None):
-    """Find satellitposition i Tracking billeder"""
+def find_satellite_position_tracking(self, image_data, header, pixelscale, save_plots, filepath, csv_index=None,
+                                     roi_center=None, roi_radius=0):
+    """Find satellitposition i Tracking billeder.
+    Med roi_center=(x, y) (forudsagt fra TLE) og roi_radius > 0 søges kun i et vindue på
+    (2*roi_radius+1)² pixels omkring forudsigelsen; findes intet dér, søges hele billedet."""
     try:
-        # Find lyseste objekter
-        num_top_pixels = 1000
-        flat_indices = np.argpartition(image_data.ravel(), -num_top_pixels)[-num_top_pixels:]
-        sorted_indices = flat_indices[np.argsort(image_data.ravel()[flat_indices])[::-1]]
-        sorted_positions = np.unravel_index(sorted_indices, image_data.shape)
-        
-        # Lav maske omkring lyseste områder
-        neighbor_radius = 80
-        mask = np.zeros_like(image_data, dtype=bool)
-        
-        for y, x in zip(sorted_positions[0], sorted_positions[1]):
-            y_start = max(0, y - neighbor_radius)
-            y_end = min(image_data.shape[0], y + neighbor_radius + 1)
-            x_start = max(0, x - neighbor_radius)
-            x_end = min(image_data.shape[1], x + neighbor_radius + 1)
-            mask[y_start:y_end, x_start:x_end] = True
-        
-        # Threshold og label objekter
-        thresholded_data = mask & (image_data > np.median(image_data) + 30) # Virkede med mean + 0.75*std
-        labeled_array, num_features = label(thresholded_data)
-        object_slices = find_objects(labeled_array)
-        
-        # Find lyseste objekt der er stort nok
         brightest_object_slice = None
-        max_val = -np.inf
+        roi_used = False
+        roi_median = np.nan
         
-        for slice_ in object_slices:
-            if slice_ is None:
-                continue
-            region = image_data[slice_]
-            if region.shape[0] >= 20 and region.shape[1] >= 20:
-                region_mean = np.mean(region)
-                if region_mean > max_val:
-                    max_val = region_mean
-                    brightest_object_slice = slice_
+        if roi_center is not None and roi_radius > 0:
+            roi = roi_vindue(image_data.shape, roi_center, roi_radius)
+            if roi is None:
+                analysis_log_message(self, f"  ROI fallback: forudsagt position ({roi_center[0]:.0f}, {roi_center[1]:.0f}) "
+                                           f"ligger uden for billedet - søger hele billedet")
+            else:
+                # Lyseste objekt i vinduet - tærskel fra vinduets baggrund (roi_median)
+                udsnit = image_data[roi]
+                roi_median = frame_median(udsnit)
+                brightest_object_slice = find_brightest_object(udsnit, roi_median + 30)
+                if brightest_object_slice is None:
+                    analysis_log_message(self, f"  ROI fallback: intet objekt inden for {roi_radius} px af "
+                                               f"forudsagt position - søger hele billedet")
+                else:
+                    brightest_object_slice = tuple(slice(s.start + r.start, s.stop + r.start)
+                                                   for s, r in zip(brightest_object_slice, roi))
+                    roi_used = True
         
-        result = {'x_sat': np.nan, 'y_sat': np.nan, 'pixel_sum': np.nan}
+        # image_median er altid hele billedets median (også når ROI'en bruges)
+        median = frame_median(image_data)
+        if brightest_object_slice is None:
+            # Lyseste objekt omkring de 1000 lyseste pixels - maske, labelling og pixelsum
+            # laves kun på udsnit af billedet (Func_Detektion)
+            brightest_object_slice = find_brightest_object(image_data, median + 30) # Virkede med mean + 0.75*std
+        
+        result = {'x_sat': np.nan, 'y_sat': np.nan, 'pixel_sum': np.nan, 'roi_used': roi_used}
         
         if brightest_object_slice is not None:
-            y_start, y_stop = brightest_object_slice[0].start, brightest_object_slice[0].stop
-            x_start, x_stop = brightest_object_slice[1].start, brightest_object_slice[1].stop
-            y_center = (y_start + y_stop - 1) // 2
-            x_center = (x_start + x_stop - 1) // 2
+            x_center, y_center = slice_center(brightest_object_slice)
             
             # Beregn pixelsum i cirkel omkring centrum
             radius_pixelsum = self.tracking_pixelsum_radius.get()
-            Y_grid, X_grid = np.ogrid[:image_data.shape[0], :image_data.shape[1]]
-            distance_from_center = np.sqrt((X_grid - x_center)**2 + (Y_grid - y_center)**2)
-            circular_mask = distance_from_center <= radius_pixelsum
-            pixel_sum = np.sum(image_data[circular_mask])
+            pixel_sum = aperture_sum(image_data, x_center, y_center, radius_pixelsum)
             
             result = {
                 'x_sat': x_center,
                 'y_sat': y_center,
                 'pixel_sum': pixel_sum,
-                'image_median': np.median(image_data),
-                'image_mean': np.mean(image_data)
+                'image_median': median,
+                'image_mean': np.mean(image_data),
+                'roi_used': roi_used,
+                'roi_median': roi_median
             }
             
             # Plot hvis ønsket
@@ -982,258 +1284,153 @@ def analyze_starfield_reference(self, directory, starfield_file, astap_path):
     try:
         analysis_log_message(self, f"Analyserer stjernehimmel reference med ASTAP...")
         
+        from Func_PlateSolve import solve_with_retry, PlateSolveCache
+        
         filepath = os.path.join(directory, starfield_file)
-        wcsfile = os.path.join(directory, starfield_file.replace(".fits", ".wcs"))
+        _, timeout = get_astap_settings(self)
+        cache = PlateSolveCache(directory)
         
-        # Kør ASTAP
-        result = subprocess.run(
-            [astap_path, "-f", filepath, "-wcs", wcsfile],
-            capture_output=True, text=True
-        )
+        # Kør ASTAP (med timeout og genforsøg med større søgeradius)
+        wcs_header, besked = solve_with_retry(astap_path, filepath, timeout, cache=cache)
+        cache.save()
+        analysis_log_message(self, f"Stjernehimmel reference {besked} - {cache.summary()}")
         
-        if result.returncode != 0:
-            analysis_log_message(self, f"ASTAP fejlede: {result.stderr}")
+        if wcs_header is None:
+            analysis_log_message(self, f"ASTAP fejlede: {besked}")
             return {'ra_offset': 0, 'dec_offset': 0, 'rotation_offset': 0}
         
-        # Læs WCS resultater
-        if os.path.exists(wcsfile):
-            with fits.open(wcsfile) as hdul:
-                wcs_header = hdul[0].header
-            
-            # Sammenlign med forventet position fra FITS header
-            with fits.open(filepath) as hdul:
-                original_header = hdul[0].header
-            
-            expected_ra = original_header.get('RA', 0)
-            expected_dec = original_header.get('DEC', 0)
-            expected_rotation = original_header.get('field_angle_degs', 0)
-            
-            actual_ra = wcs_header.get('CRVAL1', expected_ra)
-            actual_dec = wcs_header.get('CRVAL2', expected_dec)
-            actual_rotation = wcs_header.get('CROTA2', expected_rotation)
-            
-            ra_offset = actual_ra - expected_ra
-            dec_offset = actual_dec - expected_dec
-            rotation_offset = actual_rotation - expected_rotation
-            
-            analysis_log_message(self, f"ASTAP offset: RA={ra_offset:.6f}°, DEC={dec_offset:.6f}°, ROT={rotation_offset:.3f}°")
-            
-            # Ryd op
-            os.remove(wcsfile)
-            
-            return {
-                'ra_offset': ra_offset,
-                'dec_offset': dec_offset, 
-                'rotation_offset': rotation_offset
-            }
-        else:
-            analysis_log_message(self, "ASTAP producerede ingen WCS fil")
-            return {'ra_offset': 0, 'dec_offset': 0, 'rotation_offset': 0}
+        # Sammenlign med forventet position fra FITS header (via sessionens index)
+        original_header = frame_header(directory, starfield_file)
+        
+        expected_ra = original_header.get('RA', 0)
+        expected_dec = original_header.get('DEC', 0)
+        expected_rotation = original_header.get('field_angle_degs', 0)
+        
+        actual_ra = wcs_header.get('CRVAL1', expected_ra)
+        actual_dec = wcs_header.get('CRVAL2', expected_dec)
+        actual_rotation = wcs_header.get('CROTA2', expected_rotation)
+        
+        ra_offset = actual_ra - expected_ra
+        dec_offset = actual_dec - expected_dec
+        rotation_offset = actual_rotation - expected_rotation
+        
+        analysis_log_message(self, f"ASTAP offset: RA={ra_offset:.6f}°, DEC={dec_offset:.6f}°, ROT={rotation_offset:.3f}°")
+        
+        return {
+            'ra_offset': ra_offset,
+            'dec_offset': dec_offset, 
+            'rotation_offset': rotation_offset
+        }
             
     except Exception as e:
         analysis_log_message(self, f"Fejl ved ASTAP analyse: {str(e)}")
         return {'ra_offset': 0, 'dec_offset': 0, 'rotation_offset': 0}
 
+def bestil_plot(self, opgave):
+    """Send et plot til baggrundskøen. I en analyse worker-proces returneres opgaven til
+    hovedprocessen via kontekstens plot_opgaver; uden kø (live analyse) renderes det med det samme"""
+    plot_koe = getattr(self, 'plot_koe', None)
+    if plot_koe is not None:
+        plot_koe.submit(opgave)
+    elif isinstance(self, HeadlessAnalyseKontekst) and self.plot_opgaver is not None:
+        self.plot_opgaver.append(opgave)
+    else:
+        render_plot(opgave)
+        analysis_log_message(self, f"Plot gemt: {os.path.basename(opgave['plot_path'])}")
+
 def plot_leapfrog_result(self, image_data, result, filepath, save_plot, csv_index=None):
-    """Plot LeapFrog resultat - gemmer kun til fil, viser ikke interaktivt"""
+    """Bestil LeapFrog plot - renderes til fil i baggrunden, vises ikke interaktivt"""
     try:
-        if not plt:
+        if not plt or not save_plot or np.isnan(result['x_sat']):
             return
         
-        # Kun gem plot til fil - vis IKKE interaktivt fra worker thread
-        if not save_plot:
-            return  # Spring over hvis vi ikke gemmer
-        
-        # Downscale til visning
-        target_height, target_width = 639, 958
-        original_height, original_width = image_data.shape
-        scale_y = target_height / original_height
-        scale_x = target_width / original_width
-        
-        downscaled_image = zoom(image_data, (scale_y, scale_x), order=1)
-        downscaled_image = np.clip(downscaled_image, None, 600)
-        
+        billede, scale_x, scale_y = nedskaler(image_data)
+        # Use CSV index in title if available
+        if csv_index is not None:
+            titel = f"Plot {csv_index+1:03d}: LeapFrog analyse - {os.path.basename(filepath)}"
+        else:
+            titel = f"LeapFrog analyse: {os.path.basename(filepath)}"
         
-        # Scale koordinater
-        if not np.isnan(result['x_sat']):
-            scaled_x = result['x_sat'] * scale_x
-            scaled_y = result['y_sat'] * scale_y
-            
-            # Brug Agg backend for at undgå GUI
-            import matplotlib
-            matplotlib.use('Agg')
-            from matplotlib.patches import Circle
-            
-            plt.figure(figsize=(12, 8))
-            plt.imshow(downscaled_image, cmap='gray')
-            plt.scatter(scaled_x, scaled_y, color='green', marker='x', s=100, label='Satellit position')
-            
-            if 'x1' in result:
-                scaled_x1 = result['x1'] * scale_x
-                scaled_y1 = result['y1'] * scale_y
-                scaled_x2 = result['x2'] * scale_x
-                scaled_y2 = result['y2'] * scale_y
-                
-                # Tilføj cirkler omkring endepunkterne i stedet for linje
-                circle_radius = 5  # Radius i pixels for cirklerne
-                circle1 = Circle((scaled_x1, scaled_y1), circle_radius, edgecolor='red', 
-                               facecolor='none', linewidth=1, label='Endepunkt 1')
-                circle2 = Circle((scaled_x2, scaled_y2), circle_radius, edgecolor='blue', 
-                               facecolor='none', linewidth=1, label='Endepunkt 2')
-                plt.gca().add_patch(circle1)
-                plt.gca().add_patch(circle2)
-            
-            # Tilføj øst/vest skillelinje hvis vi har rotation data
-            if 'rotation_angle' in result:
-                rotation_angle = result['rotation_angle']
-                
-                # Samme beregning som i Func_fagprojekt.py (inspiration fra markeret kode)
-                theta_rad = np.radians(-rotation_angle)  # MINUS som i original
-                
-                # Brug scaled dimensioner
-                height_scaled, width_scaled = downscaled_image.shape
-                x_c = (width_scaled - 1) / 2
-                y_c = (height_scaled - 1) / 2
-                
-                # Beregn linjens retning (samme som i Func_fagprojekt.py)
-                dx_line = np.sin(theta_rad)
-                dy_line = -np.cos(theta_rad)
-                
-                # Find linjens endepunkter (går gennem centrum)
-                t_vals = np.linspace(-max(width_scaled, height_scaled), max(width_scaled, height_scaled), 1000)
-                x_line_all = x_c + t_vals * dx_line
-                y_line_all = y_c + t_vals * dy_line
-                
-                # Begræns til billedets grænser
-                mask_inside = (
-                    (x_line_all >= 0) & (x_line_all < width_scaled) &
-                    (y_line_all >= 0) & (y_line_all < height_scaled)
-                )
-                x_line = x_line_all[mask_inside]
-                y_line = y_line_all[mask_inside]
-                
-                # Tegn skillelinjen
-                plt.plot(x_line, y_line, color='yellow', linewidth=2, linestyle='--', 
-                        label='Øst/Vest skillelinje', alpha=0.8)
-                
-                # Tilføj tekst labels for øst og vest
-                # Hvis linjen er nord-syd, skal øst/vest placeres vinkelret på linjen
-                # Beregn vinkelret retning til skillelinjen
-                offset = 50  # pixels
-                # Vinkelret retning: rotér 90 grader
-                dx_perp = -dy_line  # Vinkelret X-komponent
-                dy_perp = dx_line   # Vinkelret Y-komponent
-                
-                # Placér øst til venstre for linjen (negativ vinkelret retning)
-                east_x = x_c - offset * dx_perp
-                east_y = y_c - offset * dy_perp
-                # Placér vest til højre for linjen (positiv vinkelret retning)
-                west_x = x_c + offset * dx_perp
-                west_y = y_c + offset * dy_perp
-                
-                plt.text(west_x, west_y, 'VEST', color='yellow', fontsize=12, 
-                        fontweight='bold', ha='center', va='center',
-                        bbox=dict(boxstyle='round,pad=0.3', facecolor='black', alpha=0.7))
-                plt.text(east_x, east_y, 'ØST', color='yellow', fontsize=12, 
-                        fontweight='bold', ha='center', va='center',
-                        bbox=dict(boxstyle='round,pad=0.3', facecolor='black', alpha=0.7))
-            
-            plt.legend()
-            # Use CSV index in title if available
-            if csv_index is not None:
-                plt.title(f"Plot {csv_index+1:03d}: LeapFrog analyse - {os.path.basename(filepath)}")
-            else:
-                plt.title(f"LeapFrog analyse: {os.path.basename(filepath)}")
-            plt.xlabel("Pixel X")
-            plt.ylabel("Pixel Y")
-            
-            # Gem til fil med samme navn som FITS-fil, bare .png
-            plot_path = filepath.replace('.fits', '.png')
-            plt.savefig(plot_path, dpi=150, bbox_inches='tight')
-            plt.close()  # Vigtigt: luk figuren
-            
-            analysis_log_message(self, f"Plot gemt")
+        # Gem til fil med samme navn som FITS-fil, bare .png
+        bestil_plot(self, {'type': 'leapfrog', 'billede': billede, 'scale': (scale_x, scale_y),
+                           'result': dict(result), 'titel': titel,
+                           'plot_path': filepath.replace('.fits', '.png')})
             
     except Exception as e:
         analysis_log_message(self, f"Fejl ved plotting: {str(e)}")
 
 def plot_tracking_result(self, image_data, result, filepath, save_plot, radius, csv_index=None):
-    """Plot Tracking resultat - gemmer kun til fil, viser ikke interaktivt"""
+    """Bestil Tracking plot - renderes til fil i baggrunden, vises ikke interaktivt"""
     try:
-        if not plt:
+        if not plt or not save_plot or np.isnan(result['x_sat']):
             return
         
-        # Kun gem plot til fil - vis IKKE interaktivt fra worker thread
-        if not save_plot:
-            return  # Spring over hvis vi ikke gemmer
-        
-        # Downscale til visning
-        target_height, target_width = 639, 958
-        original_height, original_width = image_data.shape
-        scale_y = target_height / original_height
-        scale_x = target_width / original_width
-        
-        downscaled_image = zoom(image_data, (scale_y, scale_x), order=1)
+        billede, scale_x, scale_y = nedskaler(image_data)
+        # Use CSV index in title if available
+        if csv_index is not None:
+            titel = (f"Plot {csv_index+1:03d}: Tracking analyse - {os.path.basename(filepath)}\n"
+                     f"Pixel sum: {result.get('pixel_sum', 0):.0f}")
+        else:
+            titel = (f"Tracking analyse: {os.path.basename(filepath)}\n"
+                     f"Pixel sum: {result.get('pixel_sum', 0):.0f}")
         
-        # Scale koordinater
-        if not np.isnan(result['x_sat']):
-            scaled_x = result['x_sat'] * scale_x
-            scaled_y = result['y_sat'] * scale_y
-            scaled_radius = radius * min(scale_x, scale_y)
-            
-            # Vis kun gyldige pixels for at undgå problemer med display
-            valid_pixels = downscaled_image[downscaled_image > 0]
-            if len(valid_pixels) > 0:
-                vmin = np.percentile(valid_pixels, 5)
-                vmax = np.percentile(valid_pixels, 99)
-            else:
-                vmin, vmax = 0, 1
-            
-            # Brug Agg backend for at undgå GUI
-            import matplotlib
-            matplotlib.use('Agg')
-            
-            plt.figure(figsize=(12, 8))
-            plt.imshow(downscaled_image, cmap='gray', vmin=vmin, vmax=vmax)
-            
-            # Tilføj cirkel og centrum
-            from matplotlib.patches import Circle
-            circle = Circle((scaled_x, scaled_y), scaled_radius, edgecolor='cyan', 
-                           facecolor='none', linewidth=2, label=f'Pixelsum radius ({radius}px)')
-            plt.gca().add_patch(circle)
-            plt.scatter(scaled_x, scaled_y, color='red', marker='+', s=100, label='Satellit centrum')
-            
-            plt.legend()
-            # Use CSV index in title if available
-            if csv_index is not None:
-                plt.title(f"Plot {csv_index+1:03d}: Tracking analyse - {os.path.basename(filepath)}\n"
-                         f"Pixel sum: {result.get('pixel_sum', 0):.0f}")
-            else:
-                plt.title(f"Tracking analyse: {os.path.basename(filepath)}\n"
-                         f"Pixel sum: {result.get('pixel_sum', 0):.0f}")
-            plt.xlabel("Pixel X")
-            plt.ylabel("Pixel Y")
-            
-            # Gem til fil med samme navn som FITS-fil, bare .png
-            plot_path = filepath.replace('.fits', '.png')
-            plt.savefig(plot_path, dpi=150, bbox_inches='tight')
-            plt.close()  # Vigtigt: luk figuren
-            
-            analysis_log_message(self, f"Plot gemt: {os.path.basename(plot_path)}")
+        # Gem til fil med samme navn som FITS-fil, bare .png
+        bestil_plot(self, {'type': 'tracking', 'billede': billede, 'scale': (scale_x, scale_y),
+                           'result': dict(result), 'titel': titel, 'radius': radius,
+                           'plot_path': filepath.replace('.fits', '.png')})
             
     except Exception as e:
         analysis_log_message(self, f"Fejl ved plotting: {str(e)}")
 
+def _ryd_plot_visning(self):
+    """Fjern placeholder og eksisterende plots fra plot visningen"""
+    if hasattr(self, 'plot_placeholder'):
+        self.plot_placeholder.destroy()
+    for widget in self.plot_scrollable_frame.winfo_children():
+        widget.destroy()
+
+def _tilfoej_plot(self, plot_path, nummer):
+    """Tilføj ét plot billede nederst i plot visningen"""
+    plot_file = os.path.basename(plot_path)
+    try:
+        # Load billede med PIL
+        from PIL import Image, ImageTk
+        img = Image.open(plot_path)
+        
+        # Resize til GUI (maksimal bredde 450px for bedre visning)
+        max_width = 550
+        if img.width > max_width:
+            ratio = max_width / img.width
+            new_height = int(img.height * ratio)
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+        
+        # Konverter til tkinter format
+        photo = ImageTk.PhotoImage(img)
+        
+        # Frame for denne plot
+        plot_frame = ttk.LabelFrame(self.plot_scrollable_frame, 
+                                  text=f"{nummer}. {plot_file.replace('_plot.png', '')}")
+        plot_frame.pack(fill='x', padx=5, pady=5)
+        
+        # Label til at vise billedet
+        img_label = tk.Label(plot_frame, image=photo)
+        img_label.image = photo  # Behold reference
+        img_label.pack(padx=5, pady=5)
+        
+    except Exception as e:
+        # Fejl frame
+        error_frame = ttk.LabelFrame(self.plot_scrollable_frame, 
+                                   text=f"Fejl: {plot_file}")
+        error_frame.pack(fill='x', padx=5, pady=5)
+        
+        ttk.Label(error_frame, 
+                 text=f"Kunne ikke indlæse: {str(e)}", 
+                 foreground='red').pack(padx=5, pady=5)
+
 def display_plots_in_gui(self, directory):
     """Vis plot billeder i GUI'ens plot visning widget"""
     try:
-        # Fjern placeholder
-        if hasattr(self, 'plot_placeholder'):
-            self.plot_placeholder.destroy()
-        
-        # Ryd eksisterende plots
-        for widget in self.plot_scrollable_frame.winfo_children():
-            widget.destroy()
+        _ryd_plot_visning(self)
         
         # Find alle gemte plot filer
         plot_files = sorted([f for f in os.listdir(directory) if f.endswith('.png')])
@@ -1248,42 +1445,7 @@ def display_plots_in_gui(self, directory):
         
         # Vis hvert plot
         for i, plot_file in enumerate(plot_files):
-            plot_path = os.path.join(directory, plot_file)
-            
-            try:
-                # Load billede med PIL
-                from PIL import Image, ImageTk
-                img = Image.open(plot_path)
-                
-                # Resize til GUI (maksimal bredde 450px for bedre visning)
-                max_width = 550
-                if img.width > max_width:
-                    ratio = max_width / img.width
-                    new_height = int(img.height * ratio)
-                    img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Konverter til tkinter format
-                photo = ImageTk.PhotoImage(img)
-                
-                # Frame for denne plot
-                plot_frame = ttk.LabelFrame(self.plot_scrollable_frame, 
-                                          text=f"{i+1}. {plot_file.replace('_plot.png', '')}")
-                plot_frame.pack(fill='x', padx=5, pady=5)
-                
-                # Label til at vise billedet
-                img_label = tk.Label(plot_frame, image=photo)
-                img_label.image = photo  # Behold reference
-                img_label.pack(padx=5, pady=5)
-                
-            except Exception as e:
-                # Fejl frame
-                error_frame = ttk.LabelFrame(self.plot_scrollable_frame, 
-                                           text=f"Fejl: {plot_file}")
-                error_frame.pack(fill='x', padx=5, pady=5)
-                
-                ttk.Label(error_frame, 
-                         text=f"Kunne ikke indlæse: {str(e)}", 
-                         foreground='red').pack(padx=5, pady=5)
+            _tilfoej_plot(self, os.path.join(directory, plot_file), i + 1)
         
         # Opdater scroll region
         self.plot_scrollable_frame.update_idletasks()
@@ -1294,6 +1456,35 @@ def display_plots_in_gui(self, directory):
     except Exception as e:
         analysis_log_message(self, f"Fejl ved visning af plots i GUI: {str(e)}")
 
+def vis_plots_loebende(self, plot_koe, interval_ms=500):
+    """Vis plots fra baggrundskøen efterhånden som de bliver færdige (kører i Tk tråden via after)"""
+    try:
+        _ryd_plot_visning(self)
+    except Exception as e:
+        analysis_log_message(self, f"Fejl ved visning af plots i GUI: {str(e)}")
+        return
+    vist = 0
+    
+    def poll():
+        nonlocal vist
+        # lukket læses før plots hentes, så sidste batch ikke går tabt
+        lukket = plot_koe.lukket
+        try:
+            nye = plot_koe.nye_plots(vist)
+            for plot_path in nye:
+                vist += 1
+                _tilfoej_plot(self, plot_path, vist)
+            if nye:
+                self.plot_scrollable_frame.update_idletasks()
+                self.plot_canvas.configure(scrollregion=self.plot_canvas.bbox("all"))
+        except Exception as e:
+            analysis_log_message(self, f"Fejl ved visning af plots i GUI: {str(e)}")
+            return
+        if not lukket:
+            self.root.after(interval_ms, poll)
+    
+    poll()
+
 def show_plots_manual(self):
     """Manuel visning af plots i GUI fra valgt mappe"""
     directory = self.analysis_dir_entry.get().strip()
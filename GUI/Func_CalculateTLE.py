@@ -7,10 +7,17 @@ import os
 import pandas as pd
 import numpy as np
 import re
+import importlib.util
 from datetime import datetime
+import time
+import math
+import threading
+import concurrent.futures
 import plotly.graph_objects as go
 import plotly.offline as pyo
 
+from Func_ResultatFormat import find_result_file, read_result, write_result, columnar_paths
+
 # Optional dependencies
 try:
     import orbdtools
@@ -19,11 +26,10 @@ try:
 except ImportError:
     ORBDTOOLS_AVAILABLE = False
 
-try:
-    from skyfield.api import load, EarthSatellite
-    SKYFIELD_AVAILABLE = True
-except ImportError:
-    SKYFIELD_AVAILABLE = False
+# Func_Ephemeris importerer først skyfield ved brug, så tjek om pakken findes
+SKYFIELD_AVAILABLE = importlib.util.find_spec('skyfield') is not None
+if SKYFIELD_AVAILABLE:
+    from Func_Ephemeris import get_timescale, get_satellite
 
 try:
     import plotly.graph_objects as go
@@ -32,6 +38,18 @@ try:
 except ImportError:
     PLOTLY_AVAILABLE = False
 
+IOD_METODER = ['gauss', 'laplace', 'gooding', 'double_R', 'multilaplace', 'circular']
+# Metoder der kun bruger 3 observationer (triplet søgningen giver kun mening for dem)
+TRIPLET_METODER = ['gauss', 'laplace', 'double_R', 'circular']
+
+
+class HeadlessTLEKontekst:
+    """Erstatning for GUI-instansen når IOD metoderne kører i worker-processer.
+    Log beskeder samles i log_lines; tle_csv_data bruges af format_tle (felter fra den oprindelige TLE)"""
+    def __init__(self, tle_csv_data=None):
+        self.tle_csv_data = tle_csv_data
+        self.log_lines = []
+
 
 def create_calculate_tle_tab(self, notebook):
     """Tab til at beregne TLE fra observationer"""
@@ -134,7 +152,7 @@ def create_calculate_tle_tab(self, notebook):
     # Metode valg
     ttk.Label(params_frame, text="IOD Metode:").grid(row=0, column=0, sticky='w', padx=5, pady=5)
     self.tle_method_combo = ttk.Combobox(params_frame, 
-                                        values=['gauss', 'laplace', 'gooding', 'double_R', 'multilaplace', 'circular'],
+                                        values=IOD_METODER,
                                         state='readonly', width=20)
     self.tle_method_combo.grid(row=0, column=1, padx=5, pady=5, sticky='w')
     self.tle_method_combo.set('gauss')  # Default metode
@@ -163,6 +181,42 @@ def create_calculate_tle_tab(self, notebook):
               command=self.calculate_tle_from_observations,
               style='Accent.TButton').grid(row=5, column=0, columnspan=2, pady=10, padx=5)
     
+    # Ensemble: alle metoder parallelt, rangeret efter RMS residual mod alle observationer
+    ttk.Button(params_frame, text="Kør alle metoder (ensemble)", 
+              command=self.calculate_tle_ensemble).grid(row=6, column=0, columnspan=2, pady=(0, 10), padx=5)
+    
+    ensemble_frame = ttk.LabelFrame(left_frame, text="Metode Ensemble (vælg en række for at bruge dens TLE)")
+    ensemble_frame.pack(fill='x', pady=(0, 10))
+    
+    ensemble_kolonner = ('rank', 'metode', 'rms', 'maks', 'tid', 'status')
+    # Triplet søgning: bedste 3 observationer for den valgte metode inden for et tidsbudget
+    triplet_frame = ttk.Frame(params_frame)
+    triplet_frame.grid(row=7, column=0, columnspan=2, sticky='w', padx=5, pady=(0, 10))
+    ttk.Label(triplet_frame, text="Tidsbudget (s):").pack(side='left')
+    self.tle_triplet_budget_var = tk.IntVar(value=60)
+    ttk.Spinbox(triplet_frame, from_=5, to=3600, increment=5, width=6,
+                textvariable=self.tle_triplet_budget_var).pack(side='left', padx=5)
+    ttk.Button(triplet_frame, text="Søg bedste triplets", 
+              command=self.calculate_tle_triplet_search).pack(side='left', padx=5)
+    
+    # Differentialkorrektion af den viste TLE mod alle observationer
+    dk_frame = ttk.Frame(params_frame)
+    dk_frame.grid(row=8, column=0, columnspan=2, sticky='w', padx=5, pady=(0, 10))
+    ttk.Button(dk_frame, text="Forfin TLE (differentialkorrektion)", 
+              command=self.calculate_tle_refinement).pack(side='left')
+    self.tle_fit_bstar_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(dk_frame, text="Tilpas B*", variable=self.tle_fit_bstar_var).pack(side='left', padx=10)
+    
+    self.tle_ensemble_tree = ttk.Treeview(ensemble_frame, columns=ensemble_kolonner, show='headings', height=6)
+    for kolonne, tekst, bredde in zip(ensemble_kolonner,
+                                      ('#', 'Metode', 'RMS (")', 'Maks (")', 'Tid (s)', 'Status'),
+                                      (30, 160, 90, 90, 70, 200)):
+        self.tle_ensemble_tree.heading(kolonne, text=tekst)
+        self.tle_ensemble_tree.column(kolonne, width=bredde, anchor='w' if kolonne in ('metode', 'status') else 'e')
+    self.tle_ensemble_tree.pack(fill='x', padx=5, pady=5)
+    self.tle_ensemble_tree.bind('<<TreeviewSelect>>', lambda e: vaelg_ensemble_resultat(self))
+    self.tle_ensemble_results = []
+    
     # Resultat visning sektion
     result_frame = ttk.LabelFrame(left_frame, text="Beregnede Resultater")
     result_frame.pack(fill='both', expand=True, pady=(0, 10))
@@ -233,6 +287,9 @@ def create_calculate_tle_tab(self, notebook):
 
 def log_tle_message(self, message):
     """Tilføj besked til TLE loggen med tidsstempel"""
+    if isinstance(self, HeadlessTLEKontekst):
+        self.log_lines.append(message)
+        return
     try:
         if hasattr(self, 'tle_log_text'):
             timestamp = datetime.now().strftime('%H:%M:%S')
@@ -258,27 +315,26 @@ def select_tle_directory(self):
         load_tle_csv_data(self, directory)
 
 def load_tle_csv_data(self, directory):
-    """Load CSV file from folder for TLE calculation"""
+    """Load result file from folder for TLE calculation (Parquet core file if present, else CSV)"""
     try:
         log_tle_message(self, f"Searching for CSV file in: {directory}")
         
-        # Find CSV files starting with 'data'
-        csv_files = [f for f in os.listdir(directory) if f.lower().startswith('data') and f.lower().endswith('.csv')]
+        # Find result file starting with 'data' - the typed Parquet core file is preferred
+        result_path = find_result_file(directory)
         
-        if not csv_files:
+        if result_path is None:
             log_tle_message(self, "❌ No CSV files found starting with 'data'")
             self.tle_status_label.config(text="No data CSV file found in folder", foreground='red')
             messagebox.showerror("Error", "No CSV files found starting with 'data' in the selected folder")
             return
         
-        # Use first file
-        csv_file = csv_files[0]
-        csv_path = os.path.join(directory, csv_file)
-        log_tle_message(self, f"Found CSV file: {csv_file}")
+        result_file = os.path.basename(result_path)
+        log_tle_message(self, f"Found result file: {result_file}")
         
-        # Load CSV file
-        df = pd.read_csv(csv_path)
-        log_tle_message(self, f"✅ Loaded {len(df)} observations")
+        # Load result file
+        t0 = time.perf_counter()
+        df = read_result(result_path)
+        log_tle_message(self, f"✅ Loaded {len(df)} observations ({(time.perf_counter() - t0) * 1000:.0f} ms)")
 
         # Filter out rows with OBSTYPE = 'stjernehimmel'
         if 'OBSTYPE' in df.columns:
@@ -332,7 +388,7 @@ def load_tle_csv_data(self, directory):
             messagebox.showwarning("Warning", "CSV file contains less than 3 observations.\nAt least 3 observations are required for TLE calculation.")
         
         # Update status
-        self.tle_status_label.config(text=f"✅ Data loaded: {csv_file} ({len(df)} obs.)", foreground='green')
+        self.tle_status_label.config(text=f"✅ Data loaded: {result_file} ({len(df)} obs.)", foreground='green')
         log_tle_message(self, f"✅ CSV data ready for TLE calculation")
         log_tle_message(self, f"   Columns: {', '.join(df.columns.tolist()[:10])}{'...' if len(df.columns) > 10 else ''}")
         
@@ -354,24 +410,12 @@ def load_tle_csv_data(self, directory):
 def xyz_to_radec(self, x, y, z):
     """
     Konverterer ECI-koordinater (x,y,z) [km] til RA (grader) og DEC (grader).
+    x, y, z kan være skalarer eller arrays.
     """
-    r = np.array([x, y, z], dtype=float)
-    norm = np.linalg.norm(r)
-    if norm == 0:
+    from Func_Propagering import xyz_til_radec
+    if np.any(np.sqrt(np.square(x) + np.square(y) + np.square(z)) == 0):
         raise ValueError("Vector has zero length")
-
-    # RA i radianer
-    ra_rad = np.arctan2(r[1], r[0])
-    if ra_rad < 0:
-        ra_rad += 2*np.pi
-
-    # DEC i radianer
-    dec_rad = np.arcsin(r[2] / norm)
-
-    ra_degrees = np.degrees(ra_rad)
-    dec_degrees = np.degrees(dec_rad)
-
-    return ra_degrees, dec_degrees
+    return xyz_til_radec(x, y, z)
 
 def angle_diff_deg(self, a, b):
     """Returnerer vinkel-differens a-b i grader, wrap omkring 360, i intervallet [-180, 180]."""
@@ -433,22 +477,10 @@ def calculate_tle_deviations(self, results_df):
         satellite_positions = np.array(sat_pos)
         observation_points = np.array(obs_points)
         
-        # Calculate relative positions
-        x_list = satellite_positions[:, 0] - observation_points[:, 0]
-        y_list = satellite_positions[:, 1] - observation_points[:, 1]
-        z_list = satellite_positions[:, 2] - observation_points[:, 2]
-        
-        # Convert to RA/DEC
+        # Convert relative positions to RA/DEC (all points at once)
+        from Func_Propagering import xyz_til_radec
         log_tle_message(self, "Converting to RA/DEC coordinates...")
-        ra_tle = []
-        dec_tle = []
-        for i in range(len(x_list)):
-            ra, dec = xyz_to_radec(self, x_list[i], y_list[i], z_list[i])
-            ra_tle.append(ra)
-            dec_tle.append(dec)
-        
-        ra_tle = np.array(ra_tle)
-        dec_tle = np.array(dec_tle)
+        ra_tle, dec_tle = xyz_til_radec(*(satellite_positions - observation_points).T)
         
         # Get observed positions
         try:
@@ -500,6 +532,19 @@ def calculate_tle_deviations(self, results_df):
         import traceback
         print(traceback.format_exc())
 
+# Flere forbindelseslinjer end dette kan ikke skelnes i plottet - derover tegnes hver k'te
+MAKS_FORBINDELSESLINJER = 2000
+
+def forbindelseslinjer(a, b, maks=MAKS_FORBINDELSESLINJER):
+    """x, y for lodrette linjer mellem a[i] og b[i] ved x = i, adskilt af NaN (ét plot kald).
+    Ved mere end maks punkter tegnes kun hver k'te linje (punkterne plottes stadig alle)"""
+    indices = np.arange(0, len(a), max(1, int(np.ceil(len(a) / maks))))
+    x = np.repeat(indices.astype(float), 3)
+    y = np.column_stack([np.asarray(a, dtype=float)[indices], np.asarray(b, dtype=float)[indices],
+                         np.full(len(indices), np.nan)]).ravel()
+    x[2::3] = np.nan
+    return x, y
+
 def update_tle_plot(self):
     """Update TLE deviation plot"""
     try:
@@ -518,17 +563,15 @@ def update_tle_plot(self):
             ax.clear()
         
         # RA deviations (top subplot)
-        indices = list(range(len(seconds)))
+        indices = np.arange(len(seconds))
         self.tle_plot_axes[0].plot(indices, delta_ra_behandlet, label='Satellite ΔRA', 
                                   marker='o', linestyle='', color='blue')
         self.tle_plot_axes[0].plot(indices, delta_ra_teleskop, label='Telescope ΔRA', 
                                   marker='o', linestyle='', color='orange', fillstyle='none')
         
-        # Connect points with dashed lines
-        for i in range(len(seconds)):
-            self.tle_plot_axes[0].plot([i, i], 
-                                      [delta_ra_behandlet[i], delta_ra_teleskop[i]], 
-                                      'k--', alpha=0.3, linewidth=0.8)
+        # Connect points with dashed lines (one line object with NaN breaks between the points)
+        self.tle_plot_axes[0].plot(*forbindelseslinjer(delta_ra_behandlet, delta_ra_teleskop),
+                                  'k--', alpha=0.3, linewidth=0.8)
         
         self.tle_plot_axes[0].set_xlabel('Observation Index')
         self.tle_plot_axes[0].set_ylabel('Deviation (degrees)')
@@ -543,10 +586,8 @@ def update_tle_plot(self):
                                   marker='o', linestyle='', color='orange', fillstyle='none')
         
         # Connect points with dashed lines
-        for i in range(len(seconds)):
-            self.tle_plot_axes[1].plot([i, i], 
-                                      [delta_dec_behandlet[i], delta_dec_teleskop[i]], 
-                                      'k--', alpha=0.3, linewidth=0.8)
+        self.tle_plot_axes[1].plot(*forbindelseslinjer(delta_dec_behandlet, delta_dec_teleskop),
+                                  'k--', alpha=0.3, linewidth=0.8)
         
         self.tle_plot_axes[1].set_xlabel('Observation Index')
         self.tle_plot_axes[1].set_ylabel('Deviation (degrees)')
@@ -1025,6 +1066,87 @@ def beregn_TLE_fra_observationer(self, Sat_RA, Sat_DEC, X_obs, Y_obs, Z_obs, DAT
         'method': metode
     }
 
+def vis_tle_resultat(self, result):
+    """Vis en beregnet TLE (linjer, orbital elementer, afvigelsesplot) og gem den i CSV'en"""
+    self.tle_result = result
+
+    save_tle_results(self)
+    
+    line1, line2 = result['tle_lines']
+    self.tle_line1_text.delete(1.0, tk.END)
+    self.tle_line1_text.insert(1.0, line1)
+    self.tle_line2_text.delete(1.0, tk.END)
+    self.tle_line2_text.insert(1.0, line2)
+    
+    log_tle_message(self, "✅ TLE genereret:")
+    log_tle_message(self, f"{line1}")
+    log_tle_message(self, f"{line2}")
+    
+    coe = result['coe']
+    r = result['r']
+    v = result['v']
+    
+    orbital_text = f"Position (r) [km]:\n"
+    orbital_text += f"  x: {r[0]:.3f}\n"
+    orbital_text += f"  y: {r[1]:.3f}\n"
+    orbital_text += f"  z: {r[2]:.3f}\n\n"
+    
+    orbital_text += f"Hastighed (v) [km/s]:\n"
+    orbital_text += f"  vx: {v[0]:.6f}\n"
+    orbital_text += f"  vy: {v[1]:.6f}\n"
+    orbital_text += f"  vz: {v[2]:.6f}\n\n"
+    
+    orbital_text += f"Classical Orbital Elements:\n"
+    orbital_text += f"  a (semi-major axis): {coe[0]:.3f} [km]\n"
+    orbital_text += f"  e (eccentricity): {coe[1]:.6f}\n"
+    orbital_text += f"  i (inclination): {coe[2]:.4f}°\n"
+    orbital_text += f"  Ω (RAAN): {coe[3]:.4f}°\n"
+    orbital_text += f"  ω (arg of perigee): {coe[4]:.4f}°\n"
+    orbital_text += f"  ν (true anomaly): {coe[5]:.4f}°"
+    
+    self.orbital_elements_text.delete(1.0, tk.END)
+    self.orbital_elements_text.insert(1.0, orbital_text)
+    
+    log_tle_message(self, f"✅ Orbital elementer beregnet")
+    
+    if self.tle_csv_data is not None:
+        log_tle_message(self, "Tilføjer TLE linjer til data og beregner afvigelser...")
+        df_updated = self.tle_csv_data.copy()
+        df_updated['TLE1_beregnet'] = line1
+        df_updated['TLE2_beregnet'] = line2
+        self.tle_csv_data = df_updated
+        calculate_tle_deviations(self, df_updated)
+
+def valgte_indices(self):
+    """De 3 valgte observationsindices fra GUI (None og fejlbesked hvis ugyldige)"""
+    try:
+        idx1 = int(self.index1_combo.get())
+        idx2 = int(self.index2_combo.get())
+        idx3 = int(self.index3_combo.get())
+        index_list = [idx1, idx2, idx3]
+    except:
+        messagebox.showerror("Fejl", "Vælg 3 gyldige indices")
+        log_tle_message(self, "❌ Ugyldige indices valgt")
+        return None
+    
+    if len(set(index_list)) != 3:
+        messagebox.showerror("Fejl", "Vælg 3 forskellige indices")
+        log_tle_message(self, "❌ Indices skal være forskellige")
+        return None
+    return index_list
+
+def observationsdata(df):
+    """Argumenterne til beregn_TLE_fra_observationer fra de indlæste observationer"""
+    return {
+        'Sat_RA': df['Sat_RA_Behandlet'].values,
+        'Sat_DEC': df['Sat_DEC_Behandlet'].values,
+        'X_obs': df['X_obs'].values,
+        'Y_obs': df['Y_obs'].values,
+        'Z_obs': df['Z_obs'].values,
+        'DATE_OBS': pd.to_datetime(df['DATE-OBS']).reset_index(drop=True),
+        'NoradID': int(df['NORAD_ID'].iloc[0]) if 'NORAD_ID' in df.columns else 99999,
+    }
+
 def calculate_tle_from_observations(self):
     """Beregner TLE baseret på valgte parametre"""
     try:
@@ -1033,19 +1155,8 @@ def calculate_tle_from_observations(self):
             log_tle_message(self, "❌ Ingen data indlæst")
             return
         
-        try:
-            idx1 = int(self.index1_combo.get())
-            idx2 = int(self.index2_combo.get())
-            idx3 = int(self.index3_combo.get())
-            index_list = [idx1, idx2, idx3]
-        except:
-            messagebox.showerror("Fejl", "Vælg 3 gyldige indices")
-            log_tle_message(self, "❌ Ugyldige indices valgt")
-            return
-        
-        if len(set(index_list)) != 3:
-            messagebox.showerror("Fejl", "Vælg 3 forskellige indices")
-            log_tle_message(self, "❌ Indices skal være forskellige")
+        index_list = valgte_indices(self)
+        if index_list is None:
             return
         
         metode = self.tle_method_combo.get()
@@ -1054,83 +1165,16 @@ def calculate_tle_from_observations(self):
         log_tle_message(self, f"Metode: {metode}")
         log_tle_message(self, f"Indices: {index_list}")
         
-        df = self.tle_csv_data
+        data = observationsdata(self.tle_csv_data)
+        log_tle_message(self, f"NORAD ID: {data['NoradID']}")
         
-        Sat_RA = df['Sat_RA_Behandlet'].values
-        Sat_DEC = df['Sat_DEC_Behandlet'].values
-        X_obs = df['X_obs'].values
-        Y_obs = df['Y_obs'].values
-        Z_obs = df['Z_obs'].values
-        DATE_OBS = pd.to_datetime(df['DATE-OBS'])
-        NoradID = int(df['NORAD_ID'].iloc[0]) if 'NORAD_ID' in df.columns else 99999
-        
-        log_tle_message(self, f"NORAD ID: {NoradID}")
-        
-        result = beregn_TLE_fra_observationer(
-            self,
-            Sat_RA=Sat_RA,
-            Sat_DEC=Sat_DEC,
-            X_obs=X_obs,
-            Y_obs=Y_obs,
-            Z_obs=Z_obs,
-            DATE_OBS=DATE_OBS,
-            NoradID=NoradID,
-            metode=metode,
-            index_list=index_list
-        )
+        result = beregn_TLE_fra_observationer(self, **data, metode=metode, index_list=index_list)
         
         if result is None:
             log_tle_message(self, "❌ TLE beregning fejlede")
             return
         
-        self.tle_result = result
-
-        save_tle_results(self)
-        
-        line1, line2 = result['tle_lines']
-        self.tle_line1_text.delete(1.0, tk.END)
-        self.tle_line1_text.insert(1.0, line1)
-        self.tle_line2_text.delete(1.0, tk.END)
-        self.tle_line2_text.insert(1.0, line2)
-        
-        log_tle_message(self, "✅ TLE genereret:")
-        log_tle_message(self, f"{line1}")
-        log_tle_message(self, f"{line2}")
-        
-        coe = result['coe']
-        r = result['r']
-        v = result['v']
-        
-        orbital_text = f"Position (r) [km]:\n"
-        orbital_text += f"  x: {r[0]:.3f}\n"
-        orbital_text += f"  y: {r[1]:.3f}\n"
-        orbital_text += f"  z: {r[2]:.3f}\n\n"
-        
-        orbital_text += f"Hastighed (v) [km/s]:\n"
-        orbital_text += f"  vx: {v[0]:.6f}\n"
-        orbital_text += f"  vy: {v[1]:.6f}\n"
-        orbital_text += f"  vz: {v[2]:.6f}\n\n"
-        
-        orbital_text += f"Classical Orbital Elements:\n"
-        orbital_text += f"  a (semi-major axis): {coe[0]:.3f} [km]\n"
-        orbital_text += f"  e (eccentricity): {coe[1]:.6f}\n"
-        orbital_text += f"  i (inclination): {coe[2]:.4f}°\n"
-        orbital_text += f"  Ω (RAAN): {coe[3]:.4f}°\n"
-        orbital_text += f"  ω (arg of perigee): {coe[4]:.4f}°\n"
-        orbital_text += f"  ν (true anomaly): {coe[5]:.4f}°"
-        
-        self.orbital_elements_text.delete(1.0, tk.END)
-        self.orbital_elements_text.insert(1.0, orbital_text)
-        
-        log_tle_message(self, f"✅ Orbital elementer beregnet")
-        
-        if self.tle_csv_data is not None:
-            log_tle_message(self, "Tilføjer TLE linjer til data og beregner afvigelser...")
-            df_updated = self.tle_csv_data.copy()
-            df_updated['TLE1_beregnet'] = line1
-            df_updated['TLE2_beregnet'] = line2
-            self.tle_csv_data = df_updated
-            calculate_tle_deviations(self, df_updated)
+        vis_tle_resultat(self, result)
         
         messagebox.showinfo("Succes", f"TLE beregnet succesfuldt med {metode} metoden!")
         
@@ -1141,6 +1185,352 @@ def calculate_tle_from_observations(self):
         import traceback
         print(traceback.format_exc())
 
+def tle_residualer(tle_line1, tle_line2, DATE_OBS, Sat_RA, Sat_DEC, X_obs, Y_obs, Z_obs):
+    """Vinkelafstand (buesekunder) mellem observeret RA/DEC og TLE'ens topocentriske retning
+    i hver observationsepoke (observatørens GCRS position i km som X/Y/Z_obs)"""
+    from Func_Propagering import propager
+    
+    sat_km = propager([(tle_line1, tle_line2)], DATE_OBS)[0][0].T
+    rel = sat_km - np.vstack([X_obs, Y_obs, Z_obs]).astype(float)
+    rel /= np.linalg.norm(rel, axis=0)
+    
+    ra = np.radians(np.asarray(Sat_RA, dtype=float))
+    dec = np.radians(np.asarray(Sat_DEC, dtype=float))
+    obs = np.vstack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)])
+    
+    # atan2(|a x b|, a . b) er nøjagtig også for meget små vinkler
+    kryds = np.linalg.norm(np.cross(obs.T, rel.T), axis=1)
+    return np.degrees(np.arctan2(kryds, np.sum(obs * rel, axis=0))) * 3600
+
+def _evaluer_iod(metode, data, index_list, tle_csv_data):
+    """Kør én IOD metode headless og beregn dens residualer mod alle observationer"""
+    kontekst = HeadlessTLEKontekst(tle_csv_data)
+    række = {'method': metode, 'result': None, 'rms_arcsec': np.nan, 'max_arcsec': np.nan, 'error': None}
+    
+    t0 = time.perf_counter()
+    try:
+        result = beregn_TLE_fra_observationer(kontekst, **data, metode=metode, index_list=index_list)
+        line1, line2 = result['tle_lines']
+        residualer = tle_residualer(line1, line2, data['DATE_OBS'], data['Sat_RA'], data['Sat_DEC'],
+                                    data['X_obs'], data['Y_obs'], data['Z_obs'])
+        række['result'] = result
+        række['rms_arcsec'] = float(np.sqrt(np.nanmean(residualer**2)))
+        række['max_arcsec'] = float(np.nanmax(residualer))
+    except Exception as e:
+        række['error'] = str(e)
+    række['wall_s'] = time.perf_counter() - t0
+    række['log_lines'] = kontekst.log_lines
+    return række
+
+def _iod_worker(opgave):
+    """Kør én IOD metode i en worker-proces"""
+    return _evaluer_iod(*opgave)
+
+def beregn_TLE_ensemble(self, data, index_list, metoder=IOD_METODER, workers=None, log=None):
+    """Kør alle IOD metoder samtidigt i en process pool på samme bue.
+    log(message) får fremdriften (standard log_tle_message - fra en tråd skal den gå via root.after).
+    Returnerer rækker (method, result, rms_arcsec, max_arcsec, wall_s, error) sorteret efter RMS"""
+    log = log or (lambda message: log_tle_message(self, message))
+    df = getattr(self, 'tle_csv_data', None)
+    tle_csv_data = df[['TLE1']].head(1) if df is not None and 'TLE1' in df.columns else None
+    opgaver = [(metode, data, index_list, tle_csv_data) for metode in metoder]
+    rækker = []
+    
+    workers = workers or min(len(metoder), os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_iod_worker, opgave): opgave[0] for opgave in opgaver}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                række = future.result()
+            except Exception as e:
+                række = {'method': futures[future], 'result': None, 'rms_arcsec': np.nan, 'max_arcsec': np.nan,
+                         'error': str(e), 'wall_s': np.nan, 'log_lines': []}
+            if række['error']:
+                log(f"❌ {række['method']}: {række['error']} ({række['wall_s']:.2f} s)")
+            else:
+                log(f"✅ {række['method']}: RMS {række['rms_arcsec']:.1f}\" ({række['wall_s']:.2f} s)")
+            rækker.append(række)
+    
+    rækker.sort(key=lambda r: (r['error'] is not None, r['rms_arcsec'] if np.isfinite(r['rms_arcsec']) else np.inf))
+    return rækker
+
+def kandidat_tripletter(DATE_OBS, Sat_RA, Sat_DEC, min_mellemrum_s=10.0, min_bue_deg=0.5,
+                        brøker=(0.35, 0.5, 0.65), max_kandidater=2000):
+    """Observationstripletter (i, j, k) til 3-punkts IOD, bedste heuristiske score først.
+    Er der højst max_kandidater kombinationer returneres alle (udtømmende søgning). Ellers beskæres:
+    yderpunkterne skal ligge mindst min_bue_deg fra hinanden på himlen, midterpunktet vælges nær
+    brøkerne af tidsintervallet og alle mellemrum skal være mindst min_mellemrum_s.
+    Score = buelængde gange balancen i tidsopdelingen (lige store mellemrum er bedst for Gauss/Laplace)"""
+    tider = pd.to_datetime(pd.Series(DATE_OBS)).reset_index(drop=True)
+    t = (tider - tider.iloc[0]).dt.total_seconds().values
+    n = len(t)
+    if n < 3:
+        return []
+    
+    ra = np.radians(np.asarray(Sat_RA, dtype=float))
+    dec = np.radians(np.asarray(Sat_DEC, dtype=float))
+    enhed = np.vstack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)]).T
+    
+    if math.comb(n, 3) <= max_kandidater:
+        i, j, k = np.array([(i, j, k) for i in range(n) for j in range(i + 1, n) for k in range(j + 1, n)]).T
+    else:
+        i, k = np.triu_indices(n, 2)
+        bue = np.degrees(np.arccos(np.clip(np.sum(enhed[i] * enhed[k], axis=1), -1, 1)))
+        behold = (t[k] - t[i] >= 2 * min_mellemrum_s) & (bue >= min_bue_deg)
+        i, k = i[behold], k[behold]
+        # Midterpunkt nær hver brøk af intervallet (nærmeste observation på hver side)
+        kandidater_j = []
+        for brøk in brøker:
+            mål = t[i] + brøk * (t[k] - t[i])
+            højre = np.searchsorted(t, mål)
+            kandidater_j += [højre - 1, højre]
+        i = np.tile(i, len(kandidater_j))
+        k = np.tile(k, len(kandidater_j))
+        j = np.concatenate(kandidater_j)
+        behold = (j > i) & (j < k)
+        i, j, k = i[behold], j[behold], k[behold]
+        behold = (t[j] - t[i] >= min_mellemrum_s) & (t[k] - t[j] >= min_mellemrum_s)
+        i, j, k = np.unique(np.vstack([i[behold], j[behold], k[behold]]), axis=1)
+    
+    if len(i) == 0:
+        return []
+    bue = np.degrees(np.arccos(np.clip(np.sum(enhed[i] * enhed[k], axis=1), -1, 1)))
+    spænd = np.maximum(t[k] - t[i], 1e-9)
+    balance = 1 - np.abs((t[j] - t[i]) / spænd - 0.5) * 2
+    rækkefølge = np.argsort(-(bue * balance), kind='stable')[:max_kandidater]
+    return [[int(i[r]), int(j[r]), int(k[r])] for r in rækkefølge]
+
+def _triplet_worker(opgave):
+    """Evaluer en portion tripletter i en worker-proces indtil deadline (time.time()).
+    Returnerer (vellykkede rækker, antal evaluerede, antal fejlede)"""
+    metode, data, tripletter, tle_csv_data, deadline = opgave
+    rækker, evalueret, fejlede = [], 0, 0
+    for index_list in tripletter:
+        if time.time() > deadline:
+            break
+        række = _evaluer_iod(metode, data, index_list, tle_csv_data)
+        evalueret += 1
+        if række['error'] or not np.isfinite(række['rms_arcsec']):
+            fejlede += 1
+            continue
+        række['indices'] = index_list
+        række['log_lines'] = []  # Fylder for meget ved tusindvis af tripletter
+        rækker.append(række)
+    return rækker, evalueret, fejlede
+
+def soeg_tripletter(self, data, metode='gauss', tidsbudget_s=60.0, antal_bedste=5, workers=None, log=None,
+                    **beskæring):
+    """Søg efter de observationstripletter der giver de bedste TLE'er for en 3-punkts metode.
+    Kandidaterne (kandidat_tripletter) evalueres parallelt i bedste-heuristik-først rækkefølge, hver
+    scoret på RMS residual mod hele buen, indtil alle er prøvet eller tidsbudgettet er brugt.
+    log(message) som i beregn_TLE_ensemble.
+    Returnerer de antal_bedste rækker (som beregn_TLE_ensemble, plus 'indices') sorteret efter RMS"""
+    log = log or (lambda message: log_tle_message(self, message))
+    if metode not in TRIPLET_METODER:
+        raise ValueError(f"Triplet søgning kræver en 3-punkts metode ({', '.join(TRIPLET_METODER)}), fik '{metode}'")
+    
+    n = len(data['DATE_OBS'])
+    kandidater = kandidat_tripletter(data['DATE_OBS'], data['Sat_RA'], data['Sat_DEC'], **beskæring)
+    log(f"Triplet søgning ({metode}): {len(kandidater)} kandidater ud af "
+        f"{math.comb(n, 3) if n >= 3 else 0} mulige, tidsbudget {tidsbudget_s:.0f} s")
+    if not kandidater:
+        return []
+    
+    df = getattr(self, 'tle_csv_data', None)
+    tle_csv_data = df[['TLE1']].head(1) if df is not None and 'TLE1' in df.columns else None
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    # Små portioner i heuristisk rækkefølge så de bedste kandidater når at blive prøvet inden for budgettet
+    portion = max(1, min(25, math.ceil(len(kandidater) / (workers * 8))))
+    deadline = time.time() + tidsbudget_s
+    opgaver = [(metode, data, kandidater[s:s + portion], tle_csv_data, deadline)
+               for s in range(0, len(kandidater), portion)]
+    
+    rækker, evalueret, fejlede = [], 0, 0
+    t0 = time.perf_counter()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(_triplet_worker, opgave) for opgave in opgaver]
+        try:
+            # Workerne stopper selv ved deadline; lidt ekstra tid til den igangværende IOD beregning
+            for future in concurrent.futures.as_completed(futures, timeout=tidsbudget_s + 30):
+                try:
+                    portion_rækker, n_evalueret, n_fejlede = future.result()
+                except Exception:
+                    continue
+                rækker += portion_rækker
+                evalueret += n_evalueret
+                fejlede += n_fejlede
+        except concurrent.futures.TimeoutError:
+            log("⚠️ Triplet søgning: tidsbudgettet er overskredet - venter på de igangværende IOD beregninger")
+    finally:
+        # Portioner der ikke er startet annulleres; de startede stopper selv ved deadline, så der ventes
+        # højst på én IOD beregning pr. worker og ingen processer lever videre efter søgningen
+        executor.shutdown(wait=True, cancel_futures=True)
+    
+    log(f"Triplet søgning: {evalueret}/{len(kandidater)} kandidater evalueret, {fejlede} fejlede "
+        f"({time.perf_counter() - t0:.1f} s)")
+    rækker.sort(key=lambda r: r['rms_arcsec'])
+    return rækker[:antal_bedste]
+
+def calculate_tle_triplet_search(self):
+    """Kør triplet søgningen for den valgte metode i baggrunden og vis de bedste i ensemble tabellen"""
+    if self.tle_csv_data is None:
+        messagebox.showwarning("Ingen data", "Indlæs først en CSV-fil med observationsdata")
+        log_tle_message(self, "❌ Ingen data indlæst")
+        return
+    if not ORBDTOOLS_AVAILABLE:
+        log_tle_message(self, "❌ FEJL: orbdtools ikke tilgængelig!")
+        messagebox.showerror("Fejl", "orbdtools biblioteket er ikke installeret.\n\nInstaller med: pip install orbdtools")
+        return
+    
+    metode = self.tle_method_combo.get()
+    if metode not in TRIPLET_METODER:
+        messagebox.showerror("Fejl", f"Triplet søgning kræver en 3-punkts metode:\n{', '.join(TRIPLET_METODER)}")
+        return
+    try:
+        tidsbudget_s = float(self.tle_triplet_budget_var.get())
+    except (tk.TclError, ValueError):
+        tidsbudget_s = 60.0
+    
+    data = observationsdata(self.tle_csv_data)
+    for item in self.tle_ensemble_tree.get_children():
+        self.tle_ensemble_tree.delete(item)
+    log = lambda message: self.root.after(0, log_tle_message, self, message)
+    
+    def koer():
+        t0 = time.perf_counter()
+        try:
+            rækker = soeg_tripletter(self, data, metode, tidsbudget_s, log=log)
+        except Exception as e:
+            log(f"❌ Triplet søgning fejlede: {str(e)}")
+            return
+        varighed = time.perf_counter() - t0
+        self.root.after(0, lambda: vis_ensemble_tabel(self, rækker, varighed, titel="Triplet søgning"))
+    
+    threading.Thread(target=koer, daemon=True).start()
+
+def calculate_tle_refinement(self):
+    """Forfin den viste TLE med differentialkorrektion mod alle observationer (i baggrunden)"""
+    if self.tle_csv_data is None or self.tle_result is None:
+        messagebox.showwarning("Ingen TLE", "Beregn først en TLE")
+        return
+    try:
+        from Func_Differentialkorrektion import differentialkorrektion, klassiske_elementer
+    except ImportError as e:
+        messagebox.showerror("Fejl", f"Differentialkorrektion kræver sgp4 og skyfield:\n{str(e)}")
+        return
+    
+    line1, line2 = self.tle_result['tle_lines']
+    metode = self.tle_result['method']
+    data = observationsdata(self.tle_csv_data)
+    fit_bstar = bool(self.tle_fit_bstar_var.get())
+    log = lambda message: self.root.after(0, log_tle_message, self, message)
+    
+    def koer():
+        try:
+            dk = differentialkorrektion(line1, line2, **data, fit_bstar=fit_bstar, log=log)
+            sat = dk['satrec']
+            _, r, v = sat.sgp4(sat.jdsatepoch, sat.jdsatepochF)
+        except Exception as e:
+            log(f"❌ Differentialkorrektion fejlede: {str(e)}")
+            return
+        result = {
+            'r': np.array(r),  # TEME ved epoken
+            'v': np.array(v),
+            'coe': klassiske_elementer(sat),
+            'tle': None,
+            'tle_lines': dk['tle_lines'],
+            'method': metode if metode.endswith('+DK') else f"{metode}+DK",
+            'dk': {nøgle: værdi for nøgle, værdi in dk.items() if nøgle != 'satrec'},
+        }
+        self.root.after(0, lambda: vis_dk_resultat(self, result))
+    
+    log_tle_message(self, f"Starter differentialkorrektion af {metode} TLE{' med B*' if fit_bstar else ''}...")
+    threading.Thread(target=koer, daemon=True).start()
+
+def vis_dk_resultat(self, result):
+    """Vis den forfinede TLE og elementernes 1-sigma usikkerheder"""
+    dk = result['dk']
+    for navn in dk['parametre']:
+        log_tle_message(self, f"  {navn}: {dk['elementer'][navn]:.8f} ± {dk['sigma'][navn]:.2e}")
+    if dk['afviste']:
+        log_tle_message(self, f"  Afviste observationer (indices): {dk['afviste']}")
+    vis_tle_resultat(self, result)
+
+def calculate_tle_ensemble(self):
+    """Kør ensemblet i baggrunden og vis den rangerede tabel"""
+    if self.tle_csv_data is None:
+        messagebox.showwarning("Ingen data", "Indlæs først en CSV-fil med observationsdata")
+        log_tle_message(self, "❌ Ingen data indlæst")
+        return
+    if not ORBDTOOLS_AVAILABLE:
+        log_tle_message(self, "❌ FEJL: orbdtools ikke tilgængelig!")
+        messagebox.showerror("Fejl", "orbdtools biblioteket er ikke installeret.\n\nInstaller med: pip install orbdtools")
+        return
+    
+    index_list = valgte_indices(self)
+    if index_list is None:
+        return
+    
+    data = observationsdata(self.tle_csv_data)
+    log_tle_message(self, f"Starter ensemble: {', '.join(IOD_METODER)} (indices: {index_list}, "
+                          f"residualer mod alle {len(data['DATE_OBS'])} observationer)")
+    for item in self.tle_ensemble_tree.get_children():
+        self.tle_ensemble_tree.delete(item)
+    log = lambda message: self.root.after(0, log_tle_message, self, message)
+    
+    def koer():
+        t0 = time.perf_counter()
+        try:
+            rækker = beregn_TLE_ensemble(self, data, index_list, log=log)
+        except Exception as e:
+            log(f"❌ Ensemble fejlede: {str(e)}")
+            return
+        varighed = time.perf_counter() - t0
+        self.root.after(0, lambda: vis_ensemble_tabel(self, rækker, varighed))
+    
+    threading.Thread(target=koer, daemon=True).start()
+
+def vis_ensemble_tabel(self, rækker, varighed, titel="Ensemble"):
+    """Fyld ensemble tabellen (bedste metode/triplet øverst) og brug den bedste TLE"""
+    self.tle_ensemble_results = rækker
+    for item in self.tle_ensemble_tree.get_children():
+        self.tle_ensemble_tree.delete(item)
+    for rank, række in enumerate(rækker, start=1):
+        ok = række['error'] is None
+        self.tle_ensemble_tree.insert('', 'end', iid=str(rank - 1), values=(
+            rank, f"{række['method']} {række['indices']}" if række.get('indices') else række['method'],
+            f"{række['rms_arcsec']:.1f}" if ok else '-',
+            f"{række['max_arcsec']:.1f}" if ok else '-',
+            f"{række['wall_s']:.2f}" if np.isfinite(række['wall_s']) else '-',
+            'OK' if ok else række['error'][:60]))
+    
+    total_cpu = sum(r['wall_s'] for r in rækker if np.isfinite(r['wall_s']))
+    log_tle_message(self, f"{titel} færdigt på {varighed:.1f} s (sum af metodetider {total_cpu:.1f} s)")
+    if rækker and rækker[0]['error'] is None:
+        bedste = rækker[0]
+        log_tle_message(self, f"Bedste: {bedste['method']} {bedste.get('indices') or ''} "
+                              f"(RMS {bedste['rms_arcsec']:.1f}\")")
+        self.tle_ensemble_tree.selection_set('0')
+    else:
+        log_tle_message(self, "❌ Ingen metode gav en TLE")
+
+def vaelg_ensemble_resultat(self):
+    """Brug TLE'en fra den valgte ensemble række"""
+    valgt = self.tle_ensemble_tree.selection()
+    if not valgt:
+        return
+    række = self.tle_ensemble_results[int(valgt[0])]
+    if række['result'] is None:
+        return
+    for line in række['log_lines']:
+        log_tle_message(self, line)
+    self.tle_method_combo.set(række['method'])
+    if række.get('indices'):
+        for combo, index in zip((self.index1_combo, self.index2_combo, self.index3_combo), række['indices']):
+            combo.set(str(index))
+    vis_tle_resultat(self, række['result'])
+
 def show_tle_3d_plot(self):
     """Show 3D plot of calculated TLE"""
     try:
@@ -1176,7 +1566,7 @@ def show_tle_3d_plot(self):
         df = self.tle_csv_data
         
         if SKYFIELD_AVAILABLE:
-            ts = load.timescale()
+            ts = get_timescale()
             
             if 'Calculated_TLE_Line1' in df.columns and 'Calculated_TLE_Line2' in df.columns:
                 line1 = df['Calculated_TLE_Line1'].iloc[0]
@@ -1197,7 +1587,7 @@ def show_tle_3d_plot(self):
                 log_tle_message(self, "Creating satellite from calculated TLE...")
                 
                 try:
-                    satellite = EarthSatellite(line1, line2, 'Calculated TLE', ts)
+                    satellite = get_satellite(line1, line2, 'Calculated TLE')
                     log_tle_message(self, "✅ Calculated TLE satellite created successfully")
                 except Exception as e:
                     log_tle_message(self, f"❌ Could not create satellite from calculated TLE: {str(e)}")
@@ -1221,7 +1611,19 @@ def show_tle_3d_plot(self):
                 
                 ts_times = ts.utc(years, months, days, hours, minutes, seconds)
                 
-                tle_positions = satellite.at(ts_times).position.km.T
+                # Beregnet og original TLE propageres sammen i ét kald (original som anden satellit)
+                from Func_Propagering import propager
+                tle_par = [(line1, line2)]
+                if 'TLE1' in df.columns and 'TLE2' in df.columns:
+                    original_tle1, original_tle2 = df['TLE1'].iloc[0], df['TLE2'].iloc[0]
+                    if pd.notna(original_tle1) and pd.notna(original_tle2) and original_tle1.strip() and original_tle2.strip():
+                        try:
+                            get_satellite(original_tle1, original_tle2, 'Original TLE')
+                            tle_par.append((original_tle1, original_tle2))
+                        except Exception:
+                            pass  # Fejlen logges nedenfor
+                bane_positioner = propager(tle_par, ts_times)[0]
+                tle_positions = bane_positioner[0]
                 
                 fig.add_trace(go.Scatter3d(
                     x=tle_positions[:, 0],
@@ -1240,9 +1642,9 @@ def show_tle_3d_plot(self):
                         log_tle_message(self, "Plotting original TLE...")
                         
                         try:
-                            original_satellite = EarthSatellite(original_tle1, original_tle2, 'Original TLE', ts)
+                            get_satellite(original_tle1, original_tle2, 'Original TLE')
                             
-                            original_tle_positions = original_satellite.at(ts_times).position.km.T
+                            original_tle_positions = bane_positioner[1]
                         
                             
                             fig.add_trace(go.Scatter3d(
@@ -1284,44 +1686,22 @@ def show_tle_3d_plot(self):
             
             ts_obs_times = ts.utc(obs_years, obs_months, obs_days, obs_hours, obs_minutes, obs_seconds)
             log_tle_message(self, f"Times for satellite {ts_obs_times}")
-            tle_sat_positions = satellite.at(ts_obs_times).position.km
+            from Func_Propagering import propager
+            tle_sat_positions = propager([(line1, line2)], ts_obs_times)[0][0].T
             
             obs_x = df['X_obs'].values
             obs_y = df['Y_obs'].values
             obs_z = df['Z_obs'].values
             obs_positions = np.array([obs_x, obs_y, obs_z]).T
             
-            distances = []
-            for i in range(len(tle_sat_positions.T)):
-                sat_pos = tle_sat_positions.T[i]
-                obs_pos = obs_positions[i]
-                distance = np.linalg.norm(sat_pos - obs_pos)
-                distances.append(distance)
-            
-            distances = np.array(distances)
+            distances = np.linalg.norm(tle_sat_positions.T - obs_positions, axis=1)
             if np.isnan(distances).any():
                 log_tle_message(self, "❌ Calculated distances contain NaN values")
             
             
             log_tle_message(self, "Converting RA/DEC/Distance to ECI xyz...")
-            sat_xyz_from_radec = []
-            
-            for i in range(len(sat_ra_behandlet)):
-                ra_rad = np.radians(sat_ra_behandlet[i])
-                dec_rad = np.radians(sat_dec_behandlet[i])
-                dist = distances[i]
-                
-                x_rel = dist * np.cos(dec_rad) * np.cos(ra_rad)
-                y_rel = dist * np.cos(dec_rad) * np.sin(ra_rad)
-                z_rel = dist * np.sin(dec_rad)
-                
-                x_abs = x_rel + obs_positions[i][0]
-                y_abs = y_rel + obs_positions[i][1]
-                z_abs = z_rel + obs_positions[i][2]
-                
-                sat_xyz_from_radec.append([x_abs, y_abs, z_abs])
-            
-            sat_xyz_from_radec = np.array(sat_xyz_from_radec)
+            from Func_Propagering import radec_til_xyz
+            sat_xyz_from_radec = radec_til_xyz(sat_ra_behandlet, sat_dec_behandlet, distances) + obs_positions
             
             fig.add_trace(go.Scatter3d(
                 x=sat_xyz_from_radec[:, 0],
@@ -1422,6 +1802,9 @@ def save_tle_results(self):
         df['TLE_v_z_kms'] = v[2]
         
         df.to_csv(csv_path, index=False)
+        # Keep the Parquet core file in sync, since it is preferred when loading
+        if os.path.exists(columnar_paths(csv_path)[0]):
+            write_result(df, csv_path)
         
         log_tle_message(self, f"✅ Results saved to: {csv_files[0]}")
         log_tle_message(self, f"Added columns:")
@@ -0,0 +1,586 @@
+"""
+Func_Detektion.py - Detektionsmotorer til Tracking og LeapFrog billeder
+Tracking: finder det lyseste sammenhængende objekt omkring de lyseste pixels uden fuld-frame
+masker - nabolagsmasken laves med én separabel dilation pr. klynge af lyse pixels, og
+labelling, objektvalg og cirkulær pixelsum køres kun på udsnit (cutouts) af billedet.
+LeapFrog: streak detektion i to niveauer - grov Hough detektion på et kraftigt binnet
+billede, sammenlægning af kollineære fragmenter og sub-pixel endepunkter fra en
+fuld-opløsnings strimmel langs linjen.
+Tracking kan begrænses til et vindue (ROI) omkring den TLE-forudsagte position (roi_vindue)
+"""
+
+import sys
+import time
+import numpy as np
+import cv2
+from scipy.ndimage import label, find_objects, maximum_filter1d, map_coordinates
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from Func_FitsLoader import binned_view
+
+NUM_TOP_PIXELS = 1000
+NEIGHBOR_RADIUS = 80
+MIN_OBJEKT_STOERRELSE = 20
+
+# LeapFrog streak detektion (længder i fuld-opløsnings pixels for en REFERENCE_STOERRELSE frame;
+# binning, minimumslængde og kantmargin skaleres med framens mindste dimension i streak_parametre)
+REFERENCE_STOERRELSE = 4096
+STREAK_BINNING = 8
+MIN_STREAK_LAENGDE = 400
+KANT_MARGIN = 200
+STREAK_SIGMA = 3.0
+STRIMMEL_HALV_BREDDE = 24
+
+
+# cv2.calcHist tæller i float32, som kun er eksakt op til 2**24 - histogrammet bygges i bidder
+HISTOGRAM_BID_PIXELS = 1 << 24
+
+
+def _heltals_histogram(data):
+    """Antal pixels pr. værdi for 8/16-bit heltalsbilleder (int64), None for andre typer.
+    cv2.calcHist er ~6x hurtigere end np.bincount, der først kopierer framen til int64"""
+    if data.dtype.kind != 'u' or data.dtype.itemsize > 2:
+        return None
+    data = data.reshape(data.shape[0], -1) if data.ndim > 1 else data.reshape(1, -1)
+    bins = 1 << (8 * data.dtype.itemsize)
+    raekker = max(1, HISTOGRAM_BID_PIXELS // max(1, data.shape[1]))
+    histogram = np.zeros(bins, dtype=np.int64)
+    for start in range(0, data.shape[0], raekker):
+        bid = np.ascontiguousarray(data[start:start + raekker])
+        if data.shape[1] > HISTOGRAM_BID_PIXELS:
+            histogram += np.bincount(bid.ravel(), minlength=bins)
+        else:
+            histogram += cv2.calcHist([bid], [0], None, [bins], [0, bins]).ravel().astype(np.int64)
+    return histogram
+
+
+def frame_median(data):
+    """Median af hele billedet - samme værdi som np.median, men via histogram for 8/16-bit
+    heltalsbilleder (ingen sortering/partition af hele framen)"""
+    histogram = _heltals_histogram(data)
+    if histogram is None:
+        return float(np.median(data))
+
+    taelling = np.cumsum(histogram)
+    n = taelling[-1]
+    # np.median tager gennemsnittet af de to midterste værdier ved lige antal
+    nedre = int(np.searchsorted(taelling, (n - 1) // 2, side='right'))
+    oevre = int(np.searchsorted(taelling, n // 2, side='right'))
+    return (float(nedre) + float(oevre)) / 2
+
+
+def top_pixel_positions(data, num_top_pixels=NUM_TOP_PIXELS):
+    """(y, x) for de num_top_pixels lyseste pixels - samme udvalg som den oprindelige argpartition.
+    For heltalsbilleder findes grænseværdien i histogrammet, så kun pixels over den (typisk få
+    tusinde) partitioneres i stedet for hele framen. Ved lige værdier på grænsen vælges som
+    før et vilkårligt udsnit."""
+    num_top_pixels = min(num_top_pixels, data.size)
+    if num_top_pixels <= 0:
+        return np.unravel_index(np.array([], dtype=np.intp), data.shape)
+    flat = data.ravel()
+    histogram = _heltals_histogram(data)
+    if histogram is None:
+        flat_indices = np.argpartition(flat, -num_top_pixels)[-num_top_pixels:]
+        return np.unravel_index(flat_indices, data.shape)
+
+    # Største værdi v med mindst num_top_pixels pixels >= v
+    over = np.cumsum(histogram[::-1])[::-1]
+    graense = int(np.flatnonzero(over >= num_top_pixels)[-1])
+    kandidater = np.flatnonzero(flat >= graense)
+    if len(kandidater) > num_top_pixels:
+        kandidater = kandidater[np.argpartition(flat[kandidater], -num_top_pixels)[-num_top_pixels:]]
+    return np.unravel_index(kandidater, data.shape)
+
+
+def _dilater(seed_mask, radius):
+    """Separabel dilation med en (2r+1) x (2r+1) kvadratisk kerne"""
+    size = 2 * radius + 1
+    dilateret = maximum_filter1d(seed_mask.view(np.uint8), size, axis=0, mode='constant', cval=0)
+    dilateret = maximum_filter1d(dilateret, size, axis=1, mode='constant', cval=0)
+    return dilateret.view(bool)
+
+
+def neighbourhood_mask(shape, ys, xs, radius=NEIGHBOR_RADIUS):
+    """Fuld-frame maske med en (2r+1) kvadrat omkring hver position (bruges kun til plots)"""
+    seeds = np.zeros(shape, dtype=bool)
+    seeds[ys, xs] = True
+    return _dilater(seeds, radius)
+
+
+def _klynger(ys, xs, radius):
+    """Grupper positioner hvis kvadrater overlapper eller rører hinanden.
+    Returnerer liste af index-arrays - én pr. klynge"""
+    n = len(ys)
+    if n == 0:
+        return []
+    graense = 2 * radius + 1
+    naer = (np.abs(ys[:, None] - ys[None, :]) <= graense) & (np.abs(xs[:, None] - xs[None, :]) <= graense)
+    raekker, kolonner = np.nonzero(naer)
+    graf = coo_matrix((np.ones(len(raekker), dtype=np.int8), (raekker, kolonner)), shape=(n, n))
+    antal, labels = connected_components(graf, directed=False)
+    return [np.flatnonzero(labels == k) for k in range(antal)]
+
+
+def find_brightest_object(data, threshold, num_top_pixels=NUM_TOP_PIXELS,
+                          neighbor_radius=NEIGHBOR_RADIUS, min_size=MIN_OBJEKT_STOERRELSE):
+    """
+    Find det lyseste objekt (højeste middelværdi i bounding box) blandt sammenhængende
+    pixels over threshold inden for neighbor_radius af de num_top_pixels lyseste pixels.
+
+    Giver samme resultat som den oprindelige fuld-frame maske + label + find_objects,
+    inkl. rækkefølgen ved lige middelværdier (label-rækkefølge = første pixel i rasterorden).
+
+    Returns:
+    (slice_y, slice_x) i fuld-frame koordinater, eller None
+    """
+    ys, xs = top_pixel_positions(data, num_top_pixels)
+    ys = ys.astype(np.int64)
+    xs = xs.astype(np.int64)
+    height, width = data.shape
+
+    kandidater = []  # (første pixel række, første pixel kolonne, middelværdi, slice)
+    for klynge in _klynger(ys, xs, neighbor_radius):
+        ky, kx = ys[klynge], xs[klynge]
+        y0 = max(0, int(ky.min()) - neighbor_radius)
+        y1 = min(height, int(ky.max()) + neighbor_radius + 1)
+        x0 = max(0, int(kx.min()) - neighbor_radius)
+        x1 = min(width, int(kx.max()) + neighbor_radius + 1)
+
+        seeds = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        seeds[ky - y0, kx - x0] = True
+        cutout = data[y0:y1, x0:x1]
+        labeled, antal = label(_dilater(seeds, neighbor_radius) & (cutout > threshold))
+        if antal == 0:
+            continue
+        # Et objekt på min_size x min_size har mindst min_size pixels - de mange små støjklatter
+        # fjernes før find_objects (nummereringen beholder label-rækkefølgen)
+        behold = np.bincount(labeled.ravel(), minlength=antal + 1) >= min_size
+        behold[0] = False
+        labeled = (np.cumsum(behold) * behold)[labeled]
+
+        for nummer, slice_ in enumerate(find_objects(labeled), start=1):
+            if slice_ is None:
+                continue
+            sy, sx = slice_
+            if sy.stop - sy.start < min_size or sx.stop - sx.start < min_size:
+                continue
+            foerste_kolonne = sx.start + int(np.argmax(labeled[sy.start, sx] == nummer))
+            global_slice = (slice(sy.start + y0, sy.stop + y0), slice(sx.start + x0, sx.stop + x0))
+            kandidater.append((sy.start + y0, foerste_kolonne + x0, np.mean(data[global_slice]), global_slice))
+
+    brightest_object_slice = None
+    max_val = -np.inf
+    for _, _, region_mean, global_slice in sorted(kandidater, key=lambda k: (k[0], k[1])):
+        if region_mean > max_val:
+            max_val = region_mean
+            brightest_object_slice = global_slice
+    return brightest_object_slice
+
+
+def slice_center(slice_):
+    """Heltals centrum (x, y) af et objekts bounding box"""
+    y_center = (slice_[0].start + slice_[0].stop - 1) // 2
+    x_center = (slice_[1].start + slice_[1].stop - 1) // 2
+    return x_center, y_center
+
+
+def roi_vindue(shape, center, radius):
+    """(y, x) slices for et kvadratisk vindue med halv bredde radius omkring center=(x, y),
+    klippet til billedet. None hvis centrum ikke er endeligt eller ligger uden for billedet."""
+    x, y = center
+    if not (np.isfinite(x) and np.isfinite(y)) or not (0 <= x < shape[1] and 0 <= y < shape[0]):
+        return None
+    x, y, r = int(round(x)), int(round(y)), int(radius)
+    return (slice(max(0, y - r), min(shape[0], y + r + 1)),
+            slice(max(0, x - r), min(shape[1], x + r + 1)))
+
+
+def aperture_sum(data, x_center, y_center, radius):
+    """Sum af pixels inden for radius af (x_center, y_center) - beregnet på et udsnit"""
+    r = int(np.floor(radius))
+    y0, y1 = max(0, y_center - r), min(data.shape[0], y_center + r + 1)
+    x0, x1 = max(0, x_center - r), min(data.shape[1], x_center + r + 1)
+    Y_grid = np.arange(y0, y1)[:, None]
+    X_grid = np.arange(x0, x1)[None, :]
+    circular_mask = np.sqrt((X_grid - x_center)**2 + (Y_grid - y_center)**2) <= radius
+    return float(np.sum(data[y0:y1, x0:x1][circular_mask], dtype=np.float64))
+
+
+def _reference_tracking_detection(image_data, radius_pixelsum):
+    """Den oprindelige fuld-frame implementation (kun til regressionstest og benchmark)"""
+    num_top_pixels = 1000
+    flat_indices = np.argpartition(image_data.ravel(), -num_top_pixels)[-num_top_pixels:]
+    sorted_indices = flat_indices[np.argsort(image_data.ravel()[flat_indices])[::-1]]
+    sorted_positions = np.unravel_index(sorted_indices, image_data.shape)
+
+    neighbor_radius = 80
+    mask = np.zeros_like(image_data, dtype=bool)
+    for y, x in zip(sorted_positions[0], sorted_positions[1]):
+        y_start = max(0, y - neighbor_radius)
+        y_end = min(image_data.shape[0], y + neighbor_radius + 1)
+        x_start = max(0, x - neighbor_radius)
+        x_end = min(image_data.shape[1], x + neighbor_radius + 1)
+        mask[y_start:y_end, x_start:x_end] = True
+
+    thresholded_data = mask & (image_data > np.median(image_data) + 30)
+    labeled_array, num_features = label(thresholded_data)
+
+    brightest_object_slice = None
+    max_val = -np.inf
+    for slice_ in find_objects(labeled_array):
+        if slice_ is None:
+            continue
+        region = image_data[slice_]
+        if region.shape[0] >= 20 and region.shape[1] >= 20:
+            region_mean = np.mean(region)
+            if region_mean > max_val:
+                max_val = region_mean
+                brightest_object_slice = slice_
+
+    if brightest_object_slice is None:
+        return np.nan, np.nan, np.nan
+    y_center = (brightest_object_slice[0].start + brightest_object_slice[0].stop - 1) // 2
+    x_center = (brightest_object_slice[1].start + brightest_object_slice[1].stop - 1) // 2
+    Y_grid, X_grid = np.ogrid[:image_data.shape[0], :image_data.shape[1]]
+    circular_mask = np.sqrt((X_grid - x_center)**2 + (Y_grid - y_center)**2) <= radius_pixelsum
+    pixel_sum = float(np.sum(image_data[circular_mask], dtype=np.float64))
+    np.median(image_data)  # image_median i resultatet
+    return x_center, y_center, pixel_sum
+
+
+def tracking_detection(image_data, radius_pixelsum):
+    """Detektionsmotoren som find_satellite_position_tracking bruger: (x_sat, y_sat, pixel_sum)"""
+    median = frame_median(image_data)
+    slice_ = find_brightest_object(image_data, median + 30)
+    if slice_ is None:
+        return np.nan, np.nan, np.nan
+    x_center, y_center = slice_center(slice_)
+    return x_center, y_center, aperture_sum(image_data, x_center, y_center, radius_pixelsum)
+
+
+def _robust_baggrund(data):
+    """(median, sigma) estimeret med MAD"""
+    median = float(np.median(data))
+    sigma = 1.4826 * float(np.median(np.abs(data - median)))
+    return median, sigma
+
+
+def merge_collinear_segments(segmenter, vinkel_tol=2.0, afstand_tol=2.0):
+    """
+    Læg Hough fragmenter der ligger på samme linje sammen.
+    Fragmenter med retning inden for vinkel_tol grader og vinkelret afstand under afstand_tol
+    (samme enheder som segmenterne) samles til ét segment mellem de yderste endepunkter.
+
+    Returns:
+    liste af (x1, y1, x2, y2, antal_fragmenter) sorteret efter længde (længste først)
+    """
+    segmenter = [tuple(float(v) for v in np.ravel(seg)[:4]) for seg in segmenter]
+    segmenter.sort(key=lambda seg: -np.hypot(seg[2] - seg[0], seg[3] - seg[1]))
+    grupper = []  # [retning, punkt på linjen, liste af endepunkter, antal]
+    for x1, y1, x2, y2 in segmenter:
+        retning = np.array([x2 - x1, y2 - y1])
+        retning /= np.linalg.norm(retning) or 1.0
+        for gruppe in grupper:
+            g_retning, g_punkt = gruppe[0], gruppe[1]
+            if abs(np.dot(retning, g_retning)) < np.cos(np.radians(vinkel_tol)):
+                continue
+            normal = np.array([-g_retning[1], g_retning[0]])
+            if max(abs(np.dot(np.array([x, y]) - g_punkt, normal)) for x, y in ((x1, y1), (x2, y2))) > afstand_tol:
+                continue
+            gruppe[2].extend([(x1, y1), (x2, y2)])
+            gruppe[3] += 1
+            break
+        else:
+            grupper.append([retning, np.array([x1, y1]), [(x1, y1), (x2, y2)], 1])
+
+    resultat = []
+    for g_retning, g_punkt, punkter, antal in grupper:
+        s = [np.dot(np.array(p) - g_punkt, g_retning) for p in punkter]
+        p1 = g_punkt + min(s) * g_retning
+        p2 = g_punkt + max(s) * g_retning
+        resultat.append((p1[0], p1[1], p2[0], p2[1], antal))
+    resultat.sort(key=lambda seg: -np.hypot(seg[2] - seg[0], seg[3] - seg[1]))
+    return resultat
+
+
+def coarse_streaks(image_data, binning=STREAK_BINNING, min_laengde=MIN_STREAK_LAENGDE, sigma=STREAK_SIGMA):
+    """Grov streak detektion på et binnet billede.
+    Returnerer (sammenlagte segmenter i binnede pixels, antal Hough fragmenter)"""
+    lille = binned_view(image_data, binning)
+    median, stoej = _robust_baggrund(lille)
+    binaer = (lille > median + max(sigma * stoej, 1.0)).astype(np.uint8)
+
+    # Fjern små komponenter (stjerner, hot pixels) med et opslag pr. label i stedet for np.isin
+    min_laengde_lille = max(8, int(min_laengde / binning))
+    antal, labels, stats, _ = cv2.connectedComponentsWithStats(binaer, connectivity=8)
+    behold = stats[:, cv2.CC_STAT_AREA] >= min_laengde_lille // 2
+    behold[0] = False
+    binaer = (behold[labels] * 255).astype(np.uint8)
+
+    lines = cv2.HoughLinesP(binaer, 1, np.pi / 360, threshold=max(10, min_laengde_lille // 2),
+                            minLineLength=min_laengde_lille // 2, maxLineGap=max(2, min_laengde_lille // 10))
+    if lines is None:
+        return [], 0
+    segmenter = [seg for seg in merge_collinear_segments(lines)
+                 if np.hypot(seg[2] - seg[0], seg[3] - seg[1]) >= min_laengde_lille]
+    return segmenter, len(lines)
+
+
+def _strimmel(image_data, p0, retning, s_min, s_max, halv_bredde):
+    """Sample en fuld-opløsnings strimmel langs linjen (bilineær, NaN uden for billedet).
+    Returnerer (s akse, d akse, strimmel[d, s])"""
+    normal = np.array([-retning[1], retning[0]])
+    s_akse = np.arange(np.floor(s_min), np.ceil(s_max) + 1.0)
+    d_akse = np.arange(-halv_bredde, halv_bredde + 1.0)
+    x = p0[0] + s_akse[None, :] * retning[0] + d_akse[:, None] * normal[0]
+    y = p0[1] + s_akse[None, :] * retning[1] + d_akse[:, None] * normal[1]
+    strimmel = map_coordinates(image_data, [y.ravel(), x.ravel()], order=1, mode='constant',
+                               cval=np.nan, output=np.float64).reshape(x.shape)
+    return s_akse, d_akse, strimmel
+
+
+def _kant_krydsning(profil, s_akse, niveau, start, skridt):
+    """Gå fra index start i retning skridt til profilen falder under niveau; lineær interpolation"""
+    i = start
+    while 0 <= i + skridt < len(profil):
+        naeste = i + skridt
+        if not np.isfinite(profil[naeste]) or profil[naeste] < niveau:
+            if not np.isfinite(profil[naeste]):
+                return s_akse[i]  # Billedkant - streaken fortsætter ud af billedet
+            brøk = (profil[i] - niveau) / (profil[i] - profil[naeste])
+            return s_akse[i] + brøk * (s_akse[naeste] - s_akse[i])
+        i = naeste
+    return s_akse[i]
+
+
+def refine_streak(image_data, x1, y1, x2, y2, halv_bredde=STRIMMEL_HALV_BREDDE, iterationer=2):
+    """
+    Sub-pixel forfining af en streak på fuld opløsning.
+    Tværs af linjen fittes tyngdepunkterne til en ret linje (position og vinkel), langs linjen
+    findes endepunkterne hvor profilen krydser halvdelen af streakens niveau.
+
+    Returns:
+    (x1, y1, x2, y2) i fuld-opløsnings pixels
+    """
+    p0 = np.array([x1, y1], dtype=np.float64)
+    retning = np.array([x2 - x1, y2 - y1], dtype=np.float64)
+    laengde = np.linalg.norm(retning)
+    retning /= laengde
+    s_start, s_slut = 0.0, laengde
+    margin = 2 * halv_bredde
+
+    for _ in range(iterationer):
+        s_akse, d_akse, strimmel = _strimmel(image_data, p0, retning, s_start - margin, s_slut + margin, halv_bredde)
+        baggrund = np.nanmedian(strimmel)
+        signal = np.nan_to_num(strimmel - baggrund, nan=0.0)
+
+        # Tværprofil: tyngdepunkt pr. s inden for den indre del af streaken
+        indre = (s_akse > s_start + 0.2 * (s_slut - s_start)) & (s_akse < s_slut - 0.2 * (s_slut - s_start))
+        # Stjerner i strimlen er op til 50x lysere end streaken - klip vægtene ved streakens typiske
+        # top, så de ikke trækker tyngdepunkterne og dermed vinklen
+        vaegt = np.clip(signal[:, indre], 0, None)
+        vaegt = np.minimum(vaegt, 2 * np.median(vaegt.max(axis=0)))
+        flux = vaegt.sum(axis=0)
+        gyldig = flux > 0
+        if gyldig.sum() < 3:
+            break
+        centroid = (vaegt[:, gyldig] * d_akse[:, None]).sum(axis=0) / flux[gyldig]
+        s_fit, w_fit = s_akse[indre][gyldig], np.sqrt(flux[gyldig])
+        haeldning, offset = np.polyfit(s_fit, centroid, 1, w=w_fit)
+
+        # Afvis tyngdepunkter der stadig afviger (3 MAD) og fit igen
+        rest = centroid - (haeldning * s_fit + offset)
+        mad = 1.4826 * np.median(np.abs(rest - np.median(rest)))
+        inliers = np.abs(rest) <= max(3 * mad, 0.5)
+        if 3 <= inliers.sum() < len(rest):
+            haeldning, offset = np.polyfit(s_fit[inliers], centroid[inliers], 1, w=w_fit[inliers])
+
+        # Flyt linjen og drej retningen
+        normal = np.array([-retning[1], retning[0]])
+        p0 = p0 + offset * normal
+        retning = retning + haeldning * normal
+        retning /= np.linalg.norm(retning)
+
+    # Længdeprofil i et smalt bånd omkring den forfinede linje
+    s_akse, d_akse, strimmel = _strimmel(image_data, p0, retning, s_start - margin, s_slut + margin, halv_bredde)
+    baggrund = np.nanmedian(strimmel)
+    baand = np.abs(d_akse) <= max(3, halv_bredde // 4)
+    profil = np.sum(strimmel[baand] - baggrund, axis=0)  # NaN uden for billedet
+    indre = (s_akse > s_start + 0.25 * (s_slut - s_start)) & (s_akse < s_slut - 0.25 * (s_slut - s_start))
+    niveau = 0.5 * np.nanmedian(profil[indre])
+    midt = int(np.flatnonzero(indre)[len(np.flatnonzero(indre)) // 2])
+
+    s1 = _kant_krydsning(profil, s_akse, niveau, midt, -1)
+    s2 = _kant_krydsning(profil, s_akse, niveau, midt, 1)
+    start = p0 + s1 * retning
+    slut = p0 + s2 * retning
+    return float(start[0]), float(start[1]), float(slut[0]), float(slut[1])
+
+
+def streak_parametre(shape):
+    """(binning, min_laengde, kant_margin) for en frame med denne form.
+    Konstanterne er valgt til 4096x4096 frames; på mindre frames (fx 2x2 binnet kamera) er
+    streaks tilsvarende kortere, så en fast længde på 400 px og binning 8 overser dem eller
+    laver for grove Hough fragmenter. Hough længde/gap (i binnede pixels) er dermed de samme"""
+    skala = min(shape[:2]) / REFERENCE_STOERRELSE
+    binning = max(1, int(round(STREAK_BINNING * skala)))
+    return binning, MIN_STREAK_LAENGDE * skala, KANT_MARGIN * skala
+
+
+def find_streak(image_data, binning=None, min_laengde=None):
+    """
+    LeapFrog streak detektion: grov Hough på binnet billede -> sammenlagte fragmenter ->
+    sub-pixel endepunkter på fuld opløsning. binning og min_laengde skaleres som standard
+    med framens størrelse (streak_parametre).
+
+    Returns:
+    dict med x1, y1, x2, y2 (fuld opløsning, sub-pixel) og antal_linjer (Hough fragmenter),
+    eller None hvis ingen streak findes
+    """
+    standard_binning, standard_laengde, _ = streak_parametre(image_data.shape)
+    binning = binning or standard_binning
+    min_laengde = min_laengde or standard_laengde
+    segmenter, antal_fragmenter = coarse_streaks(image_data, binning, min_laengde)
+    if not segmenter:
+        return None
+
+    # Binnede pixelcentre -> fuld-opløsnings koordinater
+    bx1, by1, bx2, by2, _ = segmenter[0]
+    groft = [(v + 0.5) * binning - 0.5 for v in (bx1, by1, bx2, by2)]
+    x1, y1, x2, y2 = refine_streak(image_data, *groft)
+    return {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'antal_linjer': antal_fragmenter}
+
+
+def _reference_hough_streak(image_data):
+    """Den oprindelige enkelt-skala HoughLinesP detektion (kun til benchmark).
+    Returnerer (x1, y1, x2, y2) i fuld opløsning eller None"""
+    skalering = 4
+    data_small = cv2.resize(image_data, (0, 0), fx=1/skalering, fy=1/skalering).astype(np.float32)
+    data_small[data_small < np.median(data_small)+5] = 0
+    num_labels, labels_im = cv2.connectedComponents(data_small.astype(np.uint8))
+    label_counts = np.bincount(labels_im.flat)
+    small_labels = np.where(label_counts < 100)[0]
+    data_small[np.isin(labels_im, small_labels)] = 0
+    _, binary_image = cv2.threshold(data_small, 1, 1, cv2.THRESH_BINARY)
+    lines = cv2.HoughLinesP((binary_image * 255).astype(np.uint8), 1, np.pi / 180, threshold=100,
+                            minLineLength=25*skalering, maxLineGap=10)
+    if lines is None:
+        return None
+    x1, y1, x2, y2 = max(lines, key=lambda l: np.hypot(l[0][2] - l[0][0], l[0][3] - l[0][1]))[0]
+    return x1*skalering, y1*skalering, x2*skalering, y2*skalering
+
+
+def _syntetisk_streak_frame(rng, shape, bredde_sigma=1.5, amplitude=400.0):
+    """uint16 frame med baggrund, stjerner og en streak med kendte sub-pixel endepunkter"""
+    height, width = shape
+    data = rng.normal(1000, 30, size=shape)
+    for _ in range(60):  # stjerner
+        y, x = rng.integers(10, height - 10), rng.integers(10, width - 10)
+        data[y - 2:y + 3, x - 2:x + 3] += rng.uniform(500, 20000)
+
+    laengde = rng.uniform(0.25, 0.6) * min(shape)
+    vinkel = rng.uniform(0, np.pi)
+    cx, cy = rng.uniform(0.3, 0.7) * width, rng.uniform(0.3, 0.7) * height
+    x1, y1 = cx - 0.5 * laengde * np.cos(vinkel), cy - 0.5 * laengde * np.sin(vinkel)
+    x2, y2 = cx + 0.5 * laengde * np.cos(vinkel), cy + 0.5 * laengde * np.sin(vinkel)
+
+    # Analytisk streak: gaussisk tværprofil, erf-formede ender
+    from scipy.special import erf
+    y0, y1b = int(max(0, min(y1, y2) - 20)), int(min(height, max(y1, y2) + 21))
+    x0, x1b = int(max(0, min(x1, x2) - 20)), int(min(width, max(x1, x2) + 21))
+    Y, X = np.mgrid[y0:y1b, x0:x1b]
+    ux, uy = np.cos(vinkel), np.sin(vinkel)
+    s = (X - x1) * ux + (Y - y1) * uy
+    d = -(X - x1) * uy + (Y - y1) * ux
+    skala = bredde_sigma * np.sqrt(2)
+    data[y0:y1b, x0:x1b] += amplitude * np.exp(-0.5 * (d / bredde_sigma)**2) * \
+        0.5 * (erf(s / skala) - erf((s - laengde) / skala))
+    return data.clip(0, 65535).astype(np.uint16), (x1, y1, x2, y2)
+
+
+def _endepunkt_fejl(fundet, sand):
+    """Største endepunktsfejl (px) - endepunkternes rækkefølge er ligegyldig"""
+    if fundet is None:
+        return np.inf
+    a = np.array(fundet, dtype=np.float64).reshape(2, 2)
+    b = np.array(sand, dtype=np.float64).reshape(2, 2)
+    return min(np.max(np.hypot(*(a - b).T)), np.max(np.hypot(*(a - b[::-1]).T)))
+
+
+def benchmark_streak_detection(n_frames=10, shape=(4096, 4096)):
+    """Syntetisk streak suite: tid pr. frame og endepunktsfejl for enkelt-skala Hough og streak motoren"""
+    rng = np.random.default_rng(2)
+    t_gammel = t_ny = 0.0
+    fejl_gammel, fejl_ny = [], []
+    for i in range(n_frames):
+        data, sand = _syntetisk_streak_frame(rng, shape)
+
+        t0 = time.perf_counter()
+        gammel = _reference_hough_streak(data)
+        t_gammel += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ny = find_streak(data)
+        t_ny += time.perf_counter() - t0
+
+        fejl_gammel.append(_endepunkt_fejl(gammel, sand))
+        fejl_ny.append(_endepunkt_fejl(None if ny is None else (ny['x1'], ny['y1'], ny['x2'], ny['y2']), sand))
+        print(f"frame {i}: endepunktsfejl Hough {fejl_gammel[-1]:8.2f} px - streak motor {fejl_ny[-1]:6.2f} px")
+
+    megapixel = shape[0] * shape[1] / 1e6
+    print(f"LeapFrog streak detektion, {n_frames} frames á {megapixel:.1f} MP:")
+    print(f"  enkelt-skala Hough: {t_gammel / n_frames * 1000:8.1f} ms/frame, "
+          f"median endepunktsfejl {np.median(fejl_gammel):.2f} px")
+    print(f"  streak motor      : {t_ny / n_frames * 1000:8.1f} ms/frame, "
+          f"median endepunktsfejl {np.median(fejl_ny):.2f} px")
+    return fejl_gammel, fejl_ny
+
+
+def _syntetisk_tracking_frame(rng, shape):
+    """uint16 frame med baggrund, stjerner, hot pixels og en udstrakt satellit"""
+    height, width = shape
+    data = rng.normal(1000, 30, size=shape)
+    for _ in range(40):  # stjerner
+        y, x = rng.integers(50, height - 50), rng.integers(50, width - 50)
+        data[y - 3:y + 4, x - 3:x + 4] += rng.uniform(2000, 20000)
+    for _ in range(20):  # hot pixels
+        data[rng.integers(0, height), rng.integers(0, width)] = 65535
+    y, x = rng.integers(100, height - 100), rng.integers(100, width - 100)
+    Y, X = np.ogrid[:height, :width]
+    data += 30000 * np.exp(-((X - x)**2 + (Y - y)**2) / (2 * 12.0**2))
+    return data.clip(0, 65535).astype(np.uint16)
+
+
+def benchmark_tracking_detection(n_frames=5, shape=(4096, 4096), radius_pixelsum=50):
+    """Regressionstest og benchmark: den nye motor skal give identisk (x_sat, y_sat, pixel_sum)"""
+    rng = np.random.default_rng(1)
+    t_gammel = t_ny = 0.0
+    for i in range(n_frames):
+        data = _syntetisk_tracking_frame(rng, shape)
+
+        t0 = time.perf_counter()
+        gammel = _reference_tracking_detection(data, radius_pixelsum)
+        t_gammel += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ny = tracking_detection(data, radius_pixelsum)
+        t_ny += time.perf_counter() - t0
+
+        ens = all((a == b) or (np.isnan(a) and np.isnan(b)) for a, b in zip(gammel, ny))
+        print(f"frame {i}: reference {gammel} - ny {ny} - {'identisk' if ens else 'AFVIGER'}")
+        if not ens:
+            raise AssertionError(f"Detektion afviger på frame {i}: {gammel} != {ny}")
+
+    megapixel = shape[0] * shape[1] / 1e6
+    print(f"Tracking detektion, {n_frames} frames á {megapixel:.1f} MP:")
+    print(f"  fuld-frame reference: {t_gammel / n_frames * 1000:8.1f} ms/frame")
+    print(f"  cutout motor        : {t_ny / n_frames * 1000:8.1f} ms/frame  ({t_gammel / t_ny:.1f}x hurtigere)")
+    return t_gammel, t_ny
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'streak':
+        benchmark_streak_detection(int(sys.argv[2]) if len(sys.argv) > 2 else 10)
+    else:
+        benchmark_tracking_detection(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
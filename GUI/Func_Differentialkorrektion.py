@@ -0,0 +1,263 @@
+"""
+Func_Differentialkorrektion.py - Forfining af en IOD TLE mod hele buen
+Tilpasser SGP4 middelelementerne (i, Ω, e, ω, M, n og valgfrit B*) til alle observerede RA/DEC
+med iterativ vægtet mindste kvadraters metode (Gauss-Newton med skridthalvering). Jacobianen
+findes med centrale differenser, én SGP4 kørsel pr. kolonne, fordelt på en process pool.
+Propagatoren er sgp4_array over alle epoker på én gang; TEME -> GCRS rotationen afhænger ikke af
+elementerne og beregnes derfor kun én gang. Observationer med store residualer afvises undervejs.
+"""
+
+import os
+import sys
+import time
+import concurrent.futures
+
+import numpy as np
+
+try:
+    from sgp4.api import Satrec, WGS72
+    SGP4_AVAILABLE = True
+except ImportError:
+    SGP4_AVAILABLE = False
+
+ELEMENT_NAVNE = ['inc_deg', 'raan_deg', 'ecc', 'argp_deg', 'M_deg', 'n_revday', 'bstar']
+# Differens skridt pr. element (samme enheder som ELEMENT_NAVNE)
+FD_SKRIDT = np.array([1e-5, 1e-5, 1e-7, 1e-5, 1e-5, 1e-8, 1e-6])
+XPDOTP = 1440.0 / (2 * np.pi)  # rev/dag pr. rad/min
+JD_1949 = 2433281.5            # sgp4init epoke er dage siden 1949-12-31 00:00
+ARCSEC = np.degrees(1) * 3600
+
+
+class ObservationsModel:
+    """Observationerne og den faste del af SGP4 modellen (epoke, satnr, ndot, nddot) for én TLE"""
+
+    def __init__(self, tle_line1, tle_line2, DATE_OBS, Sat_RA, Sat_DEC, X_obs, Y_obs, Z_obs):
+        from Func_Ephemeris import utc_time_array
+        from Func_Propagering import epoke_data
+
+        self.start = Satrec.twoline2rv(tle_line1, tle_line2)
+        self.tle_line1 = tle_line1
+        self.tle_line2 = tle_line2
+
+        # Epokerne og TEME -> GCRS rotationen (3, 3, N) er faste under hele tilpasningen
+        self.jd, self.fr, self.R = epoke_data(utc_time_array(DATE_OBS))
+        self.obs_pos = np.vstack([X_obs, Y_obs, Z_obs]).astype(float)
+        self.ra = np.radians(np.asarray(Sat_RA, dtype=float))
+        self.dec = np.radians(np.asarray(Sat_DEC, dtype=float))
+
+    def __len__(self):
+        return len(self.jd)
+
+    def elementer(self):
+        """Start TLE'ens elementer som vektor (ELEMENT_NAVNE)"""
+        s = self.start
+        return np.array([np.degrees(s.inclo), np.degrees(s.nodeo), s.ecco, np.degrees(s.argpo),
+                         np.degrees(s.mo), s.no_kozai * XPDOTP, s.bstar])
+
+    def satrec(self, x):
+        s = self.start
+        sat = Satrec()
+        sat.sgp4init(WGS72, 'i', s.satnum, s.jdsatepoch + s.jdsatepochF - JD_1949, x[6], s.ndot, s.nddot,
+                     float(np.clip(x[2], 1e-7, 0.99)), np.radians(x[3]), np.radians(x[0]),
+                     np.radians(x[4]), x[5] / XPDOTP, np.radians(x[1]))
+        return sat
+
+    def residualer(self, x):
+        """Residualer (model - observation) i buesekunder, form (2, N): RA*cos(DEC) og DEC.
+        NaN for epoker hvor SGP4 fejler"""
+        fejl, r, _ = self.satrec(x).sgp4_array(self.jd, self.fr)
+        r_gcrs = np.einsum('ijn,nj->in', self.R, r)
+        rel = r_gcrs - self.obs_pos
+        rel /= np.linalg.norm(rel, axis=0)
+        ra = np.arctan2(rel[1], rel[0])
+        dec = np.arcsin(np.clip(rel[2], -1, 1))
+        d_ra = (ra - self.ra + np.pi) % (2 * np.pi) - np.pi
+        res = np.vstack([d_ra * np.cos(self.dec), dec - self.dec]) * ARCSEC
+        res[:, fejl != 0] = np.nan
+        return res
+
+    def tle_linjer(self, x, fit_bstar):
+        """TLE linjer med de forfinede elementer; epoke, satnr, designator og ndot er uændrede"""
+        from Func_CalculateTLE import calculate_tle_checksum, _compact_tle_notation
+
+        inc, raan, ecc, argp, M, n, bstar = x
+        line1 = self.tle_line1.rstrip()[:68]
+        if fit_bstar:
+            line1 = f"{line1[:53]}{_compact_tle_notation(None, bstar):>8s}{line1[61:68]}"
+        line1 += str(calculate_tle_checksum(None, line1))
+
+        line2 = (f"{self.tle_line2[:8]}{inc:8.4f} {raan % 360:8.4f} {int(round(np.clip(ecc, 0, 0.9999999) * 1e7)):07d} "
+                 f"{argp % 360:8.4f} {M % 360:8.4f} {n:11.8f}{self.tle_line2[63:68]}")
+        line2 += str(calculate_tle_checksum(None, line2))
+        return line1, line2
+
+
+_model = None
+
+
+def _init_dk_worker(model):
+    global _model
+    _model = model
+
+
+def _dk_residualer(x):
+    return _model.residualer(x)
+
+
+def jacobian(model, x, aktive, executor=None):
+    """Numerisk Jacobian af residualerne (2N x antal aktive elementer) med centrale differenser.
+    De 2 x antal kolonner SGP4 kørsler fordeles på executor (None = serielt)"""
+    vektorer = []
+    for k in aktive:
+        for fortegn in (1, -1):
+            xk = x.copy()
+            xk[k] += fortegn * FD_SKRIDT[k]
+            vektorer.append(xk)
+    if executor is not None:
+        resultater = list(executor.map(_dk_residualer, vektorer))
+    else:
+        resultater = [model.residualer(v) for v in vektorer]
+    kolonner = [(resultater[2 * i] - resultater[2 * i + 1]).ravel() / (2 * FD_SKRIDT[k])
+                for i, k in enumerate(aktive)]
+    return np.column_stack(kolonner)
+
+
+def _rms(res, brugt):
+    vaerdier = res[:, brugt]
+    return float(np.sqrt(np.mean(vaerdier**2))) if vaerdier.size else np.inf
+
+
+def differentialkorrektion(tle_line1, tle_line2, DATE_OBS, Sat_RA, Sat_DEC, X_obs, Y_obs, Z_obs,
+                           NoradID=None, sigma_arcsec=None, fit_bstar=False, max_iter=15, afvis_sigma=3.0,
+                           workers=None, log=print):
+    """Forfin TLE'en mod alle observationer. sigma_arcsec: målestøj pr. observation (vægte 1/sigma^2,
+    standard ens vægte). Observationer over afvis_sigma x RMS afvises fra 3. iteration (tidligere er
+    IOD løsningen for grov til at skelne afvigere). Returnerer dict med tle_lines, elementer, sigma,
+    kovarians, rms, afviste indices og tidsforbrug pr. iteration (NoradID ignoreres - satnr fra TLE'en)"""
+    if not SGP4_AVAILABLE:
+        raise ImportError("sgp4 er ikke installeret (pip install sgp4)")
+
+    t_start = time.perf_counter()
+    model = ObservationsModel(tle_line1, tle_line2, DATE_OBS, Sat_RA, Sat_DEC, X_obs, Y_obs, Z_obs)
+    n_obs = len(model)
+    aktive = list(range(7 if fit_bstar else 6))
+    navne = [ELEMENT_NAVNE[k] for k in aktive]
+    sigma = np.ones(n_obs) if sigma_arcsec is None else np.asarray(sigma_arcsec, dtype=float)
+    vaegt = np.sqrt(np.tile(1.0 / sigma**2, 2))  # (2N,) kvadratrod af vægte, RA rækker først
+
+    x = model.elementer()
+    res = model.residualer(x)
+    brugt = np.all(np.isfinite(res), axis=0)
+    rms_start = rms = _rms(res, brugt)
+    log(f"Differentialkorrektion: {n_obs} observationer, {len(aktive)} elementer ({', '.join(navne)}), "
+        f"start RMS {rms_start:.1f}\"")
+
+    workers = workers if workers is not None else min(2 * len(aktive), max(1, (os.cpu_count() or 2) - 1))
+    executor = None
+    if workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_dk_worker,
+                                                          initargs=(model,))
+    iterationer = []
+    konvergeret = False
+    try:
+        for iteration in range(1, max_iter + 1):
+            t0 = time.perf_counter()
+            J = jacobian(model, x, aktive, executor)
+            t_jacobian = time.perf_counter() - t0
+
+            rækker = np.tile(brugt, 2) & np.all(np.isfinite(J), axis=1) & np.isfinite(res.ravel())
+            A = J[rækker] * vaegt[rækker, None]
+            b = -res.ravel()[rækker] * vaegt[rækker]
+            dx = np.linalg.lstsq(A, b, rcond=None)[0]
+
+            # Skridthalvering hvis det fulde Gauss-Newton skridt gør RMS værre
+            skridt = 1.0
+            for _ in range(6):
+                x_ny = x.copy()
+                x_ny[aktive] += skridt * dx
+                res_ny = model.residualer(x_ny)
+                rms_ny = _rms(res_ny, brugt)
+                if rms_ny <= rms:
+                    break
+                skridt /= 2
+            else:
+                x_ny, res_ny, rms_ny = x, res, rms
+
+            forrige_brugt = brugt
+            if iteration >= 3:
+                afstand = np.hypot(res_ny[0], res_ny[1])
+                ny_brugt = np.isfinite(afstand) & (afstand <= afvis_sigma * np.sqrt(2) * rms_ny)
+                if ny_brugt.sum() >= len(aktive):
+                    brugt = ny_brugt
+                    rms_ny = _rms(res_ny, brugt)
+
+            ændring = abs(rms - rms_ny) / max(rms, 1e-12)
+            x, res, rms = x_ny, res_ny, rms_ny
+            iterationer.append({'iteration': iteration, 'rms_arcsec': rms, 'brugt': int(brugt.sum()),
+                                'afvist': int(n_obs - brugt.sum()), 'skridt': skridt,
+                                'jacobian_s': t_jacobian, 'iteration_s': time.perf_counter() - t0})
+            log(f"  Iteration {iteration}: RMS {rms:.2f}\", {int(brugt.sum())}/{n_obs} brugt, skridt {skridt:g}, "
+                f"Jacobian {t_jacobian * 1000:.0f} ms, i alt {iterationer[-1]['iteration_s'] * 1000:.0f} ms")
+            if ændring < 1e-4 and np.array_equal(brugt, forrige_brugt):
+                konvergeret = True
+                break
+
+        # Kovarians fra Jacobianen i løsningen, skaleret med residualvariansen (a posteriori)
+        J = jacobian(model, x, aktive, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    rækker = np.tile(brugt, 2) & np.all(np.isfinite(J), axis=1) & np.isfinite(res.ravel())
+    A = J[rækker] * vaegt[rækker, None]
+    r_vaegtet = res.ravel()[rækker] * vaegt[rækker]
+    frihedsgrader = max(1, A.shape[0] - len(aktive))
+    kovarians = np.linalg.pinv(A.T @ A) * float(r_vaegtet @ r_vaegtet) / frihedsgrader
+    usikkerhed = np.sqrt(np.clip(np.diag(kovarians), 0, None))
+
+    tle_lines = model.tle_linjer(x, fit_bstar)
+    total_s = time.perf_counter() - t_start
+    log(f"Differentialkorrektion {'konvergerede' if konvergeret else 'stoppede'} efter {len(iterationer)} "
+        f"iterationer: RMS {rms_start:.1f}\" -> {rms:.2f}\", {n_obs - int(brugt.sum())} afvist ({total_s:.1f} s)")
+    return {
+        'tle_lines': tle_lines,
+        'elementer': dict(zip(navne, x[aktive].tolist())),
+        'sigma': dict(zip(navne, usikkerhed.tolist())),
+        'kovarians': kovarians,
+        'parametre': navne,
+        'rms_start_arcsec': rms_start,
+        'rms_arcsec': rms,
+        'afviste': np.flatnonzero(~brugt).tolist(),
+        'iterationer': iterationer,
+        'konvergeret': konvergeret,
+        'total_s': total_s,
+        'satrec': model.satrec(x),
+    }
+
+
+def klassiske_elementer(satrec):
+    """(a [km], e, i, Ω, ω, ν [grader]) fra en initialiseret Satrec - som orbdtools' coe"""
+    e = satrec.ecco
+    E = satrec.mo
+    for _ in range(20):  # Keplers ligning
+        E = E - (E - e * np.sin(E) - satrec.mo) / (1 - e * np.cos(E))
+    nu = 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2), np.sqrt(1 - e) * np.cos(E / 2))
+    return np.array([satrec.a * satrec.radiusearthkm, e, np.degrees(satrec.inclo), np.degrees(satrec.nodeo),
+                     np.degrees(satrec.argpo), np.degrees(nu) % 360])
+
+
+if __name__ == "__main__":
+    # Forfin TLE'en gemt i en sessionsmappes resultatfil: python Func_Differentialkorrektion.py <mappe> [--bstar]
+    from Func_ResultatFormat import find_result_file, read_result
+    from Func_CalculateTLE import observationsdata
+
+    directory = sys.argv[1]
+    df = read_result(os.path.join(directory, find_result_file(directory)))
+    df = df[df['Sat_RA_Behandlet'].notna()].reset_index(drop=True)
+    kolonner = ('Calculated_TLE_Line1', 'Calculated_TLE_Line2') if 'Calculated_TLE_Line1' in df.columns \
+        else ('TLE1', 'TLE2')
+    resultat = differentialkorrektion(str(df[kolonner[0]].iloc[0]), str(df[kolonner[1]].iloc[0]),
+                                      **observationsdata(df), fit_bstar='--bstar' in sys.argv)
+    print('\n'.join(resultat['tle_lines']))
+    for navn in resultat['parametre']:
+        print(f"  {navn:9s} {resultat['elementer'][navn]:14.8f} ± {resultat['sigma'][navn]:.2e}")
@@ -0,0 +1,148 @@
+"""
+Func_Ephemeris.py - Fælles Skyfield service for hele processen
+Indlæser timescale og efemerider (de421.bsp) én gang og genbruger EarthSatellite objekter
+for samme TLE tekst (LRU cache). Kan køre offline fra en lokal datamappe:
+    DENASSI_SKYFIELD_DATA=<mappe>   datamappe til de421.bsp m.m. (standard: nuværende mappe)
+    DENASSI_SKYFIELD_OFFLINE=1      download aldrig - fejl hvis filen mangler i datamappen
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+DEFAULT_EPHEMERIS = 'de421.bsp'
+DEFAULT_SATELLIT_CACHE = 256
+
+_lock = threading.RLock()
+_config = {
+    'data_dir': os.environ.get('DENASSI_SKYFIELD_DATA', '.'),
+    'offline': os.environ.get('DENASSI_SKYFIELD_OFFLINE', '').lower() in ('1', 'true', 'ja', 'yes'),
+    'satellit_cache': DEFAULT_SATELLIT_CACHE,
+}
+_loader = None
+_timescale = None
+_ephemerides = {}
+_satellitter = OrderedDict()
+_stats = {'overhead_s': 0.0, 'satellit_hits': 0, 'satellit_misses': 0, 'indlaesninger': 0}
+
+
+def configure(data_dir=None, offline=None, satellit_cache=None):
+    """Skift datamappe / offline mode / LRU størrelse. Nulstiller indlæste objekter"""
+    global _loader, _timescale
+    with _lock:
+        if data_dir is not None:
+            _config['data_dir'] = data_dir
+        if offline is not None:
+            _config['offline'] = bool(offline)
+        if satellit_cache is not None:
+            _config['satellit_cache'] = max(1, int(satellit_cache))
+        _loader = None
+        _timescale = None
+        _ephemerides.clear()
+        _satellitter.clear()
+
+
+def _get_loader():
+    global _loader
+    if _loader is None:
+        from skyfield.api import Loader
+        _loader = Loader(_config['data_dir'], verbose=False)
+    return _loader
+
+
+def get_timescale():
+    """Processens fælles Skyfield timescale (indbyggede delta-T/leap second tabeller - intet download)"""
+    global _timescale
+    with _lock:
+        if _timescale is None:
+            t0 = time.perf_counter()
+            _timescale = _get_loader().timescale(builtin=True)
+            _stats['indlaesninger'] += 1
+            _stats['overhead_s'] += time.perf_counter() - t0
+        return _timescale
+
+
+def get_ephemeris(filename=DEFAULT_EPHEMERIS):
+    """Efemeride (fx de421.bsp) åbnet én gang pr. proces.
+    I offline mode skal filen findes i datamappen i forvejen."""
+    with _lock:
+        if filename not in _ephemerides:
+            t0 = time.perf_counter()
+            loader = _get_loader()
+            if _config['offline'] and not os.path.exists(loader.path_to(filename)):
+                raise FileNotFoundError(
+                    f"{filename} findes ikke i {os.path.abspath(_config['data_dir'])} (offline mode)")
+            _ephemerides[filename] = loader(filename)
+            _stats['indlaesninger'] += 1
+            _stats['overhead_s'] += time.perf_counter() - t0
+        return _ephemerides[filename]
+
+
+def get_satellite(tle_line1, tle_line2, name=None):
+    """EarthSatellite for TLE linjerne - genbruges fra LRU cachen når samme TLE tekst ses igen"""
+    key = (tle_line1.strip(), tle_line2.strip(), name)
+    with _lock:
+        satellite = _satellitter.get(key)
+        if satellite is not None:
+            _satellitter.move_to_end(key)
+            _stats['satellit_hits'] += 1
+            return satellite
+
+        t0 = time.perf_counter()
+        from skyfield.api import EarthSatellite
+        satellite = EarthSatellite(key[0], key[1], name, get_timescale())
+        _satellitter[key] = satellite
+        while len(_satellitter) > _config['satellit_cache']:
+            _satellitter.popitem(last=False)
+        _stats['satellit_misses'] += 1
+        _stats['overhead_s'] += time.perf_counter() - t0
+        return satellite
+
+
+def overhead_seconds():
+    """Samlet tid brugt på at indlæse timescale/efemerider og oprette satellitter i denne proces"""
+    return _stats['overhead_s']
+
+
+def summary():
+    return (f"Skyfield service: {_stats['indlaesninger']} indlæsninger, "
+            f"satellit cache {_stats['satellit_hits']} hits / {_stats['satellit_misses']} misses")
+
+
+def utc_time_array(datoer, hele_sekunder=False):
+    """Én vektoriseret Skyfield Time for en række datostrenge/datetimes (UTC).
+    hele_sekunder=True afkorter til hele sekunder som de gamle (år, ..., sekund) tuples."""
+    import numpy as np
+    import pandas as pd
+
+    tider = pd.DatetimeIndex(pd.to_datetime(pd.Series(datoer), format='ISO8601'))
+    if tider.tz is not None:
+        tider = tider.tz_convert('UTC').tz_localize(None)
+    sekunder = tider.second.to_numpy(dtype=np.float64)
+    if not hele_sekunder:
+        sekunder = sekunder + tider.microsecond.to_numpy() / 1e6 + tider.nanosecond.to_numpy() / 1e9
+    return get_timescale().utc(tider.year.to_numpy(), tider.month.to_numpy(), tider.day.to_numpy(),
+                               tider.hour.to_numpy(), tider.minute.to_numpy(), sekunder)
+
+
+def observer_positions_km(t, lat, lon, ele):
+    """Observatørens GCRS position (km, form (3, N)) for hvert tidspunkt i t.
+    lat/lon/ele kan være skalarer eller arrays; ét propagationskald pr. unik lokation."""
+    import numpy as np
+    from skyfield.api import wgs84
+
+    n = len(t)
+    lokationer = np.column_stack([np.broadcast_to(np.asarray(v, dtype=np.float64), (n,)) for v in (lat, lon, ele)])
+    unikke, grupper = np.unique(lokationer, axis=0, return_inverse=True)
+    grupper = np.ravel(grupper)
+
+    if len(unikke) == 1:
+        lat0, lon0, ele0 = unikke[0]
+        return wgs84.latlon(lat0, lon0, ele0).at(t).position.km
+
+    positioner = np.empty((3, n))
+    for k, (lat_k, lon_k, ele_k) in enumerate(unikke):
+        idx = np.flatnonzero(grupper == k)
+        positioner[:, idx] = wgs84.latlon(lat_k, lon_k, ele_k).at(t[idx]).position.km
+    return positioner
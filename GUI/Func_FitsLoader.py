@@ -0,0 +1,122 @@
+"""
+Func_FitsLoader.py - Fælles FITS frame loader
+Memory-mapper billeddata og giver detektorerne read-only arrays i native dtype
+(typisk uint16) eller nedskalerede tiles i stedet for fulde float32 kopier pr. frame
+"""
+
+import os
+import sys
+import numpy as np
+from astropy.io import fits
+
+
+def read_frame(filepath):
+    """Læs primær HDU og returner (data, header). data er read-only og native byte order.
+    astropy kan ikke memory-mappe skalerede frames (BZERO/BSCALE/BLANK), så filen åbnes
+    uskaleret: ikke-skalerede frames er et direkte view på den memory-mappede fil, og
+    uint16 frames gemt som int16 med BZERO=32768 konverteres ved at vende fortegnsbittet
+    (én uint16 kopi - halvdelen af en float32). Anden skalering giver float32."""
+    with fits.open(filepath, memmap=True, do_not_scale_image_data=True) as hdul:
+        header = hdul[0].header
+        if hdul[0].data is None:
+            raise ValueError(f"Ingen billeddata i primær HDU: {os.path.basename(filepath)}")
+        data = _skaler(hdul[0].data, header)
+
+        # cv2 og scipy kræver native byte order (FITS er big-endian på disk)
+        if not data.dtype.isnative:
+            data = data.astype(data.dtype.newbyteorder('='))
+
+    data.flags.writeable = False
+    return data, header
+
+
+def _skaler(raw, header):
+    """Anvend BSCALE/BZERO/BLANK på de rå (uskalerede) data"""
+    bscale = header.get('BSCALE', 1)
+    bzero = header.get('BZERO', 0)
+    if bscale == 1 and bzero == 0:
+        return raw
+
+    # Unsigned heltal (FITS konventionen): BZERO = 2^(bits-1) svarer til at vende fortegnsbittet
+    if raw.dtype.kind == 'i' and bscale == 1 and bzero == 2 ** (8 * raw.dtype.itemsize - 1):
+        unsigned = raw.view(raw.dtype.str.replace('i', 'u'))
+        return unsigned ^ np.array(bzero, dtype=unsigned.dtype)
+
+    data = raw.astype(np.float32) * np.float32(bscale) + np.float32(bzero)
+    if 'BLANK' in header and raw.dtype.kind in 'iu':
+        data[raw == header['BLANK']] = np.nan
+    return data
+
+
+def binned_view(data, faktor, dtype=np.float32):
+    """Nedskaler ved at midle faktor x faktor blokke uden at lave en fuld-opløsnings float kopi"""
+    if faktor <= 1:
+        return data
+    height, width = data.shape
+    h2, w2 = (height // faktor) * faktor, (width // faktor) * faktor
+    blokke = data[:h2, :w2].reshape(h2 // faktor, faktor, w2 // faktor, faktor)
+    return blokke.mean(axis=(1, 3), dtype=dtype)
+
+
+def peak_rss_mb():
+    """Peak resident set size for denne proces i MB (None hvis det ikke kan måles)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss er i bytes på macOS og i kB på Linux
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _maal_session(mode, directory):
+    """Læs alle frames i mappen med den gamle (float32 kopi) eller nye (memmap) sti"""
+    fits_files = sorted(f for f in os.listdir(directory) if f.lower().endswith('.fits'))
+    for filename in fits_files:
+        filepath = os.path.join(directory, filename)
+        if mode == 'float32':
+            with fits.open(filepath) as hdul:
+                image_data = hdul[0].data.astype(np.float32)
+            np.median(image_data)
+        else:
+            image_data, _ = read_frame(filepath)
+            np.median(binned_view(image_data, 4))
+    print(f"{peak_rss_mb():.1f}")
+
+
+def benchmark_peak_rss(n_frames=5, shape=(4096, 4096)):
+    """Skriv en syntetisk 16 MP uint16 session og mål peak RSS for begge læsestier
+    i hver sin proces (ru_maxrss er et maksimum over hele processens levetid)"""
+    import subprocess
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        rng = np.random.default_rng(0)
+        for i in range(n_frames):
+            data = rng.normal(1000, 30, size=shape).clip(0, 65535).astype(np.uint16)
+            fits.PrimaryHDU(data=data).writeto(os.path.join(directory, f"frame_{i:03d}.fits"))
+
+        resultater = {}
+        for mode in ('float32', 'memmap'):
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--maal', mode, directory],
+                                  capture_output=True, text=True, check=True)
+            resultater[mode] = float(proc.stdout.strip().splitlines()[-1])
+
+    megapixel = shape[0] * shape[1] / 1e6
+    print(f"Peak RSS for {n_frames} frames á {megapixel:.1f} MP:")
+    for mode, rss in resultater.items():
+        print(f"  {mode:8s}: {rss:8.1f} MB")
+    return resultater
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--maal':
+        _maal_session(sys.argv[2], sys.argv[3])
+    else:
+        benchmark_peak_rss()
@@ -0,0 +1,180 @@
+"""
+Func_Forscreening.py - Hurtig forhåndsscreening af frames før plate solving og detektion
+Målene beregnes på et 4x4 binnet view og et udtyndet view (hver 4. pixel) af framen:
+stjerneestimat, baggrundsniveau og støj, andel mættede pixels, lyseste kilde i sigma og om der
+er en streak (samme grove Hough trin som LeapFrog detektionen, så en frame uden streak her heller
+ikke giver en detektion). Frames der ikke kan give en position - skyer, tomme eller overeksponerede
+frames, LeapFrog uden streak - springes over før ASTAP og den fulde detektor, eller markeres blot.
+"""
+
+import os
+import sys
+import time
+import concurrent.futures
+
+import numpy as np
+import cv2
+
+from Func_FitsLoader import read_frame, binned_view
+from Func_Detektion import _robust_baggrund, coarse_streaks, streak_parametre
+
+SCREEN_BINNING = 4
+MAETNING_STRIDE = 4
+STJERNE_SIGMA = 5.0
+STJERNE_AREAL = (2, 25)  # binnede pixels - enkeltpixels er hot pixels/kosmisk stråling
+
+# Standard grænser (GUI og batch kan ændre min_stjerner, max_maettet og handling)
+FORSCREENING_GRAENSER = {
+    'min_stjerner': 10,          # LeapFrog: færre stjerner -> skyer eller tom frame, ASTAP fejler alligevel
+    'max_maettet': 0.01,         # andel mættede pixels (overeksponering, dagslys)
+    'max_baggrund': None,        # ADU (None = ingen grænse)
+    'kraev_streak': True,        # LeapFrog: uden streak finder detektoren ingenting
+    'min_kilde_sigma': 10.0,     # Tracking: lyseste kilde i sigma over baggrunden
+    'handling': 'spring_over',   # 'spring_over' eller 'marker' (analyseres stadig, mål skrives i CSV'en)
+}
+
+
+def _maetningsniveau(data, header):
+    if header is not None and header.get('SATURATE'):
+        return float(header['SATURATE'])
+    if data.dtype.kind in 'ui':
+        return float(np.iinfo(data.dtype).max)
+    return 65535.0
+
+
+def screen_frame(data, header=None, tjek_streak=True):
+    """Forhåndsscreeningens mål for én frame som dict (screen_* kolonner)"""
+    t0 = time.perf_counter()
+    lille = binned_view(data, SCREEN_BINNING)
+    median, sigma = _robust_baggrund(lille)
+    sigma = max(sigma, 1e-3)
+
+    # Stjerneestimat: kompakte komponenter over STJERNE_SIGMA i det binnede billede
+    binaer = (lille > median + STJERNE_SIGMA * sigma).astype(np.uint8)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binaer, connectivity=8)
+    arealer = stats[1:, cv2.CC_STAT_AREA]
+    stjerner = int(((arealer >= STJERNE_AREAL[0]) & (arealer <= STJERNE_AREAL[1])).sum())
+
+    niveau = _maetningsniveau(data, header)
+    maettet = float(np.mean(data[::MAETNING_STRIDE, ::MAETNING_STRIDE] >= 0.98 * niveau))
+
+    streak = None
+    if tjek_streak:
+        # Samme binning og minimumslængde som find_streak, regnet videre fra det binnede view
+        binning, min_laengde, _ = streak_parametre(data.shape)
+        segmenter, _ = coarse_streaks(lille, binning=max(1, binning // SCREEN_BINNING),
+                                      min_laengde=min_laengde / SCREEN_BINNING)
+        streak = bool(segmenter)
+
+    return {
+        'screen_stjerner': stjerner,
+        'screen_baggrund': median,
+        'screen_sigma': sigma,
+        'screen_maettet': maettet,
+        'screen_kilde_sigma': float((lille.max() - median) / sigma),
+        'screen_streak': streak,
+        'screen_ms': (time.perf_counter() - t0) * 1000,
+    }
+
+
+def vurder(maal, obstype, graenser):
+    """Grund til at frasortere framen ('' hvis den er brugbar) - første ord er kategorien"""
+    if graenser.get('max_maettet') is not None and maal['screen_maettet'] > graenser['max_maettet']:
+        return f"mættet ({maal['screen_maettet']:.1%})"
+    if graenser.get('max_baggrund') is not None and maal['screen_baggrund'] > graenser['max_baggrund']:
+        return f"baggrund ({maal['screen_baggrund']:.0f} ADU)"
+    if obstype == 'LeapFrog':
+        if maal['screen_stjerner'] < graenser.get('min_stjerner', 0):
+            return f"stjerner ({maal['screen_stjerner']})"
+        if graenser.get('kraev_streak') and maal['screen_streak'] is False:
+            return "streak mangler"
+    elif maal['screen_kilde_sigma'] < graenser.get('min_kilde_sigma', 0):
+        return f"kilde mangler ({maal['screen_kilde_sigma']:.1f} sigma)"
+    return ''
+
+
+def _screen_fil(directory, filename, obstype, graenser):
+    data, header = read_frame(os.path.join(directory, filename))
+    maal = screen_frame(data, header, tjek_streak=obstype == 'LeapFrog')
+    maal['screen_grund'] = vurder(maal, obstype, graenser)
+    return maal
+
+
+def screen_frames(directory, filenames, obstype, graenser, workers=4):
+    """Screen frames parallelt i tråde (numpy/cv2 frigiver GIL'en).
+    Returnerer {filename: mål inkl. screen_grund}; frames der ikke kan læses udelades"""
+    resultater = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(_screen_fil, directory, f, obstype, graenser): f for f in filenames}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                resultater[futures[future]] = future.result()
+            except Exception:
+                pass  # Den fulde pipeline logger læsefejlen
+    return resultater
+
+
+def frasorterede(screening, graenser):
+    """Filnavne der skal springes over"""
+    if graenser.get('handling') != 'spring_over':
+        return set()
+    return {filename for filename, maal in screening.items() if maal['screen_grund']}
+
+
+def flet_resultater(results, screening, sprunget_over, fits_files):
+    """Sæt screeningsmål på de analyserede rækker og indsæt rækker for de frasorterede frames
+    (kun filename + mål), sorteret i fil-rækkefølge"""
+    efter_fil = {r['filename']: r for r in results}
+    for filename, maal in screening.items():
+        række = efter_fil.get(filename)
+        if række is None:
+            if filename not in sprunget_over:
+                continue  # Analysen blev stoppet før framen
+            række = efter_fil[filename] = {'filename': filename}
+        række.update(maal)
+    rækkefølge = {f: i for i, f in enumerate(fits_files)}
+    return sorted(efter_fil.values(), key=lambda r: rækkefølge.get(r['filename'], len(rækkefølge)))
+
+
+def screening_summary(screening, graenser, sekunder):
+    """Logtekst: antal frasorterede fordelt på kategori og screeningens tidsforbrug"""
+    kategorier = {}
+    for maal in screening.values():
+        if maal['screen_grund']:
+            kategori = maal['screen_grund'].split(' ')[0]
+            kategorier[kategori] = kategorier.get(kategori, 0) + 1
+    antal = sum(kategorier.values())
+    handling = "sprunget over" if graenser.get('handling') == 'spring_over' else "markeret"
+    tekst = ", ".join(f"{kategori}: {n}" for kategori, n in sorted(kategorier.items()))
+    return (f"Forhåndsscreening: {antal} af {len(screening)} frames {handling}"
+            f"{' (' + tekst + ')' if tekst else ''} - screening tog {sekunder:.1f} s")
+
+
+def benchmark_forscreening(n_frames=5, shape=(4096, 4096)):
+    """Screeningstid pr. frame mod den fulde LeapFrog detektor, på brugbare og ubrugelige frames"""
+    from Func_Benchmark import syntetisk_leapfrog_frame, _baggrund
+    from Func_Detektion import find_streak
+
+    rng = np.random.default_rng(0)
+    frames = {
+        'streak': [syntetisk_leapfrog_frame(rng, shape)[0] for _ in range(n_frames)],
+        'ingen streak': [_baggrund(rng, shape).clip(0, 65535).astype(np.uint16) for _ in range(n_frames)],
+        'skyer': [_baggrund(rng, shape, n_stjerner=0).clip(0, 65535).astype(np.uint16) for _ in range(n_frames)],
+        'mættet': [np.full(shape, 65535, dtype=np.uint16) for _ in range(n_frames)],
+    }
+
+    print(f"Forhåndsscreening, {shape[1]}x{shape[0]} LeapFrog frames:")
+    for navn, liste in frames.items():
+        t0 = time.perf_counter()
+        grunde = [vurder(screen_frame(data), 'LeapFrog', FORSCREENING_GRAENSER) for data in liste]
+        t_screen = (time.perf_counter() - t0) / len(liste)
+        t0 = time.perf_counter()
+        for data in liste:
+            find_streak(data)
+        t_detektor = (time.perf_counter() - t0) / len(liste)
+        print(f"  {navn:13s}: screening {t_screen*1000:6.1f} ms, detektor {t_detektor*1000:6.1f} ms, "
+              f"frasorteret {sum(bool(g) for g in grunde)}/{len(grunde)} ({grunde[0] or 'brugbar'})")
+
+
+if __name__ == "__main__":
+    benchmark_forscreening(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -11,6 +11,8 @@ import pandas as pd
 import numpy as np
 import os
 
+from Func_SessionIndex import append_frame
+
 # Check for optional dependencies
 try:
     import plotly.graph_objects as go
@@ -280,7 +282,8 @@ def get_full_tle_from_selection(self, item):
 
 def calculate_leapfrog_data(self):
     """Beregner LeapFrog data baseret på valgt satellit"""
-    from Func_fagprojekt import calculate_satellite_data, ra_dec_to_eci
+    from Func_fagprojekt import calculate_satellite_data
+    from Func_Propagering import radec_til_xyz
     from datetime import datetime, timedelta
     import pandas as pd
     import numpy as np
@@ -358,7 +361,7 @@ def calculate_leapfrog_data(self):
         y_list = sat_positions[:,1] - obs_points[:,1]
         z_list = sat_positions[:,2] - obs_points[:,2]
         
-        ra_tle, dec_tle = np.vectorize(xyz_to_radec)(x_list, y_list, z_list)
+        ra_tle, dec_tle = xyz_to_radec(x_list, y_list, z_list)
         self.df_leapfrog['Sat_RA'] = ra_tle
         self.df_leapfrog['Sat_DEC'] = dec_tle
         
@@ -374,8 +377,8 @@ def calculate_leapfrog_data(self):
         self.df_leapfrog['DATE-OBS'] = [(datetime.strptime(dt, "%Y-%m-%d %H:%M:%S.%f") + timedelta(hours=utc_offset)).strftime("%Y-%m-%d %H:%M:%S.%f") for dt in self.df_leapfrog['DATE-OBS']]
         
         # Beregn XYZ for plotting
-        xyz = [ra_dec_to_eci(ra, dec, r) + obs for ra, dec, r, obs in zip(self.df_leapfrog['Sat_RA'], self.df_leapfrog['Sat_DEC'], afstand, obs_points)]
-        self.df_leapfrog['xyz'] = xyz
+        xyz = radec_til_xyz(self.df_leapfrog['Sat_RA'], self.df_leapfrog['Sat_DEC'], afstand) + obs_points
+        self.df_leapfrog['xyz'] = list(xyz)
         
         # Gem data til plotting
         self.sat_positions = sat_positions
@@ -390,15 +393,9 @@ def calculate_leapfrog_data(self):
         messagebox.showerror("Fejl", f"Kunne ikke beregne LeapFrog data: {str(e)}")
 
 def xyz_to_radec(x, y, z):
-    """Konverter XYZ til RA/DEC"""
-    import numpy as np
-    r = np.array([x, y, z], dtype=float)
-    norm = np.linalg.norm(r)
-    if norm == 0:
-        raise ValueError("Vector has zero length")
-    ra_rad = np.arctan2(r[1], r[0]) % (2*np.pi)
-    dec_rad = np.arcsin(r[2]/norm)
-    return np.degrees(ra_rad), np.degrees(dec_rad)
+    """Konverter XYZ til RA/DEC (skalarer eller arrays, NaN for nul-vektorer)"""
+    from Func_Propagering import xyz_til_radec
+    return xyz_til_radec(x, y, z)
 
 def ra_deg_to_hms(ra_deg_array):
     """Konverter RA grader til HH:MM:SS format"""
@@ -410,19 +407,10 @@ def ra_deg_to_hms(ra_deg_array):
     return [f"{h:02d}:{m:02d}:{s:06.3f}" for h, m, s in zip(hours, minutes, seconds)]
 
 def tle_to_altaz(self, tle1, tle2, observer_lat, observer_lon, observer_ele, datetime_list, name="SAT"):
-    """Beregn Alt/Az fra TLE"""
-    from skyfield.api import Topos, load, EarthSatellite
-    ts = load.timescale()
-    satellite = EarthSatellite(tle1, tle2, name)
-    observer = Topos(latitude_degrees=observer_lat, longitude_degrees=observer_lon, elevation_m=observer_ele)
-    alt_list, az_list = [], []
-    for dt in datetime_list:
-        t = ts.utc(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second + dt.microsecond/1e6)
-        topocentric = (satellite - observer).at(t)
-        alt, az, _ = topocentric.altaz()
-        alt_list.append(alt.degrees)
-        az_list.append(az.degrees)
-    return alt_list, az_list
+    """Beregn Alt/Az fra TLE (alle tidspunkter i ét kald til propageringsmotoren)"""
+    from Func_Propagering import topocentrisk
+    ud = topocentrisk([(tle1, tle2)], datetime_list, observer_lat, observer_lon, observer_ele)
+    return ud['alt_deg'][0].tolist(), ud['az_deg'][0].tolist()
 
 def update_leapfrog_table(self):
     """Opdater LeapFrog data tabel"""
@@ -660,6 +648,7 @@ def _execute_leapfrog_observation(self):
     import time
     from tkinter import messagebox
     
+    live_watcher = None
     try:
         # Hent parametre (binning fra kameraindstillinger)
         x_binning = self.camera_binning_x.get()
@@ -705,6 +694,11 @@ def _execute_leapfrog_observation(self):
         log_message(self, f"Binning: {x_binning}x{y_binning}")
         log_message(self, f"Session mappe: {session_dir}")
         
+        # Live analyse af nye billeder mens observationen kører (hvis slået til)
+        live_watcher = self.start_live_analyse(session_dir)
+        if live_watcher is not None:
+            log_message(self, "Live billede analyse startet for sessionen")
+        
         # Tilslut teleskop og kamera
         log_message(self, "Tilslutter teleskop og kamera...")
         
@@ -886,6 +880,11 @@ def _execute_leapfrog_observation(self):
                     hdu = fits.PrimaryHDU(data=image_data_uint16, header=header)
                     hdu.writeto(filepath, overwrite=True)
                     
+                    try:
+                        append_frame(filepath, hdu.header)
+                    except Exception as e:
+                        log_message(self, f"Session index ikke opdateret: {str(e)}")
+                    
                     log_message(self, f"Billede gemt: {filename}")
                     
             except Exception as e:
@@ -903,4 +902,5 @@ def _execute_leapfrog_observation(self):
         except Exception as e:
             log_message(self, f"Fejl ved afbrydelse af teleskop: {str(e)}")
         
+        self.stop_live_analyse(live_watcher)
         log_message(self, "LeapFrog observation afsluttet")
@@ -0,0 +1,239 @@
+"""
+Func_LiveAnalyse.py - Live analyse af sessionsmapper
+Overvåger en sessionsmappe mens observationen kører og analyserer hver ny FITS fil
+så snart den er færdigskrevet: plate solving, detektion og en ny række i sessions-CSV'en
+"""
+
+import os
+import threading
+import pandas as pd
+from astropy.io import fits
+
+from Func_BilledeAnalyse import (analysis_log_message, get_astap_settings, get_tracking_roi_radius, is_starfield_reference,
+                                 process_leapfrog_frame, process_tracking_frame, analyze_starfield_reference)
+from Func_SessionIndex import frame_header
+from Func_ResultatFormat import write_result, size_summary
+from Func_PlateSolve import solve_with_retry, solver_tilgaengelig, PlateSolveCache
+
+
+def fits_file_complete(filepath):
+    """Tjek om en FITS fil er færdigskrevet: header kan læses og hele dataområdet findes på disk"""
+    try:
+        size = os.path.getsize(filepath)
+        if size == 0 or size % 2880 != 0:  # FITS filer skrives altid i hele 2880-byte blokke
+            return False
+        with fits.open(filepath, memmap=True) as hdul:
+            info = hdul.fileinfo(0)
+            return info['datLoc'] + info['datSpan'] <= size
+    except Exception:
+        return False
+
+
+class LiveAnalyseWatcher(threading.Thread):
+    """Baggrundstråd der analyserer nye frames i en sessionsmappe efterhånden som de skrives"""
+
+    # Antal Tracking frames der må vente på stjernehimmel referencen før vi fortsætter uden offset
+    MAX_VENTENDE_UDEN_REFERENCE = 3
+
+    def __init__(self, app, session_dir, astap_path, pixelscale, save_plots, poll_interval=2.0):
+        super().__init__(daemon=True)
+        self.app = app
+        self.session_dir = session_dir
+        self.astap_path = astap_path
+        self.pixelscale = pixelscale
+        self.save_plots = save_plots
+        self.poll_interval = poll_interval
+
+        self._stop_event = threading.Event()
+        self._behandlet = set()
+        self._stoerrelser = {}      # filnavn -> størrelse ved sidste poll (stabil størrelse = færdig)
+        self._ventende_tracking = []
+        self._ref_offset = None
+        self._frame_index = 0
+
+        self._rows = []
+        self._kolonner = []
+        self._ventende_rows = []
+        self.output_path = None
+        self.cache = None
+
+    def log(self, message):
+        analysis_log_message(self.app, f"[Live {os.path.basename(self.session_dir)}] {message}")
+
+    def stop(self):
+        """Afslut efter at de resterende færdigskrevne frames er analyseret"""
+        self._stop_event.set()
+
+    def run(self):
+        self.log("Live analyse startet - venter på billeder")
+        while True:
+            stopper = self._stop_event.is_set()
+            try:
+                self._poll(slutkoersel=stopper)
+            except Exception as e:
+                self.log(f"Fejl i live analyse: {str(e)}")
+            if stopper:
+                break
+            self._stop_event.wait(self.poll_interval)
+
+        # Tracking frames der stadig venter på reference behandles uden offset
+        for filename in self._ventende_tracking:
+            self._process_tracking(filename)
+        self._ventende_tracking = []
+        if self.output_path is None and self._ventende_rows:
+            self._ensure_output_path(self._ventende_rows[0])
+        self._flush_ventende_rows()
+
+        # Kolonneformatet skrives én gang når sessionen er færdig (CSV'en appendes løbende)
+        if self.output_path is not None and self._rows:
+            try:
+                if write_result(pd.DataFrame(self._rows, columns=self._kolonner), self.output_path) is not None:
+                    self.log(f"Kolonneformat gemt ({size_summary(self.output_path)})")
+            except Exception as e:
+                self.log(f"Kunne ikke skrive Parquet resultat: {str(e)}")
+
+        if self.cache is not None:
+            self.cache.save()
+            self.log(self.cache.summary())
+        self.log(f"Live analyse afsluttet - {len(self._rows)} frames analyseret")
+
+    def _poll(self, slutkoersel=False):
+        if not os.path.isdir(self.session_dir):
+            return
+        if self.cache is None:
+            self.cache = PlateSolveCache(self.session_dir)
+
+        fits_files = sorted(f for f in os.listdir(self.session_dir)
+                            if f.lower().endswith('.fits') and f not in self._behandlet)
+        for filename in fits_files:
+            filepath = os.path.join(self.session_dir, filename)
+            size = os.path.getsize(filepath)
+            stabil = self._stoerrelser.get(filename) == size
+            self._stoerrelser[filename] = size
+
+            # Ved slutkørsel venter vi ikke på en ekstra poll for at se stabil størrelse
+            if not (stabil or slutkoersel) or not fits_file_complete(filepath):
+                continue
+
+            self._behandlet.add(filename)
+            self._process_file(filename)
+
+    def _process_file(self, filename):
+        filepath = os.path.join(self.session_dir, filename)
+        header = frame_header(self.session_dir, filename)
+        obstype = header.get('OBSTYPE', 'Unknown')
+
+        if is_starfield_reference(filename, header):
+            self.log(f"Stjernehimmel reference: {filename}")
+            self._ref_offset = analyze_starfield_reference(self.app, self.session_dir, filename, self.astap_path)
+            self._add_row(process_tracking_frame(self.app, self.session_dir, filename, self._next_index(),
+                                                 self._ref_offset, self.pixelscale, self.save_plots))
+            # Frames der ventede på referencen kan nu behandles
+            ventende, self._ventende_tracking = self._ventende_tracking, []
+            for ventende_fil in ventende:
+                self._process_tracking(ventende_fil)
+            return
+
+        self._ensure_output_path(header)
+
+        if obstype == 'LeapFrog':
+            _, timeout = get_astap_settings(self.app)
+            astap_row, besked = solve_with_retry(self.astap_path, filepath, timeout, cache=self.cache)
+            self.cache.save()
+            self.log(f"ASTAP {filename}: {besked}")
+            self._add_row(process_leapfrog_frame(self.app, self.session_dir, filename, self._next_index(),
+                                                 astap_row, self.save_plots,
+                                                 platesolve_fejl=besked if astap_row is None else None))
+        else:
+            # Tracking (og 'satellite' frames fra observationsplanen) bruger stjernehimmel offset
+            if self._ref_offset is None and len(self._ventende_tracking) < self.MAX_VENTENDE_UDEN_REFERENCE:
+                self._ventende_tracking.append(filename)
+                return
+            for ventende_fil in self._ventende_tracking:
+                self._process_tracking(ventende_fil)
+            self._ventende_tracking = []
+            self._process_tracking(filename)
+
+    def _process_tracking(self, filename):
+        ref_offset = self._ref_offset or {'ra_offset': 0, 'dec_offset': 0, 'rotation_offset': 0}
+        self._add_row(process_tracking_frame(self.app, self.session_dir, filename, self._next_index(),
+                                             ref_offset, self.pixelscale, self.save_plots,
+                                             roi_radius=get_tracking_roi_radius(self.app)))
+
+    def _next_index(self):
+        index = self._frame_index
+        self._frame_index += 1
+        return index
+
+    def _ensure_output_path(self, header):
+        """Navngiv CSV som den almindelige analyse ud fra første satellitframe"""
+        if self.output_path is not None:
+            return
+        sat_name = header.get('OBJECT', header.get('SATNAME', 'Unknown'))
+        norad_id = header.get('NORAD_ID', 'Unknown')
+        self.output_path = os.path.join(self.session_dir, f"data_{sat_name}_{norad_id}.csv")
+        self.log(f"Skriver resultater løbende til: {os.path.basename(self.output_path)}")
+
+    def _add_row(self, row):
+        self._ventende_rows.append(row)
+        self._flush_ventende_rows()
+
+    def _flush_ventende_rows(self):
+        """Tilføj rækker til CSV'en - append hvis kolonnerne passer, ellers skrives filen om"""
+        if self.output_path is None or not self._ventende_rows:
+            return
+
+        nye_rows, self._ventende_rows = self._ventende_rows, []
+        self._rows.extend(nye_rows)
+
+        nye_kolonner = [k for row in nye_rows for k in row.keys() if k not in self._kolonner]
+        if nye_kolonner or not os.path.exists(self.output_path):
+            for kolonne in nye_kolonner:
+                if kolonne not in self._kolonner:
+                    self._kolonner.append(kolonne)
+            pd.DataFrame(self._rows, columns=self._kolonner).to_csv(self.output_path, index=False)
+        else:
+            pd.DataFrame(nye_rows, columns=self._kolonner).to_csv(self.output_path, mode='a',
+                                                                  header=False, index=False)
+
+        for row in nye_rows:
+            status = row.get('error') or (f"RA/DEC {row['Sat_RA_Behandlet']:.5f}°, {row['Sat_DEC_Behandlet']:.5f}°"
+                                          if 'Sat_RA_Behandlet' in row else "ingen satellit position")
+            self.log(f"{row.get('filename')}: {status}")
+
+
+def start_live_analyse(self, session_dir):
+    """Start live analyse af en sessionsmappe hvis det er slået til i Billede Analyse fanen.
+    Returnerer watcher-tråden eller None."""
+    try:
+        if not self.live_analysis_var.get():
+            return None
+        astap_path = self.astap_path_entry.get().strip()
+        pixelscale = float(self.pixelscale_entry.get())
+        save_plots = self.save_plots_var.get()
+    except (AttributeError, ValueError) as e:
+        analysis_log_message(self, f"Live analyse ikke startet: {str(e)}")
+        return None
+
+    if not solver_tilgaengelig(astap_path):
+        analysis_log_message(self, "Live analyse ikke startet: ugyldig ASTAP sti / lokalt katalog")
+        return None
+
+    watchers = self.live_analysis_watchers
+    eksisterende = watchers.get(session_dir)
+    if eksisterende is not None and eksisterende.is_alive():
+        return eksisterende
+
+    watcher = LiveAnalyseWatcher(self, session_dir, astap_path, pixelscale, save_plots)
+    watchers[session_dir] = watcher
+    watcher.start()
+    return watcher
+
+
+def stop_live_analyse(self, watcher):
+    """Signalér at observationen er slut - watcheren færdiggør de sidste frames i baggrunden"""
+    if watcher is None:
+        return
+    watcher.stop()
+    if self.live_analysis_watchers.get(watcher.session_dir) is watcher:
+        del self.live_analysis_watchers[watcher.session_dir]
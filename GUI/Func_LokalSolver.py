@@ -0,0 +1,654 @@
+"""
+Func_LokalSolver.py - Indbygget plate solver (alternativ til ASTAP subprocessen)
+Løser i processen ved trekant-hashing mod et lokalt indekseret stjernekatalog: stjerner
+findes i billedet, trekanter af de lyseste stjerner beskrives ved skala- og
+rotationsinvariante sideforhold og matches mod katalogtrekanter omkring pointing hintet
+(RA/DEC i FITS headeren). Resultatet har samme WCS nøgler som ASTAP (CRVAL/CRPIX/CD ...).
+
+Kataloget er en .npz fil med ra, dec (grader, J2000) og mag, bygget fra et CSV udtræk
+(fx Gaia eller Tycho-2 omkring observationsfelterne):
+
+    python Func_LokalSolver.py byg stjerner.csv katalog.npz --mag 14
+    python Func_LokalSolver.py loes katalog.npz frame.fits
+    python Func_LokalSolver.py benchmark --frames 5 [--sekvens]
+
+Vælges i ASTAP feltet som 'lokal:<sti til katalog.npz>' (eller blot stien til .npz filen)
+"""
+
+import os
+import time
+import argparse
+import threading
+from itertools import combinations
+
+import numpy as np
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+from Func_FitsLoader import read_frame, binned_view
+from Func_Detektion import frame_median
+from Func_WCS import pixel_to_radec_batch, radec_to_pixel_batch
+
+# Pixelskala (grader/pixel ved 1x1 binning) når headeren ikke har en - samme standard som analyse fanen
+STANDARD_PIXELSKALA = 6.2399e-05
+SKALA_TOLERANCE = 0.3          # tilladt relativ afvigelse fra pixelskala hintet
+
+# Søgeradius (grader) omkring pointing hintet - ASTAP's 30°/180° genforsøg begrænses til MAKS
+STANDARD_SOEGERADIUS = 1.0
+MAKS_SOEGERADIUS = 5.0
+
+STJERNE_BINNING = 2
+STJERNE_SIGMA = 5.0
+ANTAL_BILLED_STJERNER = 40
+ANTAL_BILLED_TREKANT = 15      # lyseste billedstjerner der danner trekanter (455 trekanter)
+ANTAL_KATALOG_TREKANT = 30     # lyseste katalogstjerner pr. felt der danner trekanter (4060 trekanter)
+INVARIANT_TOLERANCE = 0.01
+MAKS_KANDIDATER = 2000
+MATCH_TOLERANCE_PX = 3.0
+MIN_MATCHES = 6
+
+# Inkrementel (sekvens) astrometri: reference stjerner fra forrige løsning flyttet med mountens delta
+ANTAL_SEKVENS_STJERNER = 100
+SEKVENS_SOEGERADIUS_PX = 400.0    # maks resterende pointing fejl efter mount delta
+SEKVENS_TOLERANCE_PX = 4.0
+SEKVENS_RMS_GRAENSE_PX = 1.5      # større rest-rms giver fuld løsning
+SEKVENS_SKRIDT = 2                # pixel-skridt for den udtyndede detektion der finder forskydningen
+SEKVENS_MIN_ANDEL = 0.5           # færre matches (andel af reference stjernerne) giver ny reference
+
+_lock = threading.Lock()
+_kataloger = {}
+
+
+class StjerneKatalog:
+    """Stjernekatalog sorteret efter lysstyrke med KD-træ over enhedsvektorer"""
+
+    def __init__(self, path):
+        with np.load(path) as f:
+            ra = np.asarray(f['ra'], dtype=np.float64)
+            dec = np.asarray(f['dec'], dtype=np.float64)
+            mag = np.asarray(f['mag'], dtype=np.float64) if 'mag' in f else np.zeros_like(ra)
+
+        orden = np.argsort(mag, kind='stable')
+        self.ra, self.dec, self.mag = ra[orden], dec[orden], mag[orden]
+        ra_rad, dec_rad = np.radians(self.ra), np.radians(self.dec)
+        self.traee = cKDTree(np.column_stack([np.cos(dec_rad) * np.cos(ra_rad),
+                                              np.cos(dec_rad) * np.sin(ra_rad),
+                                              np.sin(dec_rad)]))
+
+    def __len__(self):
+        return len(self.ra)
+
+    def omkring(self, ra0, dec0, radius):
+        """Indeks for stjerner inden for radius (grader) af (ra0, dec0), lyseste først"""
+        ra0, dec0 = np.radians(ra0), np.radians(dec0)
+        centrum = [np.cos(dec0) * np.cos(ra0), np.cos(dec0) * np.sin(ra0), np.sin(dec0)]
+        korde = 2 * np.sin(np.radians(min(radius, 180.0)) / 2)
+        return np.sort(np.asarray(self.traee.query_ball_point(centrum, korde), dtype=np.intp))
+
+
+def hent_katalog(path):
+    """Katalog indlæst én gang pr. proces og sti"""
+    path = os.path.abspath(path)
+    with _lock:
+        if path not in _kataloger:
+            _kataloger[path] = StjerneKatalog(path)
+        return _kataloger[path]
+
+
+def byg_katalog(csv_path, output_path, mag_graense=None):
+    """Byg .npz katalog fra en CSV med kolonnerne ra, dec og mag (eller phot_g_mean_mag)"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    mag_kolonne = next((c for c in ('mag', 'phot_g_mean_mag', 'vmag', 'gmag') if c in df.columns), None)
+    if 'ra' not in df.columns or 'dec' not in df.columns or mag_kolonne is None:
+        raise ValueError("CSV skal have kolonnerne ra, dec og mag")
+
+    df = df.dropna(subset=['ra', 'dec', mag_kolonne])
+    if mag_graense is not None:
+        df = df[df[mag_kolonne] <= mag_graense]
+    np.savez_compressed(output_path, ra=df['ra'].to_numpy(np.float64), dec=df['dec'].to_numpy(np.float64),
+                        mag=df[mag_kolonne].to_numpy(np.float32))
+    return len(df)
+
+
+def _tangent_wcs(ra0, dec0):
+    """WCS række med enheds-CD så pixel = standard koordinater (ξ, η) i grader omkring (ra0, dec0)"""
+    return {'CRPIX1': 0.0, 'CRPIX2': 0.0, 'CRVAL1': ra0, 'CRVAL2': dec0,
+            'CD1_1': 1.0, 'CD1_2': 0.0, 'CD2_1': 0.0, 'CD2_2': 1.0}
+
+
+def _baggrund(data):
+    """(median, robust støj) for et billede - støjen fra MAD af hver 4. pixel"""
+    median = frame_median(data)
+    stoej = 1.4826 * float(np.median(np.abs(data[::4, ::4].astype(np.float64) - median)))
+    return median, max(stoej, 1e-6)
+
+
+def find_stjerner(image_data, antal=ANTAL_BILLED_STJERNER, binning=STJERNE_BINNING, sigma=STJERNE_SIGMA):
+    """Centroider (x, y) i FITS pixelkoordinater (1-baseret) for de lyseste stjerner, lyseste først.
+    Enkeltpixel detektioner i det binnede billede (hot pixels, kosmisk stråling) frasorteres."""
+    data = binned_view(image_data, binning)
+    median, stoej = _baggrund(data)
+    maske = data > median + sigma * stoej
+
+    labels, n = ndimage.label(maske)
+    if n == 0:
+        return np.empty((0, 2))
+    # Flux, størrelse og tyngdepunkt pr. klat kun over de maskerede pixels (ikke hele billedet)
+    pixels = np.flatnonzero(maske)
+    klat = labels.ravel()[pixels]
+    vaegt = data.ravel()[pixels].astype(np.float64) - median
+    py, px = np.divmod(pixels, data.shape[1])
+    flux = np.bincount(klat, vaegt, minlength=n + 1)[1:]
+    stoerrelse = np.bincount(klat, minlength=n + 1)[1:]
+    centre = np.column_stack([np.bincount(klat, vaegt * py, minlength=n + 1)[1:],
+                              np.bincount(klat, vaegt * px, minlength=n + 1)[1:]]) / flux[:, None]
+
+    gyldige = np.flatnonzero(stoerrelse >= 2)
+    gyldige = gyldige[np.argsort(-flux[gyldige], kind='stable')][:antal]
+    y = (centre[gyldige, 0] + 0.5) * binning - 0.5
+    x = (centre[gyldige, 1] + 0.5) * binning - 0.5
+    return np.column_stack([x + 1.0, y + 1.0])
+
+
+def _udtyndede_stjerner(image_data, skridt, antal=ANTAL_SEKVENS_STJERNER):
+    """Grove stjernepositioner (FITS pixel) fra hver skridt'te pixel i begge akser.
+    Læser kun en brøkdel af billedet - positionerne er usikre med ca. skridt/2 pixel"""
+    start = skridt // 2
+    stjerner = find_stjerner(image_data[start::skridt, start::skridt], antal=antal, binning=1)
+    return (stjerner - 1.0) * skridt + start + 1.0
+
+
+def _vindue_centroider(image_data, positioner, halv, median, graense, binning=STJERNE_BINNING):
+    """Vægtede centroider (FITS pixel) i vinduer på (2*halv+1)² binnede pixels omkring positioner
+    (FITS pixel) - samme binning og tærskel (graense i binnede værdier) som find_stjerner, men kun
+    vinduerne læses. Returnerer (centroider (n, 2), gyldig (n,)); gyldig kræver vinduet inde i
+    billedet og mindst 2 binnede pixels over grænsen"""
+    height, width = image_data.shape
+    centroider = np.full((len(positioner), 2), np.nan)
+    gyldig = np.zeros(len(positioner), dtype=bool)
+    # Binnet pixel (som binned_view) der indeholder positionen
+    c = np.rint((positioner - 0.5) / binning - 0.5).astype(np.int64)
+    inde = np.flatnonzero((c[:, 0] >= halv) & (c[:, 0] < width // binning - halv) &
+                          (c[:, 1] >= halv) & (c[:, 1] < height // binning - halv))
+    if len(inde) == 0:
+        return centroider, gyldig
+
+    n, k = len(inde), 2 * halv + 1
+    akse = np.arange(-halv * binning, (halv + 1) * binning)
+    vinduer = image_data[c[inde, 1, None, None] * binning + akse[None, :, None],
+                         c[inde, 0, None, None] * binning + akse[None, None, :]].astype(np.float64)
+    vinduer = vinduer.reshape(n, k, binning, k, binning).mean(axis=(2, 4))
+    binnet = np.arange(-halv, halv + 1)
+    ys = ((c[inde, 1, None, None] + binnet[None, :, None]) + 0.5) * binning - 0.5
+    xs = ((c[inde, 0, None, None] + binnet[None, None, :]) + 0.5) * binning - 0.5
+
+    over = vinduer > graense
+    vaegt = np.where(over, vinduer - median, 0.0)
+    flux = vaegt.sum(axis=(1, 2))
+    ok = (over.sum(axis=(1, 2)) >= 2) & (flux > 0)
+    flux = np.where(ok, flux, 1.0)
+    centroider[inde, 0] = (vaegt * xs).sum(axis=(1, 2)) / flux + 1.0
+    centroider[inde, 1] = (vaegt * ys).sum(axis=(1, 2)) / flux + 1.0
+    gyldig[inde] = ok
+    centroider[~gyldig] = np.nan
+    return centroider, gyldig
+
+
+def trekanter(punkter, n):
+    """Alle trekanter af de n første punkter.
+    Returnerer (invarianter (T, 2), hjørner (T, 3)) - invarianterne er de to korteste sider
+    divideret med den længste, og hjørnerne er ordnet efter den modstående sides længde."""
+    n = min(n, len(punkter))
+    if n < 3:
+        return np.empty((0, 2)), np.empty((0, 3), dtype=np.intp)
+    kombinationer = np.array(list(combinations(range(n), 3)), dtype=np.intp)
+    p = punkter[kombinationer]
+    sider = np.stack([np.hypot(*(p[:, 1] - p[:, 2]).T),
+                      np.hypot(*(p[:, 0] - p[:, 2]).T),
+                      np.hypot(*(p[:, 0] - p[:, 1]).T)], axis=1)
+    orden = np.argsort(sider, axis=1)
+    sider = np.take_along_axis(sider, orden, axis=1)
+    hjoerner = np.take_along_axis(kombinationer, orden, axis=1)
+    gyldige = sider[:, 2] > 0
+    return sider[gyldige, :2] / sider[gyldige, 2:], hjoerner[gyldige]
+
+
+def _kandidat_transformationer(billede, katalog_xy, pixelskala):
+    """Affine transformationer (pixel offset -> ξ, η) fra par af trekanter med ens invarianter.
+    Returnerer (M (K, 3, 2)) sorteret efter invariant-afstand; kun næsten-similariteter med
+    skala tæt på pixelskala hintet beholdes."""
+    inv_b, hj_b = trekanter(billede, ANTAL_BILLED_TREKANT)
+    inv_k, hj_k = trekanter(katalog_xy, ANTAL_KATALOG_TREKANT)
+    if len(inv_b) == 0 or len(inv_k) == 0:
+        return np.empty((0, 3, 2))
+
+    naboer = cKDTree(inv_k).query_ball_point(inv_b, INVARIANT_TOLERANCE)
+    i_b = np.repeat(np.arange(len(inv_b)), [len(nb) for nb in naboer])
+    if i_b.size == 0:
+        return np.empty((0, 3, 2))
+    i_k = np.concatenate([np.asarray(nb, dtype=np.intp) for nb in naboer])
+    afstand = np.hypot(*(inv_b[i_b] - inv_k[i_k]).T)
+    orden = np.argsort(afstand, kind='stable')[:MAKS_KANDIDATER]
+    i_b, i_k = i_b[orden], i_k[orden]
+
+    # [x y 1] @ M = [ξ η] løst eksakt for hvert trekantpar
+    P = billede[hj_b[i_b]]
+    A = np.concatenate([P, np.ones(P.shape[:2] + (1,))], axis=2)
+    Q = katalog_xy[hj_k[i_k]]
+    regulaer = np.abs(np.linalg.det(A)) > 1e-6
+    M = np.linalg.solve(A[regulaer], Q[regulaer])
+
+    singulaer = np.linalg.svd(M[:, :2, :], compute_uv=False)
+    skala = np.sqrt(singulaer[:, 0] * singulaer[:, 1])
+    similaritet = singulaer[:, 0] / singulaer[:, 1] < 1.05
+    skala_ok = np.abs(skala / pixelskala - 1) < SKALA_TOLERANCE
+    return M[similaritet & skala_ok]
+
+
+def _match(billede, M, katalog_traee, tolerance):
+    """Par (billede indeks, katalog indeks) hvor den transformerede stjerne rammer en katalogstjerne"""
+    projiceret = billede @ M[:2] + M[2]
+    afstand, katalog_idx = katalog_traee.query(projiceret, distance_upper_bound=tolerance)
+    fundet = np.flatnonzero(np.isfinite(afstand))
+    # Hver katalogstjerne må kun bruges én gang (nærmeste billedstjerne vinder)
+    fundet = fundet[np.argsort(afstand[fundet], kind='stable')]
+    _, unikke = np.unique(katalog_idx[fundet], return_index=True)
+    fundet = fundet[unikke]
+    return fundet, katalog_idx[fundet]
+
+
+def fit_wcs(billede_px, ra, dec, crpix, ra0, dec0, iterationer=3):
+    """Mindste kvadraters fit af CD og CRVAL til matchede stjerner.
+    billede_px er FITS pixelkoordinater; returnerer (crval1, crval2, cd (2, 2), rms i pixels)"""
+    offset = billede_px - crpix
+    A = np.column_stack([offset, np.ones(len(offset))])
+    crval = (ra0, dec0)
+    for _ in range(iterationer):
+        xi, eta = radec_to_pixel_batch(ra, dec, _tangent_wcs(*crval))
+        M, *_ = np.linalg.lstsq(A, np.column_stack([xi, eta]), rcond=None)
+        # Flyt tangentpunktet til det sted på himlen CRPIX rammer
+        ra_c, dec_c = pixel_to_radec_batch(M[2, 0], M[2, 1], _tangent_wcs(*crval))
+        crval = (float(ra_c[0]) % 360.0, float(dec_c[0]))
+
+    xi, eta = radec_to_pixel_batch(ra, dec, _tangent_wcs(*crval))
+    M, *_ = np.linalg.lstsq(offset, np.column_stack([xi, eta]), rcond=None)
+    cd = M.T  # [ξ, η] = CD @ [u, v]
+    rest = offset @ M - np.column_stack([xi, eta])
+    pixelskala = np.sqrt(abs(np.linalg.det(cd)))
+    rms = float(np.sqrt(np.mean(np.sum(rest**2, axis=1))) / pixelskala)
+    return crval[0], crval[1], cd, rms
+
+
+def wcs_header_dict(crval1, crval2, crpix1, crpix2, cd, naxis1, naxis2):
+    """WCS nøgler som ASTAP skriver dem (CDELT/CROTA afledt af CD matricen)"""
+    cd11, cd12, cd21, cd22 = float(cd[0, 0]), float(cd[0, 1]), float(cd[1, 0]), float(cd[1, 1])
+    fortegn = -1.0 if cd11 * cd22 - cd12 * cd21 < 0 else 1.0
+    return {
+        'CTYPE1': 'RA---TAN', 'CTYPE2': 'DEC--TAN', 'CUNIT1': 'deg', 'CUNIT2': 'deg', 'EQUINOX': 2000.0,
+        'NAXIS1': int(naxis1), 'NAXIS2': int(naxis2),
+        'CRPIX1': float(crpix1), 'CRPIX2': float(crpix2),
+        'CRVAL1': float(crval1), 'CRVAL2': float(crval2),
+        'CDELT1': fortegn * float(np.hypot(cd11, cd21)), 'CDELT2': float(np.hypot(cd12, cd22)),
+        'CROTA1': float(np.degrees(np.arctan2(-cd21, fortegn * cd11))),
+        'CROTA2': float(np.degrees(np.arctan2(fortegn * cd12, cd22))),
+        'CD1_1': cd11, 'CD1_2': cd12, 'CD2_1': cd21, 'CD2_2': cd22,
+        'PLTSOLVD': True,
+    }
+
+
+def forskudt_wcs(wcs, forrige_header, header):
+    """Forrige WCS flyttet med mountens ændring i RA/DEC (og CROTA2) mellem de to headers"""
+    forudsagt = {noegle: float(wcs[noegle]) for noegle in
+                 ('CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2', 'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2')}
+    forudsagt['CRVAL1'] += float(header.get('RA', 0)) - float(forrige_header.get('RA', 0))
+    forudsagt['CRVAL2'] += float(header.get('DEC', 0)) - float(forrige_header.get('DEC', 0))
+
+    if 'CROTA2' in header and 'CROTA2' in forrige_header:
+        # CD(θ + Δ) = CD(θ) @ R(-Δ) med compute_cd's konvention
+        delta = np.radians(float(header['CROTA2']) - float(forrige_header['CROTA2']))
+        cd = np.array([[forudsagt['CD1_1'], forudsagt['CD1_2']], [forudsagt['CD2_1'], forudsagt['CD2_2']]])
+        cd = cd @ np.array([[np.cos(delta), np.sin(delta)], [-np.sin(delta), np.cos(delta)]])
+        forudsagt['CD1_1'], forudsagt['CD1_2'] = cd[0]
+        forudsagt['CD2_1'], forudsagt['CD2_2'] = cd[1]
+    return forudsagt
+
+
+def _dominerende_forskydning(forudsagt, stjerner, radius, bin_stoerrelse):
+    """Mest almindelige forskydning (dx, dy) mellem forudsagte og detekterede positioner (stemmer i 2D)"""
+    forskelle = (stjerner[None, :, :] - forudsagt[:, None, :]).reshape(-1, 2)
+    forskelle = forskelle[np.all(np.abs(forskelle) <= radius, axis=1)]
+    if len(forskelle) == 0:
+        return None
+    bins = np.floor(forskelle / bin_stoerrelse).astype(np.int64)
+    unikke, omvendt, antal = np.unique(bins, axis=0, return_inverse=True, return_counts=True)
+    bedste = np.argmax(antal)
+    return np.median(forskelle[np.ravel(omvendt) == bedste], axis=0)
+
+
+class SekvensAstrometri:
+    """Inkrementel WCS for på hinanden følgende frames i én session.
+    Efter en fuld løsning gemmes de detekterede stjerners RA/DEC; næste frame løses ved at
+    flytte den forrige WCS med mountens delta fra headeren, finde den resterende forskydning
+    fra en udtyndet detektion, måle reference stjernerne i små vinduer og lave et lineært fit.
+    Referencen beholdes så længe nok af dens stjerner matches (mindre drift fra frame til frame);
+    ellers beholdes de matchede og suppleres med nye udtyndede stjerner målt i vinduer - hele
+    billedet detekteres kun efter en fuld løsning.
+    Returnerer (None, grund) når der skal laves en fuld løsning i stedet."""
+
+    def __init__(self, soegeradius_px=SEKVENS_SOEGERADIUS_PX, tolerance_px=SEKVENS_TOLERANCE_PX,
+                 rms_graense_px=SEKVENS_RMS_GRAENSE_PX, skridt=SEKVENS_SKRIDT, min_andel=SEKVENS_MIN_ANDEL):
+        self.soegeradius_px = soegeradius_px
+        self.tolerance_px = tolerance_px
+        self.rms_graense_px = rms_graense_px
+        self.skridt = skridt
+        self.min_andel = min_andel
+        self.reference = None
+        self.nye_referencer = 0
+
+    @property
+    def klar(self):
+        return self.reference is not None
+
+    def nulstil(self, image_data, header, header_dict, stjerner=None):
+        """Ny reference fra en løsning (fuld eller inkrementel) af framen"""
+        if stjerner is None:
+            stjerner = find_stjerner(image_data, antal=ANTAL_SEKVENS_STJERNER)
+        if len(stjerner) < MIN_MATCHES or any(noegle not in header_dict for noegle in ('CRVAL1', 'CD1_1')):
+            self.reference = None
+            return
+        ra, dec = pixel_to_radec_batch(stjerner[:, 0], stjerner[:, 1], header_dict)
+        self.reference = {'wcs': header_dict, 'ra': ra, 'dec': dec,
+                          'header': {k: header[k] for k in ('RA', 'DEC', 'CROTA2') if k in header}}
+        self.nye_referencer += 1
+
+    def loes(self, image_data, header):
+        if self.reference is None:
+            return None, "ingen reference løsning"
+
+        forudsagt = forskudt_wcs(self.reference['wcs'], self.reference['header'], header)
+        x, y = radec_to_pixel_batch(self.reference['ra'], self.reference['dec'], forudsagt)
+        projiceret = np.column_stack([x, y])
+        height, width = image_data.shape
+        margin = self.soegeradius_px
+        i_felt = np.flatnonzero((x > -margin) & (x < width + margin) & (y > -margin) & (y < height + margin))
+        if len(i_felt) < MIN_MATCHES:
+            return None, f"kun {len(i_felt)} reference stjerner i det forudsagte felt"
+
+        # Resterende pointing fejl som én fælles forskydning fra en udtyndet detektion
+        grove = _udtyndede_stjerner(image_data, self.skridt)
+        if len(grove) == 0:
+            return None, "ingen stjerner fundet i det udtyndede billede"
+        forskydning = _dominerende_forskydning(projiceret[i_felt], grove, self.soegeradius_px,
+                                               max(2 * self.tolerance_px, 2 * self.skridt))
+        if forskydning is None:
+            return None, f"ingen stjerner inden for {self.soegeradius_px:.0f} px af forudsigelsen"
+
+        # Reference stjernerne måles i små vinduer omkring deres forskudte position. Støjen i de
+        # binnede vinduer er den udtyndede frames støj / binning (hvid støj over binning² pixels)
+        median, stoej = _baggrund(image_data[::self.skridt, ::self.skridt])
+        graense = median + STJERNE_SIGMA * stoej / STJERNE_BINNING
+        halv = int(np.ceil((self.tolerance_px + self.skridt) / STJERNE_BINNING))
+        forventet = projiceret[i_felt] + forskydning
+        stjerner, gyldig = _vindue_centroider(image_data, forventet, halv, median, graense)
+        afstand = np.hypot(*(stjerner - forventet).T)
+        fundet = np.flatnonzero(gyldig & (afstand <= self.tolerance_px + self.skridt))
+        if len(fundet) < MIN_MATCHES:
+            return None, f"kun {len(fundet)} stjerner matchet"
+
+        crpix = np.array([forudsagt['CRPIX1'], forudsagt['CRPIX2']])
+        crval1, crval2, cd, rms = fit_wcs(stjerner[fundet], self.reference['ra'][i_felt[fundet]],
+                                          self.reference['dec'][i_felt[fundet]], crpix,
+                                          forudsagt['CRVAL1'], forudsagt['CRVAL2'])
+        if rms > self.rms_graense_px:
+            return None, f"rest-rms {rms:.2f} px over grænsen {self.rms_graense_px} px"
+
+        header_dict = wcs_header_dict(crval1, crval2, crpix[0], crpix[1], cd, width, height)
+        header_dict['NMATCH'] = int(len(fundet))
+        header_dict['RMS_PX'] = rms
+        header_dict['SOLVER'] = 'inkrementel'
+        ra, dec = self.reference['ra'], self.reference['dec']
+        if len(fundet) < max(self.min_andel * len(ra), 2 * MIN_MATCHES):
+            # Feltet er flyttet væk fra referencen - de matchede stjerner beholder deres RA/DEC
+            # og suppleres med framens øvrige stjerner (udtyndede positioner målt i vinduer)
+            nye, nye_gyldige = _vindue_centroider(image_data, grove, halv, median, graense)
+            nye = nye[nye_gyldige]
+            afstand, _ = cKDTree(stjerner[fundet]).query(nye, distance_upper_bound=self.tolerance_px)
+            nye = nye[~np.isfinite(afstand)]
+            nye_ra, nye_dec = pixel_to_radec_batch(nye[:, 0], nye[:, 1], header_dict)
+            ra = np.concatenate([ra[i_felt[fundet]], nye_ra])
+            dec = np.concatenate([dec[i_felt[fundet]], nye_dec])
+            self.nye_referencer += 1
+        self.reference = {'wcs': header_dict, 'ra': ra, 'dec': dec,
+                          'header': {k: header[k] for k in ('RA', 'DEC', 'CROTA2') if k in header}}
+        return header_dict, None
+
+
+def _felt_centre(ra0, dec0, radius, afstand):
+    """Centre (ra, dec) for søgefelter i et gitter med given afstand inden for radius, nærmeste først"""
+    n = int(np.ceil(radius / afstand))
+    akse = np.arange(-n, n + 1) * afstand
+    xi, eta = np.meshgrid(akse, akse)
+    xi, eta = xi.ravel(), eta.ravel()
+    inden_for = np.hypot(xi, eta) <= radius + 1e-9
+    xi, eta = xi[inden_for], eta[inden_for]
+    orden = np.argsort(np.hypot(xi, eta), kind='stable')
+    return pixel_to_radec_batch(xi[orden], eta[orden], _tangent_wcs(ra0, dec0))
+
+
+def solve_image(image_data, header, katalog, radius=None, timeout=60):
+    """Løs ét billede mod kataloget omkring headerens RA/DEC.
+    Returnerer (header_dict, None) ved succes eller (None, fejlbesked) som solve_fits_file."""
+    t_start = time.perf_counter()
+    if 'RA' not in header or 'DEC' not in header:
+        return None, "intet pointing hint (RA/DEC mangler i headeren)"
+    ra0, dec0 = float(header['RA']), float(header['DEC'])
+
+    height, width = image_data.shape
+    binning = header.get('XBINNING', 1) or 1
+    pixelskala = float(header.get('CDELT2', 0) or 0) or STANDARD_PIXELSKALA * binning
+    crpix = np.array([(width + 1) / 2.0, (height + 1) / 2.0])
+    felt_radius = 0.5 * np.hypot(width, height) * pixelskala
+
+    stjerner = find_stjerner(image_data)
+    if len(stjerner) < MIN_MATCHES:
+        return None, f"kun {len(stjerner)} stjerner fundet i billedet"
+    billede = stjerner - crpix
+
+    soegeradius = min(STANDARD_SOEGERADIUS if radius is None else float(radius), MAKS_SOEGERADIUS)
+    tolerance = MATCH_TOLERANCE_PX * pixelskala
+    bedste = None
+
+    # Felter med halv feltradius afstand sikrer at ét felt-centrum ligger tæt på det sande centrum
+    for ra_c, dec_c in zip(*_felt_centre(ra0, dec0, max(soegeradius, felt_radius / 2), felt_radius / 2)):
+        if time.perf_counter() - t_start > timeout:
+            return None, f"timeout efter {timeout} s"
+
+        idx = katalog.omkring(ra_c, dec_c, 1.5 * felt_radius)
+        if len(idx) < MIN_MATCHES:
+            continue
+        xi, eta = radec_to_pixel_batch(katalog.ra[idx], katalog.dec[idx], _tangent_wcs(ra_c, dec_c))
+        katalog_xy = np.column_stack([xi, eta])
+        katalog_traee = cKDTree(katalog_xy)
+        # Trekanter kun af katalogstjerner der kan ligge i feltet - verifikation mod hele udsnittet
+        i_felt = np.flatnonzero(np.hypot(xi, eta) <= felt_radius)
+
+        for M in _kandidat_transformationer(billede, katalog_xy[i_felt], pixelskala):
+            billed_idx, katalog_match = _match(billede, M, katalog_traee, tolerance)
+            if bedste is None or len(billed_idx) > len(bedste[0]):
+                bedste = (billed_idx, idx[katalog_match])
+            if len(billed_idx) >= max(MIN_MATCHES, len(billede) // 2):
+                break
+
+        if bedste is not None and len(bedste[0]) >= MIN_MATCHES:
+            break
+
+    if bedste is None or len(bedste[0]) < MIN_MATCHES:
+        fundet = 0 if bedste is None else len(bedste[0])
+        return None, f"ingen løsning inden for {soegeradius:.1f}° (bedste match {fundet} stjerner)"
+
+    billed_idx, katalog_idx = bedste
+    crval1, crval2, cd, rms = fit_wcs(stjerner[billed_idx], katalog.ra[katalog_idx], katalog.dec[katalog_idx],
+                                      crpix, ra0, dec0)
+    header_dict = wcs_header_dict(crval1, crval2, crpix[0], crpix[1], cd, width, height)
+    header_dict['NMATCH'] = int(len(billed_idx))
+    header_dict['RMS_PX'] = rms
+    header_dict['SOLVER'] = 'lokal'
+    return header_dict, None
+
+
+def solve_fits_file_lokal(katalog_path, filepath, timeout=60, radius=None):
+    """Drop-in for solve_fits_file med den indbyggede solver"""
+    try:
+        katalog = hent_katalog(katalog_path)
+    except (OSError, KeyError, ValueError) as e:
+        return None, f"kunne ikke indlæse katalog {katalog_path}: {e}"
+    image_data, header = read_frame(filepath)
+    return solve_image(image_data, header, katalog, radius=radius, timeout=timeout)
+
+
+def _syntetisk_felt(rng, katalog, ra0, dec0, shape, pixelskala, rotation):
+    """Syntetisk frame af katalogstjernerne omkring (ra0, dec0) med kendt WCS"""
+    theta = np.radians(rotation)
+    cd = np.array([[-pixelskala * np.cos(theta), pixelskala * np.sin(theta)],
+                   [pixelskala * np.sin(theta), pixelskala * np.cos(theta)]])
+    sand = wcs_header_dict(ra0, dec0, (shape[1] + 1) / 2.0, (shape[0] + 1) / 2.0, cd, shape[1], shape[0])
+
+    idx = katalog.omkring(ra0, dec0, 0.75 * np.hypot(*shape) * pixelskala)
+    x, y = radec_to_pixel_batch(katalog.ra[idx], katalog.dec[idx], sand)
+    data = rng.normal(1000, 20, size=shape)
+    Y, X = np.mgrid[-6:7, -6:7]
+    for xs, ys, mag in zip(x - 1, y - 1, katalog.mag[idx]):
+        xi, yi = int(round(xs)), int(round(ys))
+        if 6 <= xi < shape[1] - 6 and 6 <= yi < shape[0] - 6:
+            flux = 2e5 * 10 ** (-0.4 * (mag - 8))
+            data[yi - 6:yi + 7, xi - 6:xi + 7] += flux / (2 * np.pi * 2.0**2) * \
+                np.exp(-((X + xi - xs)**2 + (Y + yi - ys)**2) / (2 * 2.0**2))
+    return data.clip(0, 65535).astype(np.uint16), sand
+
+
+def benchmark_lokal_solver(n_frames=5, shape=(2048, 2048), pixelskala=2 * STANDARD_PIXELSKALA):
+    """Løs syntetiske felter fra et tilfældigt katalog med kendt WCS og pointing fejl.
+    Måler tid pr. frame og afvigelse i CRVAL/rotation mod den sande løsning"""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    n_stjerner = 400000
+    ra = rng.uniform(140, 160, n_stjerner)
+    dec = np.degrees(np.arcsin(rng.uniform(np.sin(np.radians(30)), np.sin(np.radians(50)), n_stjerner)))
+    mag = 16 - rng.exponential(1.5, n_stjerner)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        katalog_path = os.path.join(tmp, 'katalog.npz')
+        np.savez_compressed(katalog_path, ra=ra, dec=dec, mag=mag)
+        katalog = hent_katalog(katalog_path)
+
+        tider, fejl_arcsec, fejl_rot = [], [], []
+        for _ in range(n_frames):
+            ra0, dec0 = rng.uniform(145, 155), rng.uniform(35, 45)
+            data, sand = _syntetisk_felt(rng, katalog, ra0, dec0, shape, pixelskala, rng.uniform(-180, 180))
+            # Pointing hint med op til 0.2° fejl
+            header = {'RA': ra0 + rng.uniform(-0.2, 0.2), 'DEC': dec0 + rng.uniform(-0.2, 0.2),
+                      'CDELT2': pixelskala}
+
+            t0 = time.perf_counter()
+            loesning, besked = solve_image(data, header, katalog)
+            tider.append(time.perf_counter() - t0)
+            if loesning is None:
+                print(f"  ikke løst: {besked}")
+                continue
+            d_ra = (loesning['CRVAL1'] - sand['CRVAL1']) * np.cos(np.radians(dec0))
+            fejl_arcsec.append(np.hypot(d_ra, loesning['CRVAL2'] - sand['CRVAL2']) * 3600)
+            fejl_rot.append(abs((loesning['CROTA2'] - sand['CROTA2'] + 180) % 360 - 180))
+
+    print(f"Lokal plate solver, {n_frames} frames {shape[1]}x{shape[0]}:")
+    print(f"  løst: {len(fejl_arcsec)}/{n_frames}, tid pr. frame: median {np.median(tider)*1000:.0f} ms, "
+          f"maks {max(tider)*1000:.0f} ms")
+    if fejl_arcsec:
+        print(f"  CRVAL fejl: maks {max(fejl_arcsec):.3f}\", rotation fejl: maks {max(fejl_rot):.4f}°")
+    return tider, fejl_arcsec
+
+
+def benchmark_sekvens(n_frames=20, shape=(2048, 2048), pixelskala=2 * STANDARD_PIXELSKALA):
+    """Syntetisk LeapFrog sekvens: pointing flyttes i skridt langs et spor, headeren har mountens
+    RA/DEC med en lille fejl. Første frame løses fuldt, resten inkrementelt med fallback.
+    Rapporterer løsninger pr. sekund, fallback rate og CRVAL fejl"""
+    import tempfile
+
+    rng = np.random.default_rng(1)
+    n_stjerner = 400000
+    ra = rng.uniform(140, 160, n_stjerner)
+    dec = np.degrees(np.arcsin(rng.uniform(np.sin(np.radians(30)), np.sin(np.radians(50)), n_stjerner)))
+    mag = 16 - rng.exponential(1.5, n_stjerner)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        katalog_path = os.path.join(tmp, 'katalog.npz')
+        np.savez_compressed(katalog_path, ra=ra, dec=dec, mag=mag)
+        katalog = hent_katalog(katalog_path)
+
+        frames = []
+        for i in range(n_frames):
+            ra0, dec0 = 148 + 0.05 * i, 38 + 0.03 * i
+            data, sand = _syntetisk_felt(rng, katalog, ra0, dec0, shape, pixelskala, 25.0)
+            header = {'RA': ra0 + rng.normal(0, 0.005), 'DEC': dec0 + rng.normal(0, 0.005),
+                      'CROTA2': 25.0, 'CDELT2': pixelskala}
+            frames.append((data, header, sand))
+
+        sekvens = SekvensAstrometri()
+        inkrementelle, fallbacks, fejl = 0, 0, []
+        t0 = time.perf_counter()
+        for data, header, sand in frames:
+            loesning, grund = sekvens.loes(data, header) if sekvens.klar else (None, None)
+            if loesning is not None:
+                inkrementelle += 1
+            else:
+                fallbacks += grund is not None
+                loesning, _ = solve_image(data, header, katalog)
+                if loesning is not None:
+                    sekvens.nulstil(data, header, loesning)
+            if loesning is not None:
+                d_ra = (loesning['CRVAL1'] - sand['CRVAL1']) * np.cos(np.radians(sand['CRVAL2']))
+                fejl.append(np.hypot(d_ra, loesning['CRVAL2'] - sand['CRVAL2']) * 3600)
+        tid = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for data, header, _ in frames:
+            solve_image(data, header, katalog)
+        tid_fuld = time.perf_counter() - t0
+
+    print(f"Sekvens astrometri, {n_frames} frames:")
+    print(f"  inkrementel: {n_frames / tid:6.1f} løsninger/s, {inkrementelle} inkrementelle, "
+          f"fallback rate {fallbacks / max(1, n_frames - 1):.0%}, {sekvens.nye_referencer} nye referencer")
+    print(f"  kun fulde  : {n_frames / tid_fuld:6.1f} løsninger/s")
+    if fejl:
+        print(f"  CRVAL fejl: maks {max(fejl):.3f}\"")
+    return tid, tid_fuld
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indbygget plate solver")
+    underkommandoer = parser.add_subparsers(dest='kommando')
+    byg = underkommandoer.add_parser('byg', help="byg .npz katalog fra CSV (ra, dec, mag)")
+    byg.add_argument('csv')
+    byg.add_argument('output')
+    byg.add_argument('--mag', type=float, default=None, help="svageste magnitude der tages med")
+    loes = underkommandoer.add_parser('loes', help="løs en FITS fil")
+    loes.add_argument('katalog')
+    loes.add_argument('fits')
+    loes.add_argument('--radius', type=float, default=None)
+    bench = underkommandoer.add_parser('benchmark', help="syntetisk benchmark")
+    bench.add_argument('--frames', type=int, default=5)
+    bench.add_argument('--sekvens', action='store_true', help="inkrementel astrometri over en sekvens")
+    args = parser.parse_args()
+
+    if args.kommando == 'byg':
+        print(f"{byg_katalog(args.csv, args.output, args.mag)} stjerner skrevet til {args.output}")
+    elif args.kommando == 'loes':
+        loesning, besked = solve_fits_file_lokal(args.katalog, args.fits, radius=args.radius)
+        print(loesning if loesning is not None else besked)
+    elif args.kommando == 'benchmark' and args.sekvens:
+        benchmark_sekvens(args.frames)
+    else:
+        benchmark_lokal_solver(args.frames if args.kommando == 'benchmark' else 5)
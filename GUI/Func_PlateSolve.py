@@ -0,0 +1,377 @@
+"""
+Func_PlateSolve.py - ASTAP Plate Solving
+Kører ASTAP som et begrænset antal samtidige subprocesser med timeout pr. frame,
+genforsøg med større søgeradius og løbende levering af WCS headers.
+Løsninger gemmes i en persistent cache pr. sessionsmappe (PlateSolveCache).
+Angives 'lokal:<katalog.npz>' (eller en .npz sti) i stedet for ASTAP, bruges den indbyggede
+solver i Func_LokalSolver i processen. solve_directory_incremental løser en session som
+sekvens, hvor kun første frame og fallbacks løses fuldt
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import subprocess
+import concurrent.futures
+from astropy.io import fits
+
+DEFAULT_ASTAP_EXE = r"C:\Program Files\astap\astap.exe"
+LOKAL_PREFIX = 'lokal:'
+
+# Søgeradius (grader) for hvert forsøg - None betyder ASTAP's standard
+DEFAULT_RADIUS_FORSOEG = (None, 30, 180)
+
+# Hvor ofte (s) solve_directory_stream ser efter stop mens ingen frame bliver færdig
+STOP_POLL_INTERVAL = 0.5
+
+
+class PlateSolveCache:
+    """Persistent WCS cache for én sessionsmappe.
+    Nøglen er hash af FITS billeddata + ASTAP argumenter, så en frame kun løses igen
+    hvis selve billedet eller solver-indstillingerne er ændret."""
+
+    INDEX_FILNAVN = '.platesolve_cache.json'
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, self.INDEX_FILNAVN)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.filer = {}       # filnavn -> {'size', 'mtime', 'data_hash'} så uændrede filer ikke hashes igen
+        self.loesninger = {}  # cache nøgle -> WCS header dict
+        self._aendret = False
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                self.filer = index.get('filer', {})
+                self.loesninger = index.get('loesninger', {})
+            except (OSError, ValueError):
+                # Ødelagt index - start forfra
+                self.filer, self.loesninger = {}, {}
+
+    def data_hash(self, filepath):
+        """SHA-256 af de rå billeddata i primær HDU (genbruges hvis størrelse og mtime er uændret).
+        Data læses uskaleret, da astropy ikke kan memory-mappe frames med BZERO/BSCALE"""
+        filename = os.path.basename(filepath)
+        stat = os.stat(filepath)
+        with self.lock:
+            kendt = self.filer.get(filename)
+        if kendt and kendt['size'] == stat.st_size and kendt['mtime'] == stat.st_mtime:
+            return kendt['data_hash']
+
+        with fits.open(filepath, memmap=True, do_not_scale_image_data=True) as hdul:
+            data = hdul[0].data
+            # memoryview hasher direkte fra den memory-mappede fil uden at kopiere framen
+            digest = hashlib.sha256(memoryview(data) if data is not None else b'').hexdigest()
+
+        with self.lock:
+            self.filer[filename] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'data_hash': digest}
+            self._aendret = True
+        return digest
+
+    @staticmethod
+    def key(data_hash, astap_exe, radius_forsoeg):
+        """Cache nøgle ud fra data hash og de ASTAP argumenter der påvirker løsningen"""
+        args = json.dumps([os.path.basename(astap_exe).lower(), list(radius_forsoeg)])
+        return hashlib.sha256(f"{data_hash}|{args}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            header_dict = self.loesninger.get(key)
+            if header_dict is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(header_dict)
+
+    def put(self, key, header_dict):
+        # Kun JSON-kompatible værdier gemmes (WCS headers er tal, tekst og bool)
+        rene = {k: v for k, v in header_dict.items() if isinstance(v, (int, float, str, bool))}
+        with self.lock:
+            self.loesninger[key] = rene
+            self._aendret = True
+
+    def save(self):
+        """Skriv index atomisk til sessionsmappen"""
+        with self.lock:
+            if not self._aendret:
+                return
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'filer': self.filer, 'loesninger': self.loesninger}, f)
+            os.replace(tmp_path, self.path)
+            self._aendret = False
+
+    def summary(self):
+        return f"Plate-solve cache: {self.hits} hits, {self.misses} misses"
+
+
+class AstapProcesser:
+    """Kørende ASTAP processer for én batch, så et stop kan afslutte dem med det samme
+    i stedet for at vente på deres timeout. Efter stop() startes ingen nye processer."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.aktive = set()
+        self.stoppet = False
+
+    def start(self, cmd):
+        """Start en proces og registrer den - returnerer None hvis batchen er stoppet"""
+        with self.lock:
+            if self.stoppet:
+                return None
+            proces = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            self.aktive.add(proces)
+        return proces
+
+    def faerdig(self, proces):
+        with self.lock:
+            self.aktive.discard(proces)
+
+    def stop(self):
+        """Slå alle kørende processer ihjel"""
+        with self.lock:
+            self.stoppet = True
+            aktive = list(self.aktive)
+        for proces in aktive:
+            try:
+                proces.kill()
+            except OSError:
+                pass
+
+
+def er_lokal_solver(astap_exe):
+    """Peger solver-feltet på den indbyggede solver ('lokal:<katalog.npz>' eller en .npz sti)?"""
+    navn = (astap_exe or '').strip()
+    return navn.lower().startswith(LOKAL_PREFIX) or navn.lower().endswith('.npz')
+
+
+def lokal_katalog_sti(astap_exe):
+    navn = astap_exe.strip()
+    return navn[len(LOKAL_PREFIX):].strip() if navn.lower().startswith(LOKAL_PREFIX) else navn
+
+
+def solver_tilgaengelig(astap_exe):
+    """Findes ASTAP programmet eller katalogfilen til den indbyggede solver?"""
+    if not astap_exe:
+        return False
+    if er_lokal_solver(astap_exe):
+        return os.path.exists(lokal_katalog_sti(astap_exe))
+    return os.path.exists(astap_exe)
+
+
+def read_wcs_header(wcsfile):
+    """Læs ASTAP .wcs fil og returner header som dict (uden kommentar-kort)"""
+    with fits.open(wcsfile) as hdul:
+        header = hdul[0].header
+        return {k: header[k] for k in header.keys() if k not in ('', 'COMMENT', 'HISTORY')}
+
+
+def solve_fits_file(astap_exe, filepath, timeout=60, radius=None, processer=None):
+    """Kør ASTAP (eller den indbyggede solver) på én FITS fil.
+    Med processer (AstapProcesser) registreres ASTAP processen, så den kan stoppes udefra.
+    Returnerer (header_dict, None) ved succes eller (None, fejlbesked)."""
+    if er_lokal_solver(astap_exe):
+        from Func_LokalSolver import solve_fits_file_lokal
+        return solve_fits_file_lokal(lokal_katalog_sti(astap_exe), filepath, timeout, radius)
+
+    wcsfile = filepath.replace(".fits", ".wcs")
+    cmd = [astap_exe, "-f", filepath, "-wcs", wcsfile]
+    if radius is not None:
+        cmd += ["-r", str(radius)]
+
+    try:
+        if processer is not None:
+            proces = processer.start(cmd)
+        else:
+            proces = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        return None, f"kunne ikke starte ASTAP: {e}"
+    if proces is None:
+        return None, "stoppet"
+
+    try:
+        stdout, stderr = proces.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proces.kill()
+        proces.communicate()
+        return None, f"timeout efter {timeout} s"
+    finally:
+        if processer is not None:
+            processer.faerdig(proces)
+
+    if processer is not None and processer.stoppet:
+        return None, "stoppet"
+    if proces.returncode != 0:
+        return None, (stderr or stdout or f"returkode {proces.returncode}").strip()
+
+    if not os.path.exists(wcsfile):
+        return None, "ASTAP producerede ingen WCS fil"
+
+    try:
+        header_dict = read_wcs_header(wcsfile)
+    finally:
+        try:
+            os.remove(wcsfile)
+        except OSError:
+            pass
+    return header_dict, None
+
+
+def solve_with_retry(astap_exe, filepath, timeout=60, radius_forsoeg=DEFAULT_RADIUS_FORSOEG, cache=None,
+                     processer=None):
+    """Løs én fil og prøv igen med større søgeradius hvis det fejler.
+    Med en PlateSolveCache genbruges tidligere løsninger af samme billeddata.
+    Returnerer (header_dict eller None, besked). Kan cachen ikke bruges, løses filen
+    alligevel og fejlen står i beskeden."""
+    cache_key = None
+    cache_fejl = ""
+    if cache is not None:
+        try:
+            cache_key = cache.key(cache.data_hash(filepath), astap_exe, radius_forsoeg)
+            header_dict = cache.get(cache_key)
+            if header_dict is not None:
+                return header_dict, "fra cache"
+        except Exception as e:
+            cache_key = None
+            cache_fejl = f" (cache ikke brugt: {type(e).__name__}: {e})"
+
+    fejl = []
+    for forsoeg, radius in enumerate(radius_forsoeg, start=1):
+        header_dict, fejlbesked = solve_fits_file(astap_exe, filepath, timeout, radius, processer)
+        if header_dict is not None:
+            if cache_key is not None:
+                cache.put(cache_key, header_dict)
+            radius_tekst = "standard" if radius is None else f"{radius}°"
+            return header_dict, f"løst (forsøg {forsoeg}, radius {radius_tekst}){cache_fejl}"
+        fejl.append(fejlbesked)
+        if processer is not None and processer.stoppet:
+            break
+    return None, f"fejlede efter {len(fejl)} forsøg: {fejl[-1]}{cache_fejl}"
+
+
+def cleanup_astap_files(directory):
+    """Slet alle .ini-filer i mappen (ASTAP kan have lavet dem)"""
+    for f in os.listdir(directory):
+        if f.lower().endswith('.ini'):
+            try:
+                os.remove(os.path.join(directory, f))
+            except Exception:
+                pass
+
+
+def solve_directory_stream(astap_exe, directory, fits_files=None, max_workers=4, timeout=60,
+                           radius_forsoeg=DEFAULT_RADIUS_FORSOEG, stop_check=None, cache=None):
+    """Generator der løser filer med op til max_workers samtidige ASTAP processer.
+    Yielder (filename, header_dict eller None, besked) så snart hver frame er færdig,
+    så efterfølgende detektion kan starte mens resten stadig løses.
+    Med cache springes frames med uændret billeddata over og indexet gemmes til sidst.
+    stop_check tjekkes også mens ingen frame bliver færdig; ved stop slås kørende ASTAP processer ihjel."""
+    if fits_files is None:
+        fits_files = sorted(f for f in os.listdir(directory) if f.lower().endswith('.fits'))
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers))
+    processer = AstapProcesser()
+    futures = {}
+    try:
+        for filename in fits_files:
+            filepath = os.path.join(directory, filename)
+            futures[executor.submit(solve_with_retry, astap_exe, filepath, timeout, radius_forsoeg, cache,
+                                    processer)] = filename
+
+        ventende = set(futures)
+        while ventende:
+            done, ventende = concurrent.futures.wait(ventende, timeout=STOP_POLL_INTERVAL,
+                                                     return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                filename = futures[future]
+                try:
+                    header_dict, besked = future.result()
+                except Exception as e:
+                    header_dict, besked = None, f"fejl: {e}"
+                yield filename, header_dict, besked
+
+            if stop_check is not None and stop_check():
+                break
+    finally:
+        # Annuller frames der ikke er startet og slå kørende ASTAP processer ihjel, så
+        # shutdown kun venter på at trådene opdager det (også når generatoren lukkes tidligt)
+        processer.stop()
+        executor.shutdown(wait=True, cancel_futures=True)
+        cleanup_astap_files(directory)
+        if cache is not None:
+            try:
+                cache.save()
+            except OSError:
+                pass
+
+
+def solve_directory_incremental(astap_exe, directory, fits_files=None, timeout=60,
+                                radius_forsoeg=DEFAULT_RADIUS_FORSOEG, stop_check=None, cache=None,
+                                statistik=None):
+    """Sekvens-seedet astrometri: første frame (og alle fallbacks) løses fuldt med ASTAP/den
+    indbyggede solver, de efterfølgende ved match mod forrige løsning flyttet med mountens delta
+    (Func_LokalSolver.SekvensAstrometri). Yielder (filename, header_dict eller None, besked) i
+    fil-rækkefølge som solve_directory_stream. statistik (dict) opdateres løbende - se sekvens_summary."""
+    from Func_FitsLoader import read_frame
+    from Func_LokalSolver import SekvensAstrometri
+
+    if fits_files is None:
+        fits_files = sorted(f for f in os.listdir(directory) if f.lower().endswith('.fits'))
+    if statistik is None:
+        statistik = {}
+    statistik.update({'frames': 0, 'inkrementelle': 0, 'fulde': 0, 'fallbacks': 0, 'tid_s': 0.0})
+
+    sekvens = SekvensAstrometri()
+    t_start = time.perf_counter()
+    try:
+        for filename in fits_files:
+            filepath = os.path.join(directory, filename)
+            image_data, header = read_frame(filepath)
+            header_dict, besked, grund = None, None, None
+
+            if sekvens.klar:
+                header_dict, grund = sekvens.loes(image_data, header)
+                if header_dict is not None:
+                    statistik['inkrementelle'] += 1
+                    besked = f"inkrementel ({header_dict['NMATCH']} stjerner, rms {header_dict['RMS_PX']:.2f} px)"
+                else:
+                    statistik['fallbacks'] += 1
+
+            if header_dict is None:
+                header_dict, besked = solve_with_retry(astap_exe, filepath, timeout, radius_forsoeg, cache)
+                statistik['fulde'] += 1
+                if header_dict is not None:
+                    sekvens.nulstil(image_data, header, header_dict)
+                if grund is not None:
+                    besked = f"{besked} - fuld løsning fordi: {grund}"
+
+            statistik['frames'] += 1
+            statistik['tid_s'] = time.perf_counter() - t_start
+            yield filename, header_dict, besked
+
+            if stop_check is not None and stop_check():
+                break
+    finally:
+        cleanup_astap_files(directory)
+        if cache is not None:
+            try:
+                cache.save()
+            except OSError:
+                pass
+
+
+def sekvens_summary(statistik):
+    frames = statistik.get('frames', 0)
+    if frames == 0:
+        return "Sekvens astrometri: ingen frames"
+    tid = max(statistik['tid_s'], 1e-9)
+    forsoeg = statistik['inkrementelle'] + statistik['fallbacks']
+    fallback_rate = statistik['fallbacks'] / forsoeg if forsoeg else 0.0
+    return (f"Sekvens astrometri: {frames} frames på {tid:.1f} s ({frames / tid:.1f} løsninger/s), "
+            f"{statistik['inkrementelle']} inkrementelle, {statistik['fulde']} fulde, "
+            f"fallback rate {fallback_rate:.0%}")
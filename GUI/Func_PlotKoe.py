@@ -0,0 +1,175 @@
+"""
+Func_PlotKoe.py - Diagnostiske analyse plots renderet i baggrunden
+Detektionen bestiller et plot med en nedskaleret kopi af framen og resultat dict'en; selve
+matplotlib renderingen (Agg) og PNG skrivningen sker i en separat process pool med lav prioritet,
+så den hverken forsinker detektionen eller konkurrerer med analyse workerne om CPU.
+"""
+
+import os
+import threading
+import concurrent.futures
+
+import numpy as np
+
+# Samme størrelse som plots altid er blevet vist i
+PLOT_HOEJDE, PLOT_BREDDE = 639, 958
+
+
+def nedskaler(image_data):
+    """Nedskaleret float32 kopi af framen til plottet samt (scale_x, scale_y)"""
+    import cv2
+    original_height, original_width = image_data.shape
+    billede = cv2.resize(np.asarray(image_data, dtype=np.float32), (PLOT_BREDDE, PLOT_HOEJDE),
+                         interpolation=cv2.INTER_AREA)
+    return billede, PLOT_BREDDE / original_width, PLOT_HOEJDE / original_height
+
+
+def _init_plot_worker():
+    """Plot workere kører med Agg og lavere prioritet end analysen"""
+    os.environ['MPLBACKEND'] = 'Agg'
+    try:
+        os.nice(10)
+    except AttributeError:
+        # Windows: BELOW_NORMAL_PRIORITY_CLASS
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), 0x00004000)
+        except Exception:
+            pass
+    except OSError:
+        pass
+
+
+def _oest_vest_linje(ax, billede, rotation_angle):
+    """Øst/vest skillelinje gennem billedets centrum (samme beregning som i Func_fagprojekt.py)"""
+    theta_rad = np.radians(-rotation_angle)  # MINUS som i original
+    height_scaled, width_scaled = billede.shape
+    x_c = (width_scaled - 1) / 2
+    y_c = (height_scaled - 1) / 2
+
+    # Linjens retning og endepunkter (går gennem centrum), begrænset til billedet
+    dx_line = np.sin(theta_rad)
+    dy_line = -np.cos(theta_rad)
+    t_vals = np.linspace(-max(width_scaled, height_scaled), max(width_scaled, height_scaled), 1000)
+    x_line_all = x_c + t_vals * dx_line
+    y_line_all = y_c + t_vals * dy_line
+    mask_inside = (
+        (x_line_all >= 0) & (x_line_all < width_scaled) &
+        (y_line_all >= 0) & (y_line_all < height_scaled)
+    )
+    ax.plot(x_line_all[mask_inside], y_line_all[mask_inside], color='yellow', linewidth=2, linestyle='--',
+            label='Øst/Vest skillelinje', alpha=0.8)
+
+    # Øst til venstre og vest til højre for linjen (vinkelret retning)
+    offset = 50  # pixels
+    dx_perp = -dy_line
+    dy_perp = dx_line
+    boks = dict(boxstyle='round,pad=0.3', facecolor='black', alpha=0.7)
+    ax.text(x_c + offset * dx_perp, y_c + offset * dy_perp, 'VEST', color='yellow', fontsize=12,
+            fontweight='bold', ha='center', va='center', bbox=boks)
+    ax.text(x_c - offset * dx_perp, y_c - offset * dy_perp, 'ØST', color='yellow', fontsize=12,
+            fontweight='bold', ha='center', va='center', bbox=boks)
+
+
+def render_plot(opgave):
+    """Render ét bestilt plot til PNG og returner stien (kører i plot workeren)"""
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Circle
+
+    billede = opgave['billede']
+    result = opgave['result']
+    scale_x, scale_y = opgave['scale']
+    scaled_x = result['x_sat'] * scale_x
+    scaled_y = result['y_sat'] * scale_y
+
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+
+    if opgave['type'] == 'leapfrog':
+        ax.imshow(np.clip(billede, None, 600), cmap='gray')
+        ax.scatter(scaled_x, scaled_y, color='green', marker='x', s=100, label='Satellit position')
+        if 'x1' in result:
+            # Cirkler omkring endepunkterne i stedet for linje
+            circle_radius = 5
+            ax.add_patch(Circle((result['x1'] * scale_x, result['y1'] * scale_y), circle_radius, edgecolor='red',
+                                facecolor='none', linewidth=1, label='Endepunkt 1'))
+            ax.add_patch(Circle((result['x2'] * scale_x, result['y2'] * scale_y), circle_radius, edgecolor='blue',
+                                facecolor='none', linewidth=1, label='Endepunkt 2'))
+        if 'rotation_angle' in result:
+            _oest_vest_linje(ax, billede, result['rotation_angle'])
+    else:
+        # Vis kun gyldige pixels for at undgå problemer med display
+        valid_pixels = billede[billede > 0]
+        if len(valid_pixels) > 0:
+            vmin, vmax = np.percentile(valid_pixels, [5, 99])
+        else:
+            vmin, vmax = 0, 1
+        radius = opgave['radius']
+        ax.imshow(billede, cmap='gray', vmin=vmin, vmax=vmax)
+        ax.add_patch(Circle((scaled_x, scaled_y), radius * min(scale_x, scale_y), edgecolor='cyan',
+                            facecolor='none', linewidth=2, label=f'Pixelsum radius ({radius}px)'))
+        ax.scatter(scaled_x, scaled_y, color='red', marker='+', s=100, label='Satellit centrum')
+
+    ax.legend()
+    ax.set_title(opgave['titel'])
+    ax.set_xlabel("Pixel X")
+    ax.set_ylabel("Pixel Y")
+    fig.savefig(opgave['plot_path'], dpi=150, bbox_inches='tight')
+    return opgave['plot_path']
+
+
+class PlotKoe:
+    """Process pool med lav prioritet der renderer bestilte plots i baggrunden.
+    Færdige PNG stier samles i faerdige (i færdiggørelsesrækkefølge) så GUI'en kan vise dem løbende."""
+
+    def __init__(self, workers=1):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=max(1, workers),
+                                                               initializer=_init_plot_worker)
+        self.faerdige = []
+        self.fejl = []
+        self.lukket = False
+        self._lock = threading.Lock()
+
+    def submit(self, opgave):
+        if self.executor is not None:
+            try:
+                self.executor.submit(render_plot, opgave).add_done_callback(self._modtag)
+                return
+            except (RuntimeError, AssertionError, OSError):
+                # Lukket pool eller ingen underprocesser tilladt (fx i en daemon worker) - render her
+                self.executor = None
+        try:
+            self._registrer(render_plot(opgave), None)
+        except Exception as e:
+            self._registrer(None, e)
+
+    def _modtag(self, future):
+        try:
+            self._registrer(future.result(), None)
+        except Exception as e:
+            self._registrer(None, e)
+
+    def _registrer(self, plot_path, fejl):
+        with self._lock:
+            if fejl is None:
+                self.faerdige.append(plot_path)
+            else:
+                self.fejl.append(str(fejl))
+
+    def nye_plots(self, start):
+        """Færdige plots fra position start og frem"""
+        with self._lock:
+            return self.faerdige[start:]
+
+    def luk(self, wait=True):
+        """Vent på (eller annuller) de resterende plots og luk poolen"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        self.lukket = True
+
+    def summary(self):
+        tekst = f"{len(self.faerdige)} plots renderet i baggrunden"
+        if self.fejl:
+            tekst += f", {len(self.fejl)} fejlede (første: {self.fejl[0]})"
+        return tekst
@@ -0,0 +1,184 @@
+"""
+Func_Propagering.py - Vektoriseret SGP4 motor for mange satellitter og mange epoker
+N TLE'er propageres til M epoker med sgp4's SatrecArray (ét C kald pr. chunk) i stedet for
+én EarthSatellite og ét tidspunkt ad gangen. Epokerne deles i chunks så satellit x epoke
+arbejdsarrays holdes under chunk_punkter punkter. TEME -> GCRS rotationen og observatørens
+position afhænger kun af tiden og beregnes én gang pr. chunk for alle satellitter.
+Resultaterne er de samme som Skyfields (satellit - observatør).at(t) (geometrisk, uden lystid).
+"""
+
+import sys
+import time
+
+import numpy as np
+
+try:
+    from sgp4.api import Satrec, SatrecArray
+    SGP4_AVAILABLE = True
+except ImportError:
+    SGP4_AVAILABLE = False
+
+# Satellit x epoke punkter pr. sgp4 kald (r, v og rotationer fylder ca. 100 bytes pr. punkt)
+DEFAULT_CHUNK_PUNKTER = 1_000_000
+
+
+def _som_tid(datoer):
+    """Skyfield Time array for datoer (accepterer også en færdig Time)"""
+    from Func_Ephemeris import get_timescale, utc_time_array
+    if hasattr(datoer, 'tai_fraction'):
+        if datoer.shape:
+            return datoer
+        # Skalar Time -> array med én epoke
+        return get_timescale().tai_jd(np.atleast_1d(datoer.whole), np.atleast_1d(datoer.tai_fraction))
+    return utc_time_array(datoer)
+
+
+def epoke_data(t):
+    """(jd, fr, R) for et Time array: UTC dato opdeling som Skyfield giver sgp4 og TEME -> GCRS
+    rotationen R med form (3, 3, M)"""
+    from skyfield.sgp4lib import TEME
+    jd = np.asarray(t.whole, dtype=float)
+    fr = np.asarray(t.tai_fraction - t._leap_seconds() / 86400.0, dtype=float)
+    return jd, fr, np.swapaxes(TEME.rotation_at(t), 0, 1)
+
+
+def xyz_til_radec(x, y, z):
+    """RA [0, 360) og DEC i grader for (relative) vektorer - x, y, z er arrays af vilkårlig (ens)
+    form eller skalarer. NaN for nul-vektorer og NaN komponenter"""
+    x, y, z = (np.asarray(v, dtype=float) for v in (x, y, z))
+    norm = np.sqrt(x**2 + y**2 + z**2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dec = np.degrees(np.arcsin(z / np.where(norm > 0, norm, np.nan)))
+    return np.degrees(np.arctan2(y, x)) % 360, dec
+
+
+def radec_til_xyz(ra, dec, afstand=1.0):
+    """Vektorer (..., 3) i afstand langs RA/DEC (grader) - omvendt af xyz_til_radec"""
+    ra_rad = np.radians(np.asarray(ra, dtype=float))
+    dec_rad = np.radians(np.asarray(dec, dtype=float))
+    afstand = np.asarray(afstand, dtype=float)
+    return np.stack([afstand * np.cos(dec_rad) * np.cos(ra_rad),
+                     afstand * np.cos(dec_rad) * np.sin(ra_rad),
+                     afstand * np.sin(dec_rad)], axis=-1)
+
+
+def satrec_array(tles):
+    """SatrecArray for en liste af (line1, line2)"""
+    return SatrecArray([Satrec.twoline2rv(l1.strip(), l2.strip()) for l1, l2 in tles])
+
+
+def _epoke_chunks(n_sat, n_epoker, chunk_punkter):
+    skridt = max(1, chunk_punkter // max(1, n_sat))
+    for start in range(0, n_epoker, skridt):
+        yield slice(start, min(start + skridt, n_epoker))
+
+
+def _propager_chunks(tles, t, ramme, chunk_punkter):
+    """Generator med (epoke slice, fejl (N, m), r (N, m, 3), v (N, m, 3)) pr. chunk; NaN hvor SGP4 fejler"""
+    if not SGP4_AVAILABLE:
+        raise ImportError("sgp4 er ikke installeret (pip install sgp4)")
+    if ramme not in ('gcrs', 'teme'):
+        raise ValueError(f"Ukendt ramme '{ramme}' (gcrs eller teme)")
+
+    satellitter = satrec_array(tles)
+    for sl in _epoke_chunks(len(tles), len(t), chunk_punkter):
+        jd, fr, R = epoke_data(t[sl])
+        fejl, r, v = satellitter.sgp4(jd, fr)
+        if ramme == 'gcrs':
+            r = np.einsum('ijm,nmj->nmi', R, r)
+            v = np.einsum('ijm,nmj->nmi', R, v)
+        r[fejl != 0] = np.nan
+        v[fejl != 0] = np.nan
+        yield sl, fejl, r, v
+
+
+def propager(tles, datoer, ramme='gcrs', chunk_punkter=DEFAULT_CHUNK_PUNKTER):
+    """Positioner og hastigheder for N TLE'er (liste af (line1, line2)) til M epoker.
+    datoer: datostrenge/datetimes (UTC) eller et Skyfield Time array. ramme: 'gcrs' eller 'teme'.
+    Returnerer r (N, M, 3) km, v (N, M, 3) km/s og SGP4 fejlkoder (N, M) (0 = ok, ellers NaN i r/v)"""
+    t = _som_tid(datoer)
+    n, m = len(tles), len(t)
+    r = np.empty((n, m, 3))
+    v = np.empty((n, m, 3))
+    fejl = np.zeros((n, m), dtype=np.uint8)
+    for sl, fejl_c, r_c, v_c in _propager_chunks(tles, t, ramme, chunk_punkter):
+        r[:, sl], v[:, sl], fejl[:, sl] = r_c, v_c, fejl_c
+    return r, v, fejl
+
+
+def topocentrisk(tles, datoer, lat, lon, ele, med_hastighed=False, chunk_punkter=DEFAULT_CHUNK_PUNKTER):
+    """Topocentrisk retning for N TLE'er til M epoker set fra én lokation (grader, meter).
+    Returnerer dict med arrays (N, M): ra_deg, dec_deg (GCRS/J2000, som .radec()), alt_deg, az_deg
+    (som .altaz(), uden refraktion), afstand_km og fejl. med_hastighed=True tilføjer den relative
+    GCRS hastighed hastighed_km_s (N, M, 3) (som (satellit - observatør).at(t).velocity)"""
+    from skyfield.api import wgs84
+
+    t = _som_tid(datoer)
+    observatør = wgs84.latlon(lat, lon, ele)
+    n, m = len(tles), len(t)
+    ud = {navn: np.empty((n, m)) for navn in ('ra_deg', 'dec_deg', 'alt_deg', 'az_deg', 'afstand_km')}
+    ud['fejl'] = np.zeros((n, m), dtype=np.uint8)
+    if med_hastighed:
+        ud['hastighed_km_s'] = np.empty((n, m, 3))
+
+    for sl, fejl, r, v in _propager_chunks(tles, t, 'gcrs', chunk_punkter):
+        position = observatør.at(t[sl])
+        rel = r - position.position.km.T[None]
+        afstand = np.linalg.norm(rel, axis=2)
+        ud['ra_deg'][:, sl], ud['dec_deg'][:, sl] = xyz_til_radec(rel[..., 0], rel[..., 1], rel[..., 2])
+        # Horisontsystemet: x mod nord, y mod øst, z op (Skyfields altaz rotation)
+        lokal = np.einsum('ijm,nmj->nmi', observatør.rotation_at(t[sl]), rel)
+        ud['alt_deg'][:, sl] = np.degrees(np.arcsin(lokal[..., 2] / afstand))
+        ud['az_deg'][:, sl] = np.degrees(np.arctan2(lokal[..., 1], lokal[..., 0])) % 360
+        ud['afstand_km'][:, sl] = afstand
+        ud['fejl'][:, sl] = fejl
+        if med_hastighed:
+            ud['hastighed_km_s'][:, sl] = v - position.velocity.km_per_s.T[None]
+    return ud
+
+
+def benchmark_propagering(n_sat=200, n_epoker=600):
+    """Motoren mod én EarthSatellite ad gangen (som tle_to_altaz gjorde) for n_sat x n_epoker"""
+    from datetime import datetime, timedelta
+    from skyfield.api import wgs84
+    from Func_Ephemeris import get_satellite, get_timescale
+    from Func_CalculateTLE import calculate_tle_checksum
+
+    # Syntetiske LEO TLE'er med spredte baner (samme epoke)
+    rng = np.random.default_rng(0)
+    tles = []
+    for k in range(n_sat):
+        line1 = f"1 {k + 1:05d}U 24001A   24001.50000000  .00001000  00000-0  10000-3 0  999"
+        line2 = (f"2 {k + 1:05d} {rng.uniform(40, 99):8.4f} {rng.uniform(0, 360):8.4f} "
+                 f"{int(rng.uniform(1, 20) * 1e2):07d} {rng.uniform(0, 360):8.4f} {rng.uniform(0, 360):8.4f} "
+                 f"{rng.uniform(14.2, 15.6):11.8f}    1")
+        tles.append((line1 + str(calculate_tle_checksum(None, line1)), line2 + str(calculate_tle_checksum(None, line2))))
+    start = datetime(2024, 1, 1, 20, 0, 0)
+    datoer = [start + timedelta(seconds=10 * i) for i in range(n_epoker)]
+    lat, lon, ele = 55.7, 12.5, 30.0
+
+    t0 = time.perf_counter()
+    ud = topocentrisk(tles, datoer, lat, lon, ele)
+    t_motor = time.perf_counter() - t0
+
+    ts = get_timescale()
+    observatør = wgs84.latlon(lat, lon, ele)
+    antal = max(1, n_sat // 20)  # Den gamle vej er langsom - mål på et udsnit og skaler
+    t0 = time.perf_counter()
+    alt_gammel = np.empty((antal, n_epoker))
+    for k in range(antal):
+        satellit = get_satellite(*tles[k])
+        for i, dt in enumerate(datoer):
+            t = ts.utc(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second + dt.microsecond / 1e6)
+            alt_gammel[k, i] = (satellit - observatør).at(t).altaz()[0].degrees
+    t_gammel = (time.perf_counter() - t0) * n_sat / antal
+
+    afvigelse = np.nanmax(np.abs(alt_gammel - ud['alt_deg'][:antal])) * 3600
+    print(f"Propagering af {n_sat} TLE'er x {n_epoker} epoker (RA/DEC/Alt/Az):")
+    print(f"  Vektoriseret motor:      {t_motor:8.2f} s")
+    print(f"  Én satellit/epoke ad gangen: {t_gammel:8.2f} s (estimeret fra {antal} TLE'er)")
+    print(f"  Speedup {t_gammel / t_motor:.0f}x, maks. Alt afvigelse {afvigelse:.3f}\"")
+
+
+if __name__ == "__main__":
+    benchmark_propagering(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,199 @@
+"""
+Func_ResultatFormat.py - Typet kolonneformat (Parquet) for analyseresultater
+Ved siden af data_<sat>_<norad>.csv skrives:
+    data_<sat>_<norad>.parquet           kerne kolonner (tider, observatør, detektion, WCS, RA/DEC,
+                                         TLE) med eksplicit skema
+    data_<sat>_<norad>_headers.parquet   resten af FITS headerne som sidetabel (nøgle: filename)
+TLE fanen læser kernefilen når den findes i stedet for at parse hele den brede CSV som tekst.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+HEADER_SUFFIX = '_headers'
+
+# Kerne kolonner og deres type - alt andet havner i header sidetabellen
+KERNE_SKEMA = {
+    'filename': 'string', 'OBSTYPE': 'string', 'OBJECT': 'string', 'NORAD_ID': 'string',
+    'DATE-STA': 'string', 'DATE-OBS': 'string', 'DATE-END': 'string', 'corrected_obs_time': 'string',
+    'JD': 'float64', 'EXPTIME': 'float64',
+    'RA': 'float64', 'DEC': 'float64', 'RA_J2000': 'float64', 'DEC_J200': 'float64', 'CROTA2': 'float64',
+    'LAT-OBS': 'float64', 'LONG-OBS': 'float64', 'ELEV-OBS': 'float64',
+    'X_obs': 'float64', 'Y_obs': 'float64', 'Z_obs': 'float64',
+    'x_sat': 'float64', 'y_sat': 'float64', 'x1': 'float64', 'y1': 'float64', 'x2': 'float64', 'y2': 'float64',
+    'antal_linjer': 'int64', 'x_pred': 'float64', 'y_pred': 'float64', 'roi_used': 'bool',
+    'pixel_sum': 'float64', 'image_median': 'float64', 'image_mean': 'float64', 'roi_median': 'float64',
+    'CRPIX1': 'float64', 'CRPIX2': 'float64', 'CRVAL1': 'float64', 'CRVAL2': 'float64',
+    'CD1_1': 'float64', 'CD1_2': 'float64', 'CD2_1': 'float64', 'CD2_2': 'float64', 'CROTA2_ASTAP': 'float64',
+    'Sat_RA_Behandlet': 'float64', 'Sat_DEC_Behandlet': 'float64',
+    'TLE1': 'string', 'TLE2': 'string', 'error': 'string', 'platesolve_fejl': 'string',
+    # Forhåndsscreening (Func_Forscreening)
+    'screen_stjerner': 'int64', 'screen_baggrund': 'float64', 'screen_sigma': 'float64', 'screen_maettet': 'float64',
+    'screen_kilde_sigma': 'float64', 'screen_streak': 'bool', 'screen_ms': 'float64', 'screen_grund': 'string',
+    # Tilføjes af TLE fanen når en beregnet TLE gemmes
+    'Calculated_TLE_Line1': 'string', 'Calculated_TLE_Line2': 'string', 'TLE_Method': 'string',
+    'TLE_a_km': 'float64', 'TLE_ecc': 'float64', 'TLE_inc_deg': 'float64', 'TLE_raan_deg': 'float64',
+    'TLE_argp_deg': 'float64', 'TLE_nu_deg': 'float64',
+    'TLE_r_x_km': 'float64', 'TLE_r_y_km': 'float64', 'TLE_r_z_km': 'float64',
+    'TLE_v_x_kms': 'float64', 'TLE_v_y_kms': 'float64', 'TLE_v_z_kms': 'float64',
+}
+
+
+def columnar_paths(csv_path):
+    """(kerne, headers) Parquet stier der hører til en resultat CSV"""
+    basis = os.path.splitext(csv_path)[0]
+    return basis + '.parquet', basis + HEADER_SUFFIX + '.parquet'
+
+
+def _arrow_type(type_navn):
+    return {'string': pa.string(), 'float64': pa.float64(), 'int64': pa.int64(), 'bool': pa.bool_()}[type_navn]
+
+
+def _typet_kolonne(series, type_navn):
+    """Konverter en kolonne til skemaets type (ugyldige værdier bliver null)"""
+    if type_navn == 'string':
+        return series.map(lambda v: None if v is None or (isinstance(v, float) and np.isnan(v)) else str(v))
+    if type_navn == 'float64':
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    if type_navn == 'int64':
+        return pd.to_numeric(series, errors='coerce').round().astype('Int64')
+    return series.map({True: True, False: False, 'True': True, 'False': False,
+                       1: True, 0: False}).astype('boolean')
+
+
+def split_result(df):
+    """Del et resultat DataFrame i (kerne med skema, header sidetabel)"""
+    kerne_kolonner = [k for k in KERNE_SKEMA if k in df.columns]
+    kerne = pd.DataFrame({k: _typet_kolonne(df[k], KERNE_SKEMA[k]) for k in kerne_kolonner}, index=df.index)
+
+    header_kolonner = [k for k in df.columns if k not in KERNE_SKEMA]
+    headers = df[['filename'] + header_kolonner].copy() if 'filename' in df.columns else df[header_kolonner].copy()
+    # Blandede header værdier (tal og tekst i samme kolonne) gemmes som tekst
+    for kolonne in header_kolonner:
+        if headers[kolonne].dtype == object:
+            headers[kolonne] = _typet_kolonne(headers[kolonne], 'string')
+    return kerne.reset_index(drop=True), headers.reset_index(drop=True)
+
+
+def write_result(df, csv_path):
+    """Skriv kerne og header sidetabel som Parquet ved siden af CSV'en.
+    Returnerer (kerne sti, headers sti) eller None hvis pyarrow ikke er installeret"""
+    if not PYARROW_AVAILABLE:
+        return None
+    kerne_sti, header_sti = columnar_paths(csv_path)
+    kerne, headers = split_result(df)
+
+    skema = pa.schema([(k, _arrow_type(KERNE_SKEMA[k])) for k in kerne.columns])
+    pq.write_table(pa.Table.from_pandas(kerne, schema=skema, preserve_index=False), kerne_sti)
+    pq.write_table(pa.Table.from_pandas(headers, preserve_index=False), header_sti)
+    return kerne_sti, header_sti
+
+
+def read_core(path, columns=None):
+    """Læs kernefilen (evt. kun udvalgte kolonner) som DataFrame med NaN for manglende tal"""
+    tabel = pq.read_table(path, columns=columns)
+    return tabel.to_pandas()
+
+
+def read_result(path):
+    """Læs en resultatfil - Parquet kerne eller CSV afhængigt af endelsen"""
+    if path.lower().endswith('.parquet'):
+        return read_core(path)
+    return pd.read_csv(path)
+
+
+def find_result_file(directory):
+    """Resultatfil i sessionsmappen: Parquet kernen foretrækkes, ellers data*.csv (None hvis ingen).
+    Kernen bruges kun hvis den ikke er ældre end sin CSV - er CSV'en skrevet igen uden at
+    Parquet filen blev opdateret (fejl eller pyarrow mangler), er kernen forældet"""
+    filer = sorted(os.listdir(directory))
+    csv_filer = [f for f in filer if f.lower().startswith('data') and f.lower().endswith('.csv')]
+    if PYARROW_AVAILABLE:
+        for csv_fil in csv_filer:
+            csv_sti = os.path.join(directory, csv_fil)
+            kerne_sti = columnar_paths(csv_sti)[0]
+            if os.path.exists(kerne_sti) and os.path.getmtime(kerne_sti) >= os.path.getmtime(csv_sti):
+                return kerne_sti
+    return os.path.join(directory, csv_filer[0]) if csv_filer else None
+
+
+def size_summary(csv_path):
+    """Filstørrelser for CSV og Parquet filerne som tekst til loggen"""
+    kerne_sti, header_sti = columnar_paths(csv_path)
+    kb = lambda p: os.path.getsize(p) / 1024 if os.path.exists(p) else 0.0
+    return (f"CSV {kb(csv_path):.0f} kB, Parquet kerne {kb(kerne_sti):.0f} kB "
+            f"+ headers {kb(header_sti):.0f} kB")
+
+
+def _syntetisk_resultat(n_frames, n_header_kolonner, rng):
+    """Bredt resultat som analyze_leapfrog_images laver det: FITS header + detektion + WCS"""
+    start = pd.Timestamp('2024-01-01T18:00:00')
+    data = {
+        'filename': [f"LeapFrog_ISS_25544_{i:06d}_001.fits" for i in range(n_frames)],
+        'OBSTYPE': 'LeapFrog', 'OBJECT': 'ISS (ZARYA)', 'NORAD_ID': '25544',
+        'DATE-OBS': [(start + pd.Timedelta(seconds=5.123456 * i)).strftime('%Y-%m-%dT%H:%M:%S.%f')
+                     for i in range(n_frames)],
+        'TLE1': "1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005",
+        'TLE2': "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.49815228 12345",
+    }
+    for kolonne, type_navn in KERNE_SKEMA.items():
+        if kolonne not in data and type_navn == 'float64' and not kolonne.startswith('TLE_'):
+            data[kolonne] = rng.normal(0, 1000, n_frames)
+    data['antal_linjer'] = rng.integers(0, 3, n_frames)
+    for k in range(n_header_kolonner):
+        data[f'HDR{k:04d}'] = rng.normal(0, 1, n_frames) if k % 3 else [f"tekst {k} {i}" for i in range(n_frames)]
+    return pd.DataFrame(data)
+
+
+def benchmark_resultat_format(n_frames=5000, n_header_kolonner=120, gentagelser=3):
+    """Sammenlign størrelse og indlæsningstid for CSV og Parquet kernen (som TLE fanen læser)"""
+    rng = np.random.default_rng(0)
+    df = _syntetisk_resultat(n_frames, n_header_kolonner, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'data_ISS_25544.csv')
+        df.to_csv(csv_path, index=False)
+        kerne_sti, header_sti = write_result(df, csv_path)
+
+        def tid(funktion):
+            tider = []
+            for _ in range(gentagelser):
+                t0 = time.perf_counter()
+                funktion()
+                tider.append(time.perf_counter() - t0)
+            return min(tider)
+
+        t_csv = tid(lambda: pd.read_csv(csv_path))
+        t_kerne = tid(lambda: read_core(kerne_sti))
+        t_begge = tid(lambda: read_core(kerne_sti).merge(read_core(header_sti), on='filename'))
+        resultat = {
+            'frames': n_frames, 'kolonner': df.shape[1],
+            'csv_kb': os.path.getsize(csv_path) / 1024,
+            'parquet_kerne_kb': os.path.getsize(kerne_sti) / 1024,
+            'parquet_headers_kb': os.path.getsize(header_sti) / 1024,
+            'csv_load_ms': t_csv * 1000, 'kerne_load_ms': t_kerne * 1000, 'kerne_og_headers_load_ms': t_begge * 1000,
+        }
+
+    print(f"Resultatformat, {n_frames} frames x {df.shape[1]} kolonner:")
+    print(f"  CSV                   : {resultat['csv_kb']:8.0f} kB  {resultat['csv_load_ms']:8.1f} ms")
+    print(f"  Parquet kerne         : {resultat['parquet_kerne_kb']:8.0f} kB  {resultat['kerne_load_ms']:8.1f} ms "
+          f"({t_csv / t_kerne:.0f}x hurtigere)")
+    print(f"  Parquet kerne+headers : {resultat['parquet_kerne_kb'] + resultat['parquet_headers_kb']:8.0f} kB  "
+          f"{resultat['kerne_og_headers_load_ms']:8.1f} ms")
+    return resultat
+
+
+if __name__ == "__main__":
+    benchmark_resultat_format(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
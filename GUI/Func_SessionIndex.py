@@ -0,0 +1,122 @@
+"""
+Func_SessionIndex.py - Frame index pr. sessionsmappe
+Hver optagelse (take_picture_with_header, LeapFrog og Tracking løkkerne) tilføjer én række til
+session_index.csv i sessionsmappen med filnavn, tider, mount telemetri, filter og eksponering.
+Analyse, live analyse og billedgennemgang slår op i indexet i stedet for at åbne og parse alle
+FITS headers. Sessioner uden index (ældre data) indekseres én gang fra headerne.
+"""
+
+import os
+import csv
+import threading
+
+import pandas as pd
+
+INDEX_FILNAVN = 'session_index.csv'
+INDEX_KOLONNER = (
+    'filename', 'OBSTYPE', 'OBJECT', 'NORAD_ID',
+    'DATE-STA', 'DATE-OBS', 'DATE-END', 'EXPTIME', 'FILTER',
+    'XBINNING', 'YBINNING', 'NAXIS1', 'NAXIS2',
+    'RA', 'DEC', 'RA_APP', 'DEC_APP', 'ALT_TEL', 'AZ_TEL', 'ROT_ANGLE', 'CROTA2', 'TRACKING', 'SLEWING',
+    'LAT-OBS', 'LONG-OBS', 'ELEV-OBS', 'CCD-TEMP', 'GAIN', 'TLE1', 'TLE2',
+)
+# Kolonner der skal forblive tekst når indexet læses (NORAD ID med foranstillede nuller, TLE linjer)
+TEKST_KOLONNER = ('filename', 'OBSTYPE', 'OBJECT', 'NORAD_ID', 'DATE-STA', 'DATE-OBS', 'DATE-END',
+                  'FILTER', 'TLE1', 'TLE2')
+
+_lock = threading.Lock()
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_FILNAVN)
+
+
+def index_row(filename, header):
+    """Indexrække for én frame ud fra dens header (astropy Header eller dict)"""
+    row = {'filename': filename}
+    for noegle in INDEX_KOLONNER[1:]:
+        værdi = header.get(noegle, '')
+        row[noegle] = '' if værdi is None else værdi
+    return row
+
+
+def _skriv_raekker(directory, rows):
+    path = index_path(directory)
+    with _lock:
+        ny = not os.path.exists(path)
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=INDEX_KOLONNER, extrasaction='ignore')
+            if ny:
+                writer.writeheader()
+            writer.writerows(rows)
+
+
+def append_frame(filepath, header):
+    """Tilføj en netop gemt frame til sessionens index (kaldes lige efter hdu.writeto med hdu.header,
+    så NAXIS1/2 er udfyldt)"""
+    directory, filename = os.path.split(os.path.abspath(filepath))
+    _skriv_raekker(directory, [index_row(filename, header)])
+
+
+def read_index(directory):
+    """Indexet som DataFrame (seneste række pr. fil) eller None hvis sessionen ikke har et"""
+    path = index_path(directory)
+    if not os.path.exists(path):
+        return None
+    with _lock:
+        df = pd.read_csv(path, dtype={k: str for k in TEKST_KOLONNER}, keep_default_na=False,
+                         na_values={k: [''] for k in INDEX_KOLONNER if k not in TEKST_KOLONNER})
+    return df.drop_duplicates('filename', keep='last')
+
+
+def load_index(directory, fits_files=None):
+    """Index med én række pr. FITS fil i mappen, sorteret efter filnavn.
+    Filer der mangler i indexet (ældre sessioner, manuelt kopierede filer) læses fra deres header
+    én gang og tilføjes indexet; slettede filer udelades."""
+    if fits_files is None:
+        fits_files = sorted(f for f in os.listdir(directory) if f.lower().endswith('.fits'))
+
+    df = read_index(directory)
+    kendte = set(df['filename']) if df is not None else set()
+    mangler = [f for f in fits_files if f not in kendte]
+
+    if mangler:
+        from astropy.io import fits
+        rows = [index_row(filename, fits.getheader(os.path.join(directory, filename))) for filename in mangler]
+        try:
+            _skriv_raekker(directory, rows)
+            df = read_index(directory)
+        except OSError:
+            # Skrivebeskyttet mappe - brug rækkerne uden at gemme dem
+            nye = pd.DataFrame(rows, columns=INDEX_KOLONNER)
+            df = nye if df is None else pd.concat([df, nye], ignore_index=True)
+
+    df = df[df['filename'].isin(fits_files)]
+    return df.sort_values('filename').reset_index(drop=True)
+
+
+def frame_header(directory, filename):
+    """Headerværdier for én frame - fra indexet hvis den er indekseret, ellers fra FITS filen"""
+    df = read_index(directory)
+    if df is not None:
+        rows = df[df['filename'] == filename]
+        if len(rows):
+            return {k: v for k, v in rows.iloc[-1].items() if not (isinstance(v, float) and pd.isna(v))}
+    from astropy.io import fits
+    return fits.getheader(os.path.join(directory, filename))
+
+
+def remove_frame(directory, filename):
+    """Fjern en slettet frame fra indexet"""
+    path = index_path(directory)
+    if not os.path.exists(path):
+        return
+    with _lock:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            rows = [row for row in csv.DictReader(f) if row.get('filename') != filename]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=INDEX_KOLONNER, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
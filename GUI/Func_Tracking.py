@@ -11,6 +11,8 @@ import requests
 import threading
 from datetime import datetime, timedelta
 
+from Func_SessionIndex import append_frame
+
 # Check for optional dependencies
 try:
     from pwi4_client import PWI4Client
@@ -516,6 +518,7 @@ def run_tracking_observation(self):
     from astropy.io import fits
     from Func_KameraInstillinger import optimized_camera_exposure_with_timing
     
+    live_watcher = None
     try:
         self.tracking_log_message("Starter tracking observation...")
         
@@ -633,6 +636,11 @@ def run_tracking_observation(self):
                 except Exception as dir_error:
                     self.tracking_log_message(f"Kunne ikke oprette mappe {output_dir}: {str(dir_error)}")
                     output_dir = "."  # Brug nuværende mappe som fallback
+                
+                # Live analyse af nye billeder mens observationen kører (hvis slået til)
+                live_watcher = self.start_live_analyse(output_dir)
+                if live_watcher is not None:
+                    self.tracking_log_message("Live billede analyse startet for sessionen")
             
             self.tracking_log_message(f"Tager billede {i+1}/{num_images}")
             
@@ -713,6 +721,10 @@ def run_tracking_observation(self):
                     star_img_data_uint16 = star_img_data.astype(np.uint16)
                     hdu = fits.PrimaryHDU(data=star_img_data_uint16, header=star_hdr)
                     hdu.writeto(star_filepath, overwrite=True)
+                    try:
+                        append_frame(star_filepath, hdu.header)
+                    except Exception as e:
+                        self.tracking_log_message(f"Session index ikke opdateret: {str(e)}")
                     
                     self.tracking_log_message(f"Stjernehimmel referencebillede gemt: {star_filename}")
                     
@@ -803,6 +815,10 @@ def run_tracking_observation(self):
                 img_data_uint16 = img_data.astype(np.uint16)
                 hdu = fits.PrimaryHDU(data=img_data_uint16, header=hdr)
                 hdu.writeto(filepath, overwrite=True)
+                try:
+                    append_frame(filepath, hdu.header)
+                except Exception as e:
+                    self.tracking_log_message(f"Session index ikke opdateret: {str(e)}")
                 
                 self.tracking_log_message(f"Billede gemt: {filename}")
                 
@@ -838,5 +854,6 @@ def run_tracking_observation(self):
         self.tracking_running = False
         self.start_tracking_btn.config(state='normal')
         self.stop_tracking_btn.config(state='disabled')
+        self.stop_live_analyse(live_watcher)
         pwi4.park()
         self.tracking_log_message("Tracking session afsluttet")
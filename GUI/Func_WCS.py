@@ -0,0 +1,229 @@
+"""
+Func_WCS.py - Vektoriseret pixel <-> RA/DEC konvertering
+Konverterer N detektioner fordelt på M frames i ét kald ud fra en stablet WCS tabel
+(én række pr. frame, fx DataFrame'en fra run_astap_on_directory).
+Gnomonisk (TAN) projektion som pixel_to_radec, plus SIP A/B (og AP/BP) polynomier
+når ASTAP leverer dem
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+WCS_NOEGLER = ('CRPIX1', 'CRPIX2', 'CRVAL1', 'CRVAL2', 'CD1_1', 'CD1_2', 'CD2_1', 'CD2_2')
+
+# Antal fikspunkts-iterationer når SIP skal inverteres uden AP/BP koefficienter
+SIP_INVERS_ITERATIONER = 20
+
+
+def sip_koefficienter(header_row, prefix):
+    """Hent SIP koefficienter for prefix ('A', 'B', 'AP' eller 'BP') som {(p, q): værdi}.
+    Returnerer tom dict hvis rækken ikke har den pågældende SIP orden."""
+    orden = header_row.get(f'{prefix}_ORDER', None)
+    if orden is None or pd.isna(orden):
+        return {}
+    orden = int(orden)
+    koefficienter = {}
+    for p in range(orden + 1):
+        for q in range(orden + 1 - p):
+            værdi = header_row.get(f'{prefix}_{p}_{q}', None)
+            if værdi is not None and not pd.isna(værdi) and værdi != 0:
+                koefficienter[(p, q)] = float(værdi)
+    return koefficienter
+
+
+def sip_korrektion(u, v, header_row, a_prefix='A', b_prefix='B'):
+    """Anvend SIP polynomier på pixel offset (u, v) relativt til CRPIX.
+    Virker på både skalarer og arrays; uden SIP i headeren returneres (u, v) uændret."""
+    a = sip_koefficienter(header_row, a_prefix)
+    b = sip_koefficienter(header_row, b_prefix)
+    U = u + sum(c * u**p * v**q for (p, q), c in a.items())
+    V = v + sum(c * u**p * v**q for (p, q), c in b.items())
+    return U, V
+
+
+class WCSTabel:
+    """Stablet WCS for M frames som numpy arrays (én værdi pr. frame).
+    SIP koefficienter gemmes som {(p, q): array(M)} pr. prefix - frames uden SIP har 0."""
+
+    def __init__(self, wcs_table):
+        if isinstance(wcs_table, pd.DataFrame):
+            rows = [row for _, row in wcs_table.iterrows()]
+        elif isinstance(wcs_table, (dict, pd.Series)):
+            rows = [wcs_table]
+        else:
+            rows = list(wcs_table)
+        if not rows:
+            raise ValueError("WCS tabellen er tom")
+
+        self.n_frames = len(rows)
+        for noegle in WCS_NOEGLER:
+            setattr(self, noegle.lower().replace('_', ''),
+                    np.array([float(row[noegle]) for row in rows]))
+
+        self.sip = {}
+        for prefix in ('A', 'B', 'AP', 'BP'):
+            per_frame = [sip_koefficienter(row, prefix) for row in rows]
+            termer = sorted({pq for koef in per_frame for pq in koef})
+            self.sip[prefix] = {pq: np.array([koef.get(pq, 0.0) for koef in per_frame]) for pq in termer}
+
+        # Invers CD matrix pr. frame til radec_to_pixel
+        det = self.cd11 * self.cd22 - self.cd12 * self.cd21
+        self.icd11, self.icd12 = self.cd22 / det, -self.cd12 / det
+        self.icd21, self.icd22 = -self.cd21 / det, self.cd11 / det
+
+    def frame_index(self, n_points, frame_index):
+        """Afgør hvilken frame hvert punkt hører til"""
+        if frame_index is not None:
+            frame_index = np.asarray(frame_index, dtype=np.intp)
+            if frame_index.shape != (n_points,):
+                raise ValueError("frame_index skal have én værdi pr. punkt")
+            return frame_index
+        if self.n_frames == 1:
+            return np.zeros(n_points, dtype=np.intp)
+        if self.n_frames == n_points:
+            return np.arange(n_points, dtype=np.intp)
+        raise ValueError("frame_index påkrævet når antal punkter og antal frames er forskellige")
+
+    def polynomium(self, prefix, u, v, idx):
+        """Σ c_pq[frame] * u^p * v^q for alle termer i SIP prefix"""
+        resultat = np.zeros_like(u)
+        for (p, q), c in self.sip[prefix].items():
+            resultat += c[idx] * u**p * v**q
+        return resultat
+
+
+def _som_wcs_tabel(wcs_table):
+    return wcs_table if isinstance(wcs_table, WCSTabel) else WCSTabel(wcs_table)
+
+
+def pixel_to_radec_batch(x, y, wcs_table, frame_index=None):
+    """
+    Vektoriseret pixel -> RA/DEC for N punkter fordelt på M frames.
+
+    Parameters:
+    x, y (array): pixelpositioner (samme konvention som pixel_to_radec / CRPIX)
+    wcs_table: DataFrame/liste af header rækker (én pr. frame), én header eller en WCSTabel
+    frame_index (array, valgfri): frame (række i wcs_table) for hvert punkt. Kan udelades
+        hvis der kun er én frame eller præcis ét punkt pr. frame
+
+    Returns:
+    (ra, dec): arrays i grader
+    """
+    wcs = _som_wcs_tabel(wcs_table)
+    x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_1d(np.asarray(y, dtype=np.float64))
+    idx = wcs.frame_index(x.size, frame_index)
+
+    # Pixel offset og SIP forvrængning
+    u = x - wcs.crpix1[idx]
+    v = y - wcs.crpix2[idx]
+    U = u + wcs.polynomium('A', u, v, idx)
+    V = v + wcs.polynomium('B', u, v, idx)
+
+    # CD matrix til standard koordinater (grader -> radianer)
+    xi = np.radians(wcs.cd11[idx] * U + wcs.cd12[idx] * V)
+    eta = np.radians(wcs.cd21[idx] * U + wcs.cd22[idx] * V)
+
+    alpha0 = np.radians(wcs.crval1)[idx]
+    delta0 = np.radians(wcs.crval2)[idx]
+    sin_delta0 = np.sin(delta0)
+    cos_delta0 = np.cos(delta0)
+
+    delta = cos_delta0 - eta * sin_delta0
+    ra = np.degrees(alpha0 + np.arctan2(xi, delta))
+    dec = np.degrees(np.arctan((sin_delta0 + eta * cos_delta0) / np.hypot(xi, delta)))
+    return ra, dec
+
+
+def radec_to_pixel_batch(ra, dec, wcs_table, frame_index=None):
+    """
+    Vektoriseret RA/DEC -> pixel (invers af pixel_to_radec_batch).
+    Bruger AP/BP polynomier hvis headeren har dem, ellers inverteres A/B iterativt.
+
+    Returns:
+    (x, y): arrays med pixelpositioner
+    """
+    wcs = _som_wcs_tabel(wcs_table)
+    ra = np.atleast_1d(np.asarray(ra, dtype=np.float64))
+    dec = np.atleast_1d(np.asarray(dec, dtype=np.float64))
+    idx = wcs.frame_index(ra.size, frame_index)
+
+    # Gnomonisk projektion til standard koordinater (ξ, η)
+    alpha0 = np.radians(wcs.crval1)[idx]
+    delta0 = np.radians(wcs.crval2)[idx]
+    alpha = np.radians(ra)
+    delta = np.radians(dec)
+    d_alpha = alpha - alpha0
+    cos_c = np.sin(delta0) * np.sin(delta) + np.cos(delta0) * np.cos(delta) * np.cos(d_alpha)
+    xi = np.degrees(np.cos(delta) * np.sin(d_alpha) / cos_c)
+    eta = np.degrees((np.cos(delta0) * np.sin(delta) - np.sin(delta0) * np.cos(delta) * np.cos(d_alpha)) / cos_c)
+
+    # Invers CD matrix til forvrængede pixel offsets (U, V)
+    U = wcs.icd11[idx] * xi + wcs.icd12[idx] * eta
+    V = wcs.icd21[idx] * xi + wcs.icd22[idx] * eta
+
+    if wcs.sip['AP'] or wcs.sip['BP']:
+        u = U + wcs.polynomium('AP', U, V, idx)
+        v = V + wcs.polynomium('BP', U, V, idx)
+    elif wcs.sip['A'] or wcs.sip['B']:
+        # Fikspunkts-iteration: u = U - A(u, v), v = V - B(u, v)
+        u, v = U.copy(), V.copy()
+        for _ in range(SIP_INVERS_ITERATIONER):
+            u = U - wcs.polynomium('A', u, v, idx)
+            v = V - wcs.polynomium('B', u, v, idx)
+    else:
+        u, v = U, V
+
+    return u + wcs.crpix1[idx], v + wcs.crpix2[idx]
+
+
+def benchmark_pixel_to_radec(n_points=10**6, n_frames=100):
+    """Sammenlign skalar pixel_to_radec (ét kald pr. punkt) med pixel_to_radec_batch
+    på syntetiske ASTAP headers med SIP, og tjek rundturen via radec_to_pixel_batch"""
+    from Func_fagprojekt import pixel_to_radec
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(n_frames):
+        theta = np.radians(rng.uniform(0, 360))
+        skala = 0.22 / 3600 * 4
+        rows.append({
+            'CRPIX1': 2048.5, 'CRPIX2': 2048.5,
+            'CRVAL1': rng.uniform(0, 360), 'CRVAL2': rng.uniform(-60, 80),
+            'CD1_1': -skala * np.cos(theta), 'CD1_2': skala * np.sin(theta),
+            'CD2_1': skala * np.sin(theta), 'CD2_2': skala * np.cos(theta),
+            'A_ORDER': 2, 'A_2_0': 2e-7, 'A_1_1': -1e-7, 'A_0_2': 5e-8,
+            'B_ORDER': 2, 'B_2_0': -6e-8, 'B_1_1': 1.5e-7, 'B_0_2': 1e-7,
+        })
+    wcs_table = pd.DataFrame(rows)
+
+    x = rng.uniform(0, 4096, n_points)
+    y = rng.uniform(0, 4096, n_points)
+    frame_index = rng.integers(0, n_frames, n_points)
+
+    t0 = time.perf_counter()
+    ra_batch, dec_batch = pixel_to_radec_batch(x, y, wcs_table, frame_index)
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ra_skalar = np.empty(n_points)
+    dec_skalar = np.empty(n_points)
+    for i in range(n_points):
+        ra_skalar[i], dec_skalar[i] = pixel_to_radec(x[i], y[i], rows[frame_index[i]])
+    t_skalar = time.perf_counter() - t0
+
+    x_tilbage, y_tilbage = radec_to_pixel_batch(ra_batch, dec_batch, wcs_table, frame_index)
+
+    print(f"pixel_to_radec for {n_points:,} punkter på {n_frames} frames:")
+    print(f"  skalar : {t_skalar:8.2f} s")
+    print(f"  batch  : {t_batch:8.3f} s  ({t_skalar / t_batch:.0f}x hurtigere)")
+    print(f"  max afvigelse batch/skalar: {np.max(np.abs(ra_batch - ra_skalar)) * 3600:.2e} arcsec RA, "
+          f"{np.max(np.abs(dec_batch - dec_skalar)) * 3600:.2e} arcsec DEC")
+    print(f"  max rundtur fejl radec_to_pixel: {max(np.max(np.abs(x_tilbage - x)), np.max(np.abs(y_tilbage - y))):.2e} px")
+    return t_skalar, t_batch
+
+
+if __name__ == "__main__":
+    benchmark_pixel_to_radec(int(sys.argv[1]) if len(sys.argv) > 1 else 10**6)
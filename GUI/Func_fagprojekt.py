@@ -4,14 +4,16 @@ import os
 import matplotlib.pyplot as plt
 import cv2
 from astropy.io import fits
-from skyfield.api import load, EarthSatellite, wgs84
 from datetime import datetime
-from scipy.ndimage import rotate, label, find_objects
+from scipy.ndimage import rotate, label
 from tqdm import tqdm
 from matplotlib.patches import Circle
 import requests
 import time
-import subprocess
+from Func_FitsLoader import read_frame
+from Func_Ephemeris import get_timescale, get_ephemeris, get_satellite, utc_time_array, observer_positions_km
+from Func_Propagering import propager, topocentrisk, radec_til_xyz
+from Func_Detektion import find_brightest_object, neighbourhood_mask, top_pixel_positions, slice_center
 
 def beregn_sat_pos(theta, Ra, Dec, pixscale, sizex, sizey, posx, posy):
     import numpy as np
@@ -147,7 +149,7 @@ def udregn_R_og_TLE(angles, times, r,):
 
 def beregn_observatørpositioner(df):
     from datetime import datetime
-    from skyfield.api import load, wgs84
+    from skyfield.api import wgs84
     import numpy as np
     """
     Beregner observatørens position i ECI-koordinater ud fra dato og geografiske data.
@@ -170,7 +172,7 @@ def beregn_observatørpositioner(df):
         return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
 
     # Initialisering
-    ts = load.timescale()
+    ts = get_timescale()
     
     observation_points = []
 
@@ -204,8 +206,8 @@ def process_and_save_coordinates_leapfrog(directory, rotation_angle=0, plot=True
         filepath = os.path.join(directory, filename)
         print(f"Behandler fil: {filename}")
 
-        with fits.open(filepath) as hdul:
-            image_data = hdul[0].data
+        # Én skrivbar kopi i native dtype - billedbehandlingen nedenfor ændrer pixels in-place
+        image_data = np.array(read_frame(filepath)[0])
 
         # Billedbehandling
         mean = np.mean(image_data)
@@ -252,14 +254,11 @@ def process_and_save_coordinates_leapfrog(directory, rotation_angle=0, plot=True
 
             obs_time = datetime.strptime(tidsstempel_start, '%Y-%m-%dT%H:%M:%S.%f')
             obs_time_slut = datetime.strptime(tidsstempel_slut, '%Y-%m-%dT%H:%M:%S.%f')
-            ts = load.timescale()
+            ts = get_timescale()
             t = ts.utc(obs_time.year, obs_time.month, obs_time.day, obs_time.hour, obs_time.minute, obs_time.second)
 
-            satellite = EarthSatellite(TLE_Line1, TLE_Line2, name='sat', ts=ts)
-            observer = wgs84.latlon(Latitude, Longitude, Elevation)
-            difference = satellite - observer
-            topocentric = difference.at(t)
-            enu_velocity = topocentric.velocity.km_per_s
+            topocentric = topocentrisk([(TLE_Line1, TLE_Line2)], t, Latitude, Longitude, Elevation, med_hastighed=True)
+            enu_velocity = topocentric['hastighed_km_s'][0, 0]
             east_velocity = enu_velocity[0]
 
             if east_velocity > 0:
@@ -438,42 +437,15 @@ def find_sat_tracking(directory, rotation_angles=None, pixscale=0.22, plot_resul
         file_path = os.path.join(directory, fits_file)
         rotation_angle = rotation_angles[i]
 
-        with fits.open(file_path) as hdul:
-            data = np.asanyarray(hdul[0].data, dtype=np.float32)
+        # Read-only memmap view i native dtype - kun rotation kræver en float32 kopi
+        data, _ = read_frame(file_path)
 
         if rotation_angle != 0:
-            data = rotate(data, rotation_angle, reshape=False, order=1)
-
-        num_top_pixels = 1000
-        flat_indices = np.argpartition(data.ravel(), -num_top_pixels)[-num_top_pixels:]
-        sorted_indices = flat_indices[np.argsort(data.ravel()[flat_indices])[::-1]]
-        sorted_positions = np.unravel_index(sorted_indices, data.shape)
-
-        neighbor_radius = 80
-        mask = np.zeros_like(data, dtype=bool)
-
-        for y, x in zip(sorted_positions[0], sorted_positions[1]):
-            y_start = max(0, y - neighbor_radius)
-            y_end = min(data.shape[0], y + neighbor_radius + 1)
-            x_start = max(0, x - neighbor_radius)
-            x_end = min(data.shape[1], x + neighbor_radius + 1)
-            mask[y_start:y_end, x_start:x_end] = True
-
-        thresholded_data = mask & (data > np.mean(data) + 0.75 * np.std(data))
-        labeled_array, num_features = label(thresholded_data)
-        object_slices = find_objects(labeled_array)
-
-        brightest_object_slice = None
-        max_val = -np.inf
-
-        for slice_ in object_slices:
-            region = data[slice_]
-            if region.shape[0] >= 20 and region.shape[1] >= 20:
-                region_mean = np.mean(region)
-                if region_mean > max_val:
-                    max_val = region_mean
-                    brightest_object_slice = slice_
-                    brightest_object_index = i
+            data = rotate(data.astype(np.float32), rotation_angle, reshape=False, order=1)
+
+        # Lyseste objekt omkring de 1000 lyseste pixels - kun udsnit af billedet (Func_Detektion)
+        threshold = np.mean(data) + 0.75 * np.std(data)
+        brightest_object_slice = find_brightest_object(data, threshold)
 
         if brightest_object_slice is None:
             print(f"Ingen gyldig region fundet i {fits_file}")
@@ -481,10 +453,7 @@ def find_sat_tracking(directory, rotation_angles=None, pixscale=0.22, plot_resul
             delta_DEC_list.append(np.nan)
             continue
 
-        y_start, y_stop = brightest_object_slice[0].start, brightest_object_slice[0].stop
-        x_start, x_stop = brightest_object_slice[1].start, brightest_object_slice[1].stop
-        y_center = (y_start + y_stop - 1) // 2
-        x_center = (x_start + x_stop - 1) // 2
+        x_center, y_center = slice_center(brightest_object_slice)
 
         y_mid = data.shape[0] // 2
         x_mid = data.shape[1] // 2
@@ -499,6 +468,11 @@ def find_sat_tracking(directory, rotation_angles=None, pixscale=0.22, plot_resul
         delta_DEC_list.append(delta_DEC)
 
         if plot_result:
+            # Fuld-frame maske og labels kun til overlays
+            mask = neighbourhood_mask(data.shape, *top_pixel_positions(data))
+            labeled_array, num_features = label(mask & (data > threshold))
+            brightest_object_index = i
+
             valid_pixels = data[data > 0]
             vmin = np.percentile(valid_pixels, 5)
             vmax = np.percentile(valid_pixels, 99)
@@ -561,39 +535,12 @@ def find_sat_tracking_xy(directory, plot_result=False):
     for i, fits_file in enumerate(tqdm(fits_files, desc="Processing FITS files", unit="file")):
         file_path = os.path.join(directory, fits_file)
 
-        with fits.open(file_path) as hdul:
-            data = np.asanyarray(hdul[0].data, dtype=np.float32)
-
-        num_top_pixels = 1000
-        flat_indices = np.argpartition(data.ravel(), -num_top_pixels)[-num_top_pixels:]
-        sorted_indices = flat_indices[np.argsort(data.ravel()[flat_indices])[::-1]]
-        sorted_positions = np.unravel_index(sorted_indices, data.shape)
-
-        neighbor_radius = 80
-        mask = np.zeros_like(data, dtype=bool)
-
-        for y, x in zip(sorted_positions[0], sorted_positions[1]):
-            y_start = max(0, y - neighbor_radius)
-            y_end = min(data.shape[0], y + neighbor_radius + 1)
-            x_start = max(0, x - neighbor_radius)
-            x_end = min(data.shape[1], x + neighbor_radius + 1)
-            mask[y_start:y_end, x_start:x_end] = True
-
-        thresholded_data = mask & (data > np.mean(data) + 0.75 * np.std(data))
-        labeled_array, num_features = label(thresholded_data)
-        object_slices = find_objects(labeled_array)
+        # Read-only memmap view i native dtype
+        data, _ = read_frame(file_path)
 
-        brightest_object_slice = None
-        max_val = -np.inf
-
-        for slice_ in object_slices:
-            region = data[slice_]
-            if region.shape[0] >= 20 and region.shape[1] >= 20:
-                region_mean = np.mean(region)
-                if region_mean > max_val:
-                    max_val = region_mean
-                    brightest_object_slice = slice_
-                    brightest_object_index = i
+        # Lyseste objekt omkring de 1000 lyseste pixels - kun udsnit af billedet (Func_Detektion)
+        threshold = np.mean(data) + 0.75 * np.std(data)
+        brightest_object_slice = find_brightest_object(data, threshold)
 
         if brightest_object_slice is None:
             print(f"Ingen gyldig region fundet i {fits_file}")
@@ -601,15 +548,17 @@ def find_sat_tracking_xy(directory, plot_result=False):
             y_list.append(np.nan)
             continue
 
-        y_start, y_stop = brightest_object_slice[0].start, brightest_object_slice[0].stop
-        x_start, x_stop = brightest_object_slice[1].start, brightest_object_slice[1].stop
-        y_center = (y_start + y_stop - 1) // 2
-        x_center = (x_start + x_stop - 1) // 2
+        x_center, y_center = slice_center(brightest_object_slice)
 
         x_list.append(x_center)
         y_list.append(y_center)
 
         if plot_result:
+            # Fuld-frame maske og labels kun til overlays
+            mask = neighbourhood_mask(data.shape, *top_pixel_positions(data))
+            labeled_array, num_features = label(mask & (data > threshold))
+            brightest_object_index = i
+
             valid_pixels = data[data > 0]
             vmin = np.percentile(valid_pixels, 5)
             vmax = np.percentile(valid_pixels, 99)
@@ -1155,106 +1104,60 @@ def medregn_pixelforskydning_teleskob(df_coordinates, df_internet, df_local):
 
 
 def calculate_satellite_data(df_local, tle_line1, tle_line2):
-    from datetime import datetime
-    from skyfield.api import load, EarthSatellite, wgs84
-    from numpy import arccos, degrees
-    import numpy as np
-
-    # Initialiser lister
-    vinkel_sol_jord = []
-    afstand_sat_observator = []
-    satellite_positions = []
-    earth_positions = []
-    observation_points = []
-
-    # Konverter dato-streng til tuple
-
-    def convert_to_tuple(date_str):
-        try:
-            # Først prøv med mikrosekunder
-            dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S.%f")
-        except ValueError:
-            # Hvis det fejler, prøv med T-format
-            dt = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%f")
-
-        return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
-
-
-    # Anvend funktionen på kolonnen "DATE-OBS"
-    df_local["DATE-OBS-Tuple"] = df_local["DATE-OBS"].apply(convert_to_tuple)
+    """
+    Beregn satellit-, jord- og observatørpositioner for alle rækker i df_local på én gang.
+    Tidspunkterne (DATE-OBS, afkortet til hele sekunder som hidtil) samles i ét Skyfield
+    Time array, så satellit, sol og observatør hver propageres med ét kald.
 
-    # Beregn vinkel mellem to vektorer
-    def angle_between(v1, v2):
-        dot_product = np.dot(v1, v2)
-        norm_product = np.linalg.norm(v1) * np.linalg.norm(v2)
-        return degrees(arccos(dot_product / norm_product))
+    Returns:
+    afstand (N,), vinkel_sol_jord (N,), satellite_positions (N, 3), earth_positions (N, 3),
+    observation_points (N, 3) - alle i km/grader som NumPy arrays
+    """
+    lat_col = "LAT--OBS" if "LAT--OBS" in df_local.columns else "LAT-OBS"
 
     # Indlæs efemerider for Solen og Jorden
-    ts = load.timescale()
-    planets = load('de421.bsp')
+    planets = get_ephemeris()
     sun = planets['sun']
     earth = planets['earth']
 
-    # Opret satellitobjekt
-    satellite = EarthSatellite(tle_line1, tle_line2, 'Satellite', ts)
-
-    # Beregn data for hver række i df_local
-    for n, date_tuple in enumerate(df_local["DATE-OBS-Tuple"]):
-        t = ts.utc(*date_tuple)
-
-        # Satellittens position i ECI (km)
-        sat_pos = satellite.at(t).position.km
+    # Alle tidspunkter som ét Time array
+    t = utc_time_array(df_local["DATE-OBS"], hele_sekunder=True)
 
-        # Solens position i ECI (km)
-        sun_pos = sun.at(t).position.km
+    # Satellittens og Solens position i ECI (km), form (N, 3)
+    sat_pos = propager([(tle_line1, tle_line2)], t)[0][0]
+    sun_pos = sun.at(t).position.km.T
 
-        # Jordposition givet ved latitude og longitude
-        lat_col = "LAT--OBS" if "LAT--OBS" in df_local.columns else "LAT-OBS"
-        lat, lon, ele = df_local[lat_col][n], df_local["LONG-OBS"][n], df_local["ELEV-OBS"][n]
-        earth_location = wgs84.latlon(lat, lon, ele)
-        earth_pos_ecef = earth_location.at(t).position.km
+    # Observatørens position og Jorden som reference relativt til stjernerne
+    earth_pos_ecef = observer_positions_km(t, df_local[lat_col].to_numpy(), df_local["LONG-OBS"].to_numpy(),
+                                           df_local["ELEV-OBS"].to_numpy()).T
+    earth_eci = earth.at(t).observe(earth).position.km.T
+    earth_pos_eci = earth_pos_ecef + earth_eci
 
-        # Brug Jorden som reference og find positionen relativt til stjernerne
-        earth_eci = earth.at(t).observe(earth).position.km
-        earth_pos_eci = earth_pos_ecef + earth_eci
+    # Vinkel mellem Jordpositionen og Solen set fra satellitten
+    v1 = earth_pos_eci - sat_pos
+    v2 = sun_pos - sat_pos
+    cos_vinkel = np.einsum('ij,ij->i', v1, v2) / (np.linalg.norm(v1, axis=1) * np.linalg.norm(v2, axis=1))
+    vinkel_sol_jord = np.degrees(np.arccos(cos_vinkel))
 
-        # Beregn vinkel mellem Jordpositionen og Solen set fra satellitten
-        angle = angle_between(earth_pos_eci - sat_pos, sun_pos - sat_pos)
-        vinkel_sol_jord.append(angle)
+    # Afstanden mellem satellitten og observatøren
+    afstand_sat_observator = np.linalg.norm(sat_pos - earth_pos_eci, axis=1)
 
-        # Beregn afstanden mellem satellitten og observatøren
-        distance = np.linalg.norm(sat_pos - earth_pos_eci)
-        afstand_sat_observator.append(distance)
-
-        # Gem positioner
-        satellite_positions.append(sat_pos)
-        earth_positions.append(earth_eci)
-        observation_points.append(earth_pos_eci)
-
-    # Returner resultaterne
-    return np.array(afstand_sat_observator), np.array(vinkel_sol_jord), satellite_positions, earth_positions, observation_points
+    return afstand_sat_observator, vinkel_sol_jord, sat_pos, earth_eci, earth_pos_eci
 
 def ra_dec_to_eci(ra, dec, distance):
     """
     Konverterer RA, Dec og afstand til ECI-koordinater.
 
     Parameters:
-    ra (float): Right Ascension (RA) i grader.
-    dec (float): Declination (Dec) i grader.
-    distance (float): Afstanden til satellitten (i km eller m).
+    ra (float eller array): Right Ascension (RA) i grader.
+    dec (float eller array): Declination (Dec) i grader.
+    distance (float eller array): Afstanden til satellitten (i km eller m).
 
     Returns:
-    tuple: Satellittens position i ECI-koordinater (x, y, z).
+    tuple: Satellittens position i ECI-koordinater (x, y, z) - arrays hvis input er arrays.
     """
-    # Konverter RA og Dec fra grader til radianer
-    ra_rad = np.radians(ra)
-    dec_rad = np.radians(dec)
-
-    # Beregn ECI-koordinater # Se afsnit 2.2
-    x = distance * np.cos(dec_rad) * np.cos(ra_rad)
-    y = distance * np.cos(dec_rad) * np.sin(ra_rad)
-    z = distance * np.sin(dec_rad)
-
+    # Se afsnit 2.2
+    x, y, z = np.moveaxis(radec_til_xyz(ra, dec, distance), -1, 0)
     return x, y, z
 
 
@@ -1462,121 +1365,55 @@ def gem_astrometrisk_analyse(directory):
 
 
 def calculate_satellite_data_radar(df_behandlet, tle_line1, tle_line2):
-    from datetime import datetime
-    from skyfield.api import load, EarthSatellite, wgs84
-    from numpy import arccos, degrees
-    import numpy as np
-
-    # Initialiser lister
-    vinkel_sol_jord = []
-    afstand_sat_observator = []
-    satellite_positions = []
-    earth_positions = []
-    observation_points = []
-
-    # Konverter dato-streng til tuple
-
-    def convert_to_tuple(date_str):
-        for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
-            try:
-                dt = datetime.strptime(date_str, fmt)
-                return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
-            except ValueError:
-                continue
-        # Hvis intet virker, kast en fejl
-        raise ValueError(f"Ukendt datoformat: {date_str}")
-  
-    # Anvend funktionen på kolonnen "DATE-BEG"
-    df_behandlet["DATE-BEG-Tuple"] = df_behandlet["Datetime"].apply(convert_to_tuple)
-
-    # Indlæs efemerider for Solen og Jorden
-    ts = load.timescale()
-    planets = load('de421.bsp')
+    """Som calculate_satellite_data for radar data (kolonnerne Datetime, Lat, Lon, Alt) - uden solvinkel"""
+    # Indlæs efemerider for Jorden
+    planets = get_ephemeris()
     earth = planets['earth']
 
-    # Opret satellitobjekt
-    satellite = EarthSatellite(tle_line1, tle_line2, 'Satellite', ts)
-
-    # Beregn data for hver række i df_local
-    for n, date_tuple in enumerate(df_behandlet["DATE-BEG-Tuple"]):
-        t = ts.utc(*date_tuple)
-
-        # Satellittens position i ECI (km)
-        sat_pos = satellite.at(t).position.km
-
-        # Jordposition givet ved latitude og longitude
-        lat, lon, ele = df_behandlet['Lat'][n], df_behandlet['Lon'][n], df_behandlet['Alt'][n]
-        earth_location = wgs84.latlon(lat, lon, ele)
-        earth_pos_ecef = earth_location.at(t).position.km
+    # Alle tidspunkter som ét Time array (hele sekunder som hidtil)
+    t = utc_time_array(df_behandlet["Datetime"], hele_sekunder=True)
 
-        # Brug Jorden som reference og find positionen relativt til stjernerne
-        earth_eci = earth.at(t).observe(earth).position.km
-        earth_pos_eci = earth_pos_ecef + earth_eci
+    sat_pos = propager([(tle_line1, tle_line2)], t)[0][0]
+    earth_pos_ecef = observer_positions_km(t, df_behandlet['Lat'].to_numpy(), df_behandlet['Lon'].to_numpy(),
+                                           df_behandlet['Alt'].to_numpy()).T
+    earth_eci = earth.at(t).observe(earth).position.km.T
+    earth_pos_eci = earth_pos_ecef + earth_eci
 
-        # Beregn afstanden mellem satellitten og observatøren
-        distance = np.linalg.norm(sat_pos - earth_pos_eci)
-        afstand_sat_observator.append(distance)
+    # Beregn afstanden mellem satellitten og observatøren
+    afstand_sat_observator = np.linalg.norm(sat_pos - earth_pos_eci, axis=1)
 
-        # Gem positioner
-        satellite_positions.append(sat_pos)
-        earth_positions.append(earth_eci)
-        observation_points.append(earth_pos_eci)
+    return afstand_sat_observator, np.array([]), sat_pos, earth_eci, earth_pos_eci
 
-    # Returner resultaterne
-    return np.array(afstand_sat_observator), np.array(vinkel_sol_jord), satellite_positions, earth_positions, observation_points
+def run_astap_on_directory(directory, astap_exe=r"C:\Program Files\astap\astap.exe", max_workers=4, timeout=60):
+    from Func_PlateSolve import solve_directory_stream, PlateSolveCache
 
-def run_astap_on_directory(directory, astap_exe=r"C:\Program Files\astap\astap.exe"):
     results = []
+    cache = PlateSolveCache(directory)
+
+    # kør astap samtidigt på alle fits filer - headers leveres efterhånden som de bliver løst
+    for filename, header_dict, besked in solve_directory_stream(astap_exe, directory,
+                                                                max_workers=max_workers, timeout=timeout,
+                                                                cache=cache):
+        if header_dict is None:
+            print(f"ASTAP fejlede for {filename}: {besked}")
+            continue
 
-    # find alle fits filer
-    for filename in os.listdir(directory):
-        if filename.lower().endswith(".fits"):
-            filepath = os.path.join(directory, filename)
-            wcsfile = os.path.join(directory, filename.replace(".fits", ".wcs"))
-
-            # kør astap
-            result = subprocess.run(
-                [astap_exe, "-f", filepath, "-wcs", wcsfile],
-                capture_output=True, text=True
-            )
-
-            if result.returncode != 0:
-                print(f"ASTAP fejlede for {filename}: {result.stderr}")
-                continue
-
-            # læs header fra wcs-filen
-            if os.path.exists(wcsfile):
-                with fits.open(wcsfile) as hdul:
-                    header = hdul[0].header
-                    
-
-                # konverter header til dict
-                header_dict = {k: header[k] for k in header.keys() if k != ''}
-
-                # tilføj filnavn
-                header_dict["filename"] = filename
+        # tilføj filnavn
+        header_dict["filename"] = filename
+        results.append(header_dict)
 
-                results.append(header_dict)
-                os.remove(wcsfile)
+    print(cache.summary())
 
     # lav dataframe af alle headere
-    df = pd.DataFrame(results)
-
-    # Slet alle .ini-filer i output-mappen (ASTAP kan have lavet dem)
-    for f in os.listdir(directory):
-        if f.lower().endswith('.ini'):
-            try:
-                os.remove(os.path.join(directory, f))
-            except Exception:
-                pass
-
-    return df
+    return pd.DataFrame(results)
 
 def pixel_to_radec(x, y, header_row):
     """
     ASTAP-kompatibel konvertering fra pixel til RA/DEC koordinater.
     Implementerer den fulde Gnomonic (Tangent Plane) projektion.
+    For mange punkter/frames på én gang: Func_WCS.pixel_to_radec_batch
     """
+    from Func_WCS import sip_korrektion
     
     # Hent header værdier
     crpix1 = header_row["CRPIX1"]
@@ -1593,9 +1430,8 @@ def pixel_to_radec(x, y, header_row):
     u = x - crpix1
     v = y - crpix2
     
-    # For nu springer vi SIP korrektion over (U = u, V = v)
-    U = u
-    V = v
+    # SIP korrektion (A/B polynomier) hvis ASTAP har leveret dem, ellers U = u, V = v
+    U, V = sip_korrektion(u, v, header_row)
     
     # Step 2: Anvend CD matrix til standard koordinater
     xi = cd11 * U + cd12 * V  # ξ (xi)
@@ -1637,4 +1473,68 @@ def compute_cd(sx, sy, theta_deg, dec0_deg=None, ra_units_on_sky=True):
         cd11 /= np.cos(np.deg2rad(dec0_deg))
         cd12 /= np.cos(np.deg2rad(dec0_deg))
 
-    return cd11, cd12, cd21, cd22
\ No newline at end of file
+    return cd11, cd12, cd21, cd22
+
+def _calculate_satellite_data_reference(df_local, tle_line1, tle_line2):
+    """Den oprindelige række-for-række version af calculate_satellite_data (kun til benchmark)"""
+    from skyfield.api import wgs84
+
+    ts = get_timescale()
+    planets = get_ephemeris()
+    sun, earth = planets['sun'], planets['earth']
+    satellite = get_satellite(tle_line1, tle_line2, 'Satellite')
+    lat_col = "LAT--OBS" if "LAT--OBS" in df_local.columns else "LAT-OBS"
+
+    def convert_to_tuple(date_str):
+        try:
+            dt = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S.%f")
+        except ValueError:
+            dt = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%f")
+        return (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+
+    afstand, vinkel, sat_positions, earth_positions, observation_points = [], [], [], [], []
+    for n, date_tuple in enumerate(df_local["DATE-OBS"].apply(convert_to_tuple)):
+        t = ts.utc(*date_tuple)
+        sat_pos = satellite.at(t).position.km
+        sun_pos = sun.at(t).position.km
+        earth_location = wgs84.latlon(df_local[lat_col][n], df_local["LONG-OBS"][n], df_local["ELEV-OBS"][n])
+        earth_eci = earth.at(t).observe(earth).position.km
+        earth_pos_eci = earth_location.at(t).position.km + earth_eci
+        v1, v2 = earth_pos_eci - sat_pos, sun_pos - sat_pos
+        vinkel.append(np.degrees(np.arccos(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))))
+        afstand.append(np.linalg.norm(sat_pos - earth_pos_eci))
+        sat_positions.append(sat_pos)
+        earth_positions.append(earth_eci)
+        observation_points.append(earth_pos_eci)
+    return np.array(afstand), np.array(vinkel), sat_positions, earth_positions, observation_points
+
+
+def benchmark_calculate_satellite_data(epoker=(10**4, 10**5), tle_line1=None, tle_line2=None):
+    """Sammenlign vektoriseret calculate_satellite_data med række-for-række versionen"""
+    tle_line1 = tle_line1 or "1 25544U 98067A   24001.50000000  .00016717  00000-0  10270-3 0  9005"
+    tle_line2 = tle_line2 or "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.49815228 12345"
+    start = pd.Timestamp("2024-01-01 18:00:00")
+
+    for n in epoker:
+        tider = start + pd.to_timedelta(np.arange(n) * 0.5, unit='s')
+        df = pd.DataFrame({"DATE-OBS": tider.strftime("%Y-%m-%d %H:%M:%S.%f")})
+        df["LAT--OBS"], df["LONG-OBS"], df["ELEV-OBS"] = 55.6867, 12.5701, 30.0
+
+        t0 = time.perf_counter()
+        afstand, vinkel, sat_pos, _, _ = calculate_satellite_data(df, tle_line1, tle_line2)
+        t_vektor = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        afstand_ref, vinkel_ref, sat_pos_ref, _, _ = _calculate_satellite_data_reference(df, tle_line1, tle_line2)
+        t_ref = time.perf_counter() - t0
+
+        afvigelse = np.max(np.abs(np.asarray(sat_pos_ref) - sat_pos))
+        print(f"calculate_satellite_data, {n:,} epoker:")
+        print(f"  række for række: {t_ref:8.2f} s")
+        print(f"  vektoriseret   : {t_vektor:8.3f} s  ({t_ref / t_vektor:.0f}x hurtigere)")
+        print(f"  max afvigelse: position {afvigelse:.2e} km, afstand {np.max(np.abs(afstand_ref - afstand)):.2e} km, "
+              f"vinkel {np.max(np.abs(vinkel_ref - vinkel)):.2e}°")
+
+
+if __name__ == "__main__":
+    benchmark_calculate_satellite_data()
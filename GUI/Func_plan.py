@@ -8,6 +8,7 @@ import numpy as np
 from PIL import Image, ImageTk
 
 from Func_VejrData import hent_vejrdata
+from Func_SessionIndex import append_frame
 
 def make_safe_filename(name):
     """Konverterer satellit navn til et sikkert filnavn/mappennavn"""
@@ -815,21 +816,27 @@ def run_observation_plan(self):
                     self.plan_log_text.insert(tk.END, log_msg)
                     self.plan_log_text.see(tk.END)
                 
-                # Kald Tracking_obs_plan
-                Tracking_obs_plan(
-                    binning=binning,
-                    gain=gain,
-                    TLE=[sat['SatName'], sat['TLE1'], sat['TLE2']],
-                    start_time=start_timestamp,
-                    end_time=end_timestamp,
-                    dir_to_headfolder=dir_folder,
-                    NORADID=sat['NORAD'],
-                    exposure_time=exposure,
-                    monitor=self.observation_monitor,
-                    sat_name=sat['SatName'],
-                    sat_time=f"{sat['StartTime']} - {sat['EndTime']}",
-                    start_focus=start_focus_value
-                )
+                # Kald Tracking_obs_plan - live analyse (hvis slået til) følger sessionsmappen
+                live_watchers = []
+                try:
+                    Tracking_obs_plan(
+                        binning=binning,
+                        gain=gain,
+                        TLE=[sat['SatName'], sat['TLE1'], sat['TLE2']],
+                        start_time=start_timestamp,
+                        end_time=end_timestamp,
+                        dir_to_headfolder=dir_folder,
+                        NORADID=sat['NORAD'],
+                        exposure_time=exposure,
+                        monitor=self.observation_monitor,
+                        sat_name=sat['SatName'],
+                        sat_time=f"{sat['StartTime']} - {sat['EndTime']}",
+                        start_focus=start_focus_value,
+                        session_dir_callback=lambda d: live_watchers.append(self.start_live_analyse(d))
+                    )
+                finally:
+                    for watcher in live_watchers:
+                        self.stop_live_analyse(watcher)
                 
                 log_msg = f"  ✓ {sat['SatName']} completed\n"
                 self.plan_log_text.insert(tk.END, log_msg)
@@ -863,7 +870,7 @@ def run_observation_plan(self):
 camera_connected = False
 
 def Tracking_obs_plan(binning, gain, TLE, start_time, end_time, dir_to_headfolder, NORADID, exposure_time, 
-                     monitor=None, sat_name=None, sat_time=None, start_focus=None):
+                     monitor=None, sat_name=None, sat_time=None, start_focus=None, session_dir_callback=None):
     #vent til start time
     import time
     current_time = time.time()
@@ -877,6 +884,8 @@ def Tracking_obs_plan(binning, gain, TLE, start_time, end_time, dir_to_headfolde
 
     #Lav destination for filer
     dir_to_subfolder = os.path.join(dir_to_headfolder, NORADID + '_' + make_safe_filename(TLE[0])) + os.sep
+    if session_dir_callback is not None:
+        session_dir_callback(dir_to_subfolder)
     #Connect Camera
     working_on = "connecting camera - " + TLE[0]
     if monitor:
@@ -1171,6 +1180,12 @@ def take_picture_with_header(camera, mount, exp_time, obstype, satname, tle1, tl
     filepath = os.path.join(output_dir, filename + ".fits")
     hdu.writeto(filepath, overwrite=True)
     
+    # Registrer frame i sessionens index så analysen ikke skal læse headers igen
+    try:
+        append_frame(filepath, hdu.header)
+    except Exception as e:
+        print(f"Session index ikke opdateret for {filename}: {e}")
+    
     # Opdater monitor med billede og data
     if monitor:
         try:
@@ -125,6 +125,7 @@ class TkinterDemo:
         self.stop_image_analysis = False
         self.analysis_directory = None
         self.tracking_pixelsum_radius = tk.IntVar(value=50)
+        self.live_analysis_watchers = {}  # Sessionsmappe -> live analyse tråd
         
         # Billedgennemgang variabler
         self.review_files = []
@@ -138,6 +139,7 @@ class TkinterDemo:
         self.tle_plot_figure = None
         self.tle_csv_data = None  # DataFrame med indlæst CSV data
         self.tle_result = None  # Resultat fra TLE beregning
+        self.tle_ensemble_results = []  # Rangerede resultater fra metode ensemblet
         self.selected_indices = [0, 1, 2]  # Valgte indices til TLE beregning
         
         # Moravian kamera variabler
@@ -692,6 +694,16 @@ class TkinterDemo:
         from Func_BilledeAnalyse import show_analysis_plots
         show_analysis_plots(self, directory)
 
+    def start_live_analyse(self, session_dir):
+        """Start live analyse af en sessionsmappe - delegeret til Func_LiveAnalyse"""
+        from Func_LiveAnalyse import start_live_analyse
+        return start_live_analyse(self, session_dir)
+
+    def stop_live_analyse(self, watcher):
+        """Stop live analyse når observationen er slut - delegeret til Func_LiveAnalyse"""
+        from Func_LiveAnalyse import stop_live_analyse
+        stop_live_analyse(self, watcher)
+
 
 
     # =================
@@ -797,6 +809,21 @@ class TkinterDemo:
         """Beregner TLE baseret på valgte parametre - delegeret til Func_CalculateTLE"""
         from Func_CalculateTLE import calculate_tle_from_observations
         calculate_tle_from_observations(self)
+
+    def calculate_tle_ensemble(self):
+        """Kører alle IOD metoder parallelt og rangerer dem efter residual - delegeret til Func_CalculateTLE"""
+        from Func_CalculateTLE import calculate_tle_ensemble
+        calculate_tle_ensemble(self)
+
+    def calculate_tle_triplet_search(self):
+        """Søger de bedste 3 observationer for den valgte metode - delegeret til Func_CalculateTLE"""
+        from Func_CalculateTLE import calculate_tle_triplet_search
+        calculate_tle_triplet_search(self)
+
+    def calculate_tle_refinement(self):
+        """Forfiner den beregnede TLE mod alle observationer - delegeret til Func_CalculateTLE"""
+        from Func_CalculateTLE import calculate_tle_refinement
+        calculate_tle_refinement(self)
     
     def show_tle_3d_plot(self):
         """Show 3D plot of calculated TLE - delegeret til Func_CalculateTLE"""
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Func_* modulerne importeres med flade navne (som når GUI.py køres fra GUI mappen)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
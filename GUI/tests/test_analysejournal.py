@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+
+from Func_AnalyseJournal import AnalyseJournal, journal_path
+
+KONFIG = {'obstype': 'LeapFrog', 'pixelscale': 6.2399e-05, 'roi_radius': 0}
+
+
+def _frames(directory, antal):
+    for i in range(antal):
+        (directory / f"frame_{i:03d}.fits").write_bytes(b"\0" * 2880)
+    return [f"frame_{i:03d}.fits" for i in range(antal)]
+
+
+def test_genoptag_springer_faerdige_frames_over(tmp_path):
+    filer = _frames(tmp_path, 3)
+    journal = AnalyseJournal(str(tmp_path), KONFIG)
+    journal.append({'filename': filer[0], 'x_sat': np.float64(12.5), 'antal_linjer': np.int64(1)})
+    journal.append({'filename': filer[1], 'error': "ingen data"})
+    journal.append({'filename': filer[2], 'x_sat': np.nan, 'platesolve_fejl': "timeout efter 60 s"})
+
+    genoptaget = AnalyseJournal(str(tmp_path), KONFIG)
+    assert filer[0] in genoptaget and genoptaget.rows[filer[0]] == {'filename': filer[0], 'x_sat': 12.5,
+                                                                    'antal_linjer': 1}
+    # Fejlede frames og frames uden WCS fordi plate solving fejlede prøves igen
+    assert filer[1] not in genoptaget
+    assert filer[2] not in genoptaget
+    assert len(genoptaget) == 1
+
+
+def test_aendrede_indstillinger_eller_fil_er_foraeldede(tmp_path):
+    filer = _frames(tmp_path, 2)
+    journal = AnalyseJournal(str(tmp_path), KONFIG)
+    for filename in filer:
+        journal.append({'filename': filename, 'x_sat': 1.0})
+
+    assert len(AnalyseJournal(str(tmp_path), dict(KONFIG, roi_radius=400))) == 0
+
+    sti = tmp_path / filer[1]
+    os.utime(sti, (sti.stat().st_mtime + 60,) * 2)
+    genoptaget = AnalyseJournal(str(tmp_path), KONFIG)
+    assert filer[0] in genoptaget and filer[1] not in genoptaget
+    assert genoptaget.forældede == 1
+
+
+def test_halvt_skrevet_sidste_linje_ignoreres(tmp_path):
+    filer = _frames(tmp_path, 2)
+    journal = AnalyseJournal(str(tmp_path), KONFIG)
+    journal.append({'filename': filer[0], 'x_sat': 1.0})
+    with open(journal_path(str(tmp_path)), 'a', encoding='utf-8') as f:
+        f.write('{"filename": "%s", "mtime": 1' % filer[1])  # nedbrud midt i en skrivning
+
+    genoptaget = AnalyseJournal(str(tmp_path), KONFIG)
+    assert list(genoptaget.rows) == [filer[0]]
+
+    # Næste post må ikke havne i forlængelse af den afbrudte linje
+    genoptaget.append({'filename': filer[1], 'x_sat': 2.0})
+    assert list(AnalyseJournal(str(tmp_path), KONFIG).rows) == filer
+
+    genoptaget.slet()
+    assert not os.path.exists(journal_path(str(tmp_path)))
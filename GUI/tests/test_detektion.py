@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("scipy")
+
+from Func_Detektion import (_endepunkt_fejl, _syntetisk_streak_frame, find_streak, streak_parametre, frame_median,
+                            top_pixel_positions, tracking_detection, _reference_tracking_detection,
+                            _syntetisk_tracking_frame)
+
+
+def test_streak_parametre_skalerer_med_frame():
+    assert streak_parametre((4096, 4096)) == (8, 400.0, 200.0)
+    assert streak_parametre((1024, 1024)) == (2, 100.0, 50.0)
+
+
+@pytest.mark.parametrize("stoerrelse", [1024, 2048])
+def test_find_streak_endepunkter_paa_mindre_frames(stoerrelse):
+    """Regression: fast 400 px minimumslængde og binning 8 oversås/forskød endepunkter på små frames"""
+    rng = np.random.default_rng(2)
+    for _ in range(10):
+        data, sand = _syntetisk_streak_frame(rng, (stoerrelse, stoerrelse))
+        streak = find_streak(data)
+        assert streak is not None
+        fundet = (streak['x1'], streak['y1'], streak['x2'], streak['y2'])
+        assert _endepunkt_fejl(fundet, sand) < 2.0
+
+
+def test_histogram_median_og_top_pixels_som_numpy():
+    rng = np.random.default_rng(3)
+    data = rng.integers(0, 3000, size=(301, 257)).astype(np.uint16)
+    for udsnit in (data, data[7:-5, 11:-3]):
+        assert frame_median(udsnit) == np.median(udsnit)
+        ys, xs = top_pixel_positions(udsnit, 500)
+        assert len(ys) == 500
+        assert np.array_equal(np.sort(udsnit[ys, xs]), np.sort(udsnit.ravel())[-500:])
+
+
+def test_tracking_detektion_som_reference():
+    rng = np.random.default_rng(1)
+    for _ in range(3):
+        data = _syntetisk_tracking_frame(rng, (1024, 1024))
+        assert tracking_detection(data, 50) == _reference_tracking_detection(data, 50)
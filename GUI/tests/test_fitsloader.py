@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+fits = pytest.importorskip("astropy.io.fits")
+
+from Func_FitsLoader import read_frame
+
+
+def test_uint16_frame_med_bzero(tmp_path):
+    """uint16 frames gemmes som int16 med BZERO=32768 og skal læses tilbage som uint16"""
+    data = np.array([[0, 1, 1000], [32767, 32768, 65535]], dtype=np.uint16)
+    sti = tmp_path / "frame.fits"
+    fits.PrimaryHDU(data=data).writeto(sti)
+
+    frame, header = read_frame(str(sti))
+
+    assert header['BZERO'] == 32768
+    assert frame.dtype == np.uint16
+    assert frame.dtype.isnative
+    assert not frame.flags.writeable
+    np.testing.assert_array_equal(frame, data)
+
+
+def test_uskaleret_frame_er_memmap_view(tmp_path):
+    data = np.arange(12, dtype=np.float32).reshape(3, 4)
+    sti = tmp_path / "frame.fits"
+    fits.PrimaryHDU(data=data).writeto(sti)
+
+    frame, _ = read_frame(str(sti))
+
+    assert frame.dtype == np.float32
+    assert not frame.flags.writeable
+    np.testing.assert_array_equal(frame, data)
+
+
+def test_bscale_giver_float32(tmp_path):
+    raw = np.array([[0, 10], [-5, 7]], dtype=np.int16)
+    hdu = fits.PrimaryHDU(data=raw)
+    hdu.header['BSCALE'] = 0.5
+    hdu.header['BZERO'] = 100.0
+    sti = tmp_path / "frame.fits"
+    hdu.writeto(sti)
+
+    frame, _ = read_frame(str(sti))
+
+    assert frame.dtype == np.float32
+    np.testing.assert_allclose(frame, raw * 0.5 + 100.0)
+
+
+def test_frame_uden_data_giver_klar_fejl(tmp_path):
+    sti = tmp_path / "tom.fits"
+    fits.PrimaryHDU().writeto(sti)
+
+    with pytest.raises(ValueError, match="Ingen billeddata"):
+        read_frame(str(sti))
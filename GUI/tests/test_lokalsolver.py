@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from Func_LokalSolver import STANDARD_PIXELSKALA, SekvensAstrometri, _syntetisk_felt, hent_katalog, solve_image
+
+
+@pytest.fixture(scope='module')
+def katalog(tmp_path_factory):
+    rng = np.random.default_rng(1)
+    n_stjerner = 40000
+    ra = rng.uniform(147, 151, n_stjerner)
+    dec = rng.uniform(37, 40, n_stjerner)
+    mag = 16 - rng.exponential(1.5, n_stjerner)
+    sti = tmp_path_factory.mktemp("katalog") / "katalog.npz"
+    np.savez_compressed(sti, ra=ra, dec=dec, mag=mag)
+    return hent_katalog(str(sti))
+
+
+def test_sekvens_loeser_inkrementelt_uden_fuld_detektion(katalog, monkeypatch):
+    rng = np.random.default_rng(2)
+    pixelskala = 2 * STANDARD_PIXELSKALA
+    frames = []
+    for i in range(5):
+        ra0, dec0 = 148 + 0.02 * i, 38 + 0.015 * i
+        data, sand = _syntetisk_felt(rng, katalog, ra0, dec0, (1024, 1024), pixelskala, 25.0)
+        header = {'RA': ra0 + rng.normal(0, 0.003), 'DEC': dec0 + rng.normal(0, 0.003),
+                  'CROTA2': 25.0, 'CDELT2': pixelskala}
+        frames.append((data, header, sand))
+
+    sekvens = SekvensAstrometri()
+    data, header, _ = frames[0]
+    loesning, besked = solve_image(data, header, katalog)
+    assert loesning is not None, besked
+    sekvens.nulstil(data, header, loesning)
+
+    # Den inkrementelle vej må kun læse vinduer og en udtyndet frame - aldrig hele billedet binnet
+    fulde = []
+    monkeypatch.setattr('Func_LokalSolver.binned_view', lambda data, faktor: fulde.append(faktor) or data)
+    for data, header, sand in frames[1:]:
+        loesning, grund = sekvens.loes(data, header)
+        assert loesning is not None, grund
+        d_ra = (loesning['CRVAL1'] - sand['CRVAL1']) * np.cos(np.radians(sand['CRVAL2']))
+        assert np.hypot(d_ra, loesning['CRVAL2'] - sand['CRVAL2']) * 3600 < 1.0
+    assert all(faktor == 1 for faktor in fulde)
+
@@ -0,0 +1,75 @@
+import os
+import time
+import hashlib
+
+import numpy as np
+import pytest
+
+fits = pytest.importorskip("astropy.io.fits")
+
+import Func_PlateSolve
+from Func_PlateSolve import PlateSolveCache, solve_with_retry, solve_directory_stream
+
+WCS = {'CRVAL1': 10.0, 'CRVAL2': 20.0, 'CRPIX1': 2.0, 'CRPIX2': 2.0}
+
+
+@pytest.fixture
+def frame(tmp_path):
+    sti = tmp_path / "frame_000.fits"
+    fits.PrimaryHDU(data=np.arange(12, dtype=np.uint16).reshape(3, 4) * 5000).writeto(sti)
+    return sti
+
+
+@pytest.fixture
+def solver_kald(monkeypatch):
+    kald = []
+
+    def falsk_solver(astap_exe, filepath, timeout=60, radius=None, processer=None):
+        kald.append(filepath)
+        return dict(WCS), None
+
+    monkeypatch.setattr(Func_PlateSolve, 'solve_fits_file', falsk_solver)
+    return kald
+
+
+def test_anden_loesning_kommer_fra_cache(frame, solver_kald):
+    cache = PlateSolveCache(str(frame.parent))
+
+    header, besked = solve_with_retry('astap', str(frame), cache=cache)
+    assert header == WCS and besked.startswith("løst")
+    assert len(solver_kald) == 1
+
+    header, besked = solve_with_retry('astap', str(frame), cache=cache)
+    assert header == WCS and besked == "fra cache"
+    assert len(solver_kald) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_overlever_ny_instans(frame, solver_kald):
+    cache = PlateSolveCache(str(frame.parent))
+    solve_with_retry('astap', str(frame), cache=cache)
+    cache.save()
+
+    header, besked = solve_with_retry('astap', str(frame), cache=PlateSolveCache(str(frame.parent)))
+    assert besked == "fra cache"
+    assert len(solver_kald) == 1
+
+
+def test_hash_er_raa_data_uden_skalering(frame):
+    cache = PlateSolveCache(str(frame.parent))
+    with fits.open(frame, do_not_scale_image_data=True) as hdul:
+        raa = hdul[0].data.tobytes()
+    assert cache.data_hash(str(frame)) == hashlib.sha256(raa).hexdigest()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="falsk ASTAP er et shell script")
+def test_stop_afslutter_koerende_astap(tmp_path, frame):
+    astap = tmp_path / "astap"
+    astap.write_text("#!/bin/sh\nexec sleep 30\n")
+    astap.chmod(0o755)
+
+    t0 = time.perf_counter()
+    resultater = list(solve_directory_stream(str(astap), str(frame.parent), [frame.name], timeout=60,
+                                             stop_check=lambda: True))
+    assert time.perf_counter() - t0 < 5
+    assert resultater == []
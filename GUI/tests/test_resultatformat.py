@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from Func_ResultatFormat import columnar_paths, find_result_file, read_result, write_result
+
+
+@pytest.fixture
+def resultat():
+    return pd.DataFrame({
+        'filename': ["frame_000.fits", "frame_001.fits"],
+        'NORAD_ID': ['00733', '00733'],
+        'DATE-OBS': ['2024-01-01T18:00:00.250000', '2024-01-01T18:00:05.373456'],
+        'x_sat': [101.5, np.nan],
+        'antal_linjer': [1, 0],
+        'roi_used': [True, False],
+        'error': [np.nan, 'ingen linje'],
+        'FOCUSPOS': [1200, 'ukendt'],  # blandet header kolonne - havner i sidetabellen som tekst
+    })
+
+
+def test_write_og_read_result_rundtur(tmp_path, resultat):
+    csv_sti = str(tmp_path / "data_ISS_25544.csv")
+    resultat.to_csv(csv_sti, index=False)
+    kerne_sti, header_sti = write_result(resultat, csv_sti)
+
+    kerne = read_result(kerne_sti)
+    assert list(kerne['filename']) == list(resultat['filename'])
+    assert list(kerne['NORAD_ID']) == ['00733', '00733']
+    assert list(kerne['DATE-OBS']) == list(resultat['DATE-OBS'])
+    assert kerne['x_sat'].iloc[0] == 101.5 and np.isnan(kerne['x_sat'].iloc[1])
+    assert list(kerne['antal_linjer']) == [1, 0]
+    assert list(kerne['roi_used']) == [True, False]
+    assert pd.isna(kerne['error'].iloc[0]) and kerne['error'].iloc[1] == 'ingen linje'
+    assert 'FOCUSPOS' not in kerne.columns
+
+    headers = read_result(header_sti)
+    assert list(headers['FOCUSPOS']) == ['1200', 'ukendt']
+
+
+def test_find_result_file_bruger_nyere_csv(tmp_path, resultat):
+    csv_sti = str(tmp_path / "data_ISS_25544.csv")
+    resultat.to_csv(csv_sti, index=False)
+    write_result(resultat, csv_sti)
+    kerne_sti = columnar_paths(csv_sti)[0]
+    assert find_result_file(str(tmp_path)) == kerne_sti
+
+    # CSV'en skrives igen uden at kernen opdateres - kernen er nu forældet
+    resultat.to_csv(csv_sti, index=False)
+    os.utime(csv_sti, (os.path.getmtime(kerne_sti) + 10,) * 2)
+    assert find_result_file(str(tmp_path)) == csv_sti
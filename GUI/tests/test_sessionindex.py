@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+fits = pytest.importorskip("astropy.io.fits")
+
+from Func_SessionIndex import append_frame, frame_header, index_path, load_index, read_index, remove_frame
+
+
+def _gem_frame(directory, filename, **header):
+    hdu = fits.PrimaryHDU(data=np.zeros((4, 6), dtype=np.uint16))
+    hdu.header.update(header)
+    sti = directory / filename
+    hdu.writeto(sti)
+    return sti, hdu.header
+
+
+def test_append_og_duplikat_beholder_seneste(tmp_path):
+    sti, header = _gem_frame(tmp_path, "frame_000.fits", OBSTYPE='LeapFrog', NORAD_ID='00733', EXPTIME=0.5)
+    append_frame(str(sti), header)
+    header['EXPTIME'] = 1.0
+    append_frame(str(sti), header)
+
+    df = read_index(str(tmp_path))
+    assert list(df['filename']) == ["frame_000.fits"]
+    række = df.iloc[0]
+    assert række['EXPTIME'] == 1.0
+    assert række['NORAD_ID'] == '00733'  # tekst - foranstillede nuller bevares
+    assert (række['NAXIS1'], række['NAXIS2']) == (6, 4)
+
+
+def test_load_index_udfylder_fra_headers(tmp_path):
+    sti, header = _gem_frame(tmp_path, "frame_000.fits", OBSTYPE='Tracking', RA=150.0)
+    append_frame(str(sti), header)
+    _gem_frame(tmp_path, "frame_001.fits", OBSTYPE='Tracking', RA=151.0)  # optaget uden index
+
+    df = load_index(str(tmp_path))
+    assert list(df['filename']) == ["frame_000.fits", "frame_001.fits"]
+    assert list(df['RA']) == [150.0, 151.0]
+    # Manglende frame er skrevet til indexet, så næste opslag ikke åbner headeren igen
+    assert "frame_001.fits" in set(read_index(str(tmp_path))['filename'])
+    assert frame_header(str(tmp_path), "frame_001.fits")['RA'] == 151.0
+
+
+def test_remove_frame(tmp_path):
+    for i in range(3):
+        sti, header = _gem_frame(tmp_path, f"frame_{i:03d}.fits", OBSTYPE='LeapFrog')
+        append_frame(str(sti), header)
+
+    remove_frame(str(tmp_path), "frame_001.fits")
+    assert list(read_index(str(tmp_path))['filename']) == ["frame_000.fits", "frame_002.fits"]
+    assert not os.path.exists(index_path(str(tmp_path)) + '.tmp')